@@ -0,0 +1,153 @@
+import argparse
+import time
+
+from pulp import LpAffineExpression, LpContinuous, LpInteger, LpMaximize, LpProblem, LpVariable, lpSum
+
+import agendamento_psicologico as ap
+from configuracao_solver import adicionar_argumentos, configuracao_de_argumentos, resolver
+
+# Agendamento em dois estágios. No primeiro, o modelo de `agendamento_psicologico.py`
+# é resolvido sem o índice de sala: contagens inteiras por (profissional, data,
+# turno, tipo) limitadas pelo total de vagas de sala abertas no turno, como já faz
+# o `modelo_escalonamento.py`. Isso elimina a simetria entre salas equivalentes.
+# No segundo estágio, as salas são atribuídas por um encaixe guloso que respeita a
+# exclusividade (R2) e a capacidade (R4) de cada sala.
+
+
+def vagas_sala(indices, s):
+    # Atendimentos que uma sala comporta em um turno: R2 limita a um atendimento
+    # por sala e turno, e R4 exige capacidade para a duração do atendimento.
+    return min(1, int(indices['capacidade_sala'][s] // ap.duracao_atendimento))
+
+
+def vagas_por_turno(indices):
+    # Total de vagas das salas abertas em cada (data, turno).
+    vagas = {}
+    for d, dia in indices['dia_da_data'].items():
+        for t in ap.turnos:
+            vagas[(d, t)] = sum(vagas_sala(indices, s) for s in indices['salas_abertas'][(dia, t)])
+    return vagas
+
+
+def construir_modelo_agregado(indices):
+    ids = indices['profissionais']
+    disponivel = indices['disponivel']
+    dia_da_data = indices['dia_da_data']
+    vagas = vagas_por_turno(indices)
+
+    prob = LpProblem("Agendamento_Psicologico_Agregado", LpMaximize)
+
+    # y[(p, d, t, tipo)]: número de atendimentos do tipo com o profissional no turno
+    chaves = [(p, d, t, tipo)
+              for (d, t, tipo) in indices['demanda']
+              if vagas[(d, t)] > 0
+              for p in ids if (dia_da_data[d], t) in disponivel[p]]
+    y = LpVariable.dicts("y", chaves, 0, None, LpInteger)
+    folga = LpVariable.dicts("folga", list(indices['demanda']), 0, None, LpContinuous)
+    desbalanceamento = LpVariable.dicts("desbalanceamento", ids, 0, None, LpContinuous)
+
+    por_profissional_turno, por_turno, por_demanda = {}, {}, {}
+    por_profissional = {p: [] for p in ids}
+    for chave in chaves:
+        p, d, t, tipo = chave
+        por_profissional_turno.setdefault((p, d, t), []).append(y[chave])
+        por_turno.setdefault((d, t), []).append(y[chave])
+        por_demanda.setdefault((d, t, tipo), []).append(y[chave])
+        por_profissional[p].append(y[chave])
+
+    # Mesmo objetivo do modelo completo
+    termos = [(y[chave], ap.pesos[chave[3]] * ap.duracao_atendimento) for chave in chaves]
+    termos += [(folga[k], -ap.pesos[k[2]]) for k in folga]
+    termos += [(desbalanceamento[p], -0.1) for p in ids]
+    prob.setObjective(LpAffineExpression(termos))
+
+    # R1: um atendimento por profissional e turno
+    for (p, d, t), vars_ in por_profissional_turno.items():
+        prob += lpSum(vars_) <= 1, f"R1_Profissional_Um_Atendimento_Por_Turno_{p}_{d}_{t}"
+    # R2 + R4 agregadas: total de atendimentos do turno limitado às vagas das salas abertas
+    for (d, t), vars_ in por_turno.items():
+        prob += lpSum(vars_) <= vagas[(d, t)], f"RA_Vagas_Salas_Por_Turno_{d}_{t}"
+    # R3: demanda atendida ou folga
+    for (d, t, tipo), quantidade_prevista in indices['demanda'].items():
+        prob += lpSum(por_demanda.get((d, t, tipo), [])) + folga[(d, t, tipo)] == quantidade_prevista, \
+                f"R3_Atender_Demanda_ou_Folga_{d}_{t}_{tipo}"
+    # R5: carga horária e desbalanceamento
+    media_carga_esperada = (sum(indices['carga_max'].values()) * ap.duracao_atendimento) / len(ids)
+    for p_id in ids:
+        total_horas_p = lpSum(v * ap.duracao_atendimento for v in por_profissional[p_id])
+        prob += total_horas_p <= indices['carga_max'][p_id], f"R5_Carga_Horaria_Max_{p_id}"
+        prob += total_horas_p - media_carga_esperada <= desbalanceamento[p_id], f"R5_Desbalanceamento_Positivo_{p_id}"
+        prob += media_carga_esperada - total_horas_p <= desbalanceamento[p_id], f"R5_Desbalanceamento_Negativo_{p_id}"
+
+    return prob, y, folga, desbalanceamento
+
+
+def atribuir_salas(indices, y):
+    # Segundo estágio: em cada (data, turno), os atendimentos de um mesmo profissional
+    # vão para uma única sala (exclusividade), escolhida pelo melhor encaixe entre as
+    # salas abertas com vagas suficientes. Grupos maiores são encaixados primeiro.
+    # Como as vagas do primeiro estágio somam exatamente as vagas das salas, todo
+    # atendimento encontra sala e o resultado é viável para o modelo completo.
+    grupos = {}
+    for (p, d, t, tipo), var in y.items():
+        n = int(round(var.varValue or 0))
+        if n > 0:
+            grupos.setdefault((d, t), {}).setdefault(p, []).extend([tipo] * n)
+
+    agenda, nao_alocados = [], []
+    for (d, t), por_prof in grupos.items():
+        livres = sorted((s for s in indices['salas_abertas'][(indices['dia_da_data'][d], t)]
+                         if vagas_sala(indices, s) > 0),
+                        key=lambda s: (vagas_sala(indices, s), indices['capacidade_sala'][s]))
+        for p, tipos in sorted(por_prof.items(), key=lambda item: -len(item[1])):
+            sala = next((s for s in livres if vagas_sala(indices, s) >= len(tipos)), None)
+            if sala is None:
+                nao_alocados.extend((p, d, t, tipo) for tipo in tipos)
+                continue
+            livres.remove(sala)
+            agenda.extend((p, d, t, sala, tipo) for tipo in tipos)
+    return agenda, nao_alocados
+
+
+def resolver_em_dois_estagios(indices, config=None):
+    prob, y, folga, desbalanceamento = construir_modelo_agregado(indices)
+    resultado = resolver(prob, config)
+    agenda, nao_alocados = atribuir_salas(indices, y)
+    return prob, resultado, agenda, nao_alocados
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Agendamento psicológico em dois estágios (agregado + salas).")
+    parser.add_argument('--diretorio', default='.')
+    parser.add_argument('--comparar', action='store_true',
+                        help="Resolve também o modelo completo (com índice de sala) e informa a diferença")
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+    config = configuracao_de_argumentos(args)
+
+    indices = ap.preparar_indices(*ap.carregar_dados(args.diretorio))
+
+    inicio = time.perf_counter()
+    prob, resultado, agenda, nao_alocados = resolver_em_dois_estagios(indices, config)
+    tempo_agregado = time.perf_counter() - inicio
+
+    print("Status:", resultado.status)
+    print(f"Modelo agregado: {prob.numVariables()} variáveis, {prob.numConstraints()} restrições, {tempo_agregado:.2f}s")
+    print(f"Atendimentos com sala atribuída: {len(agenda)}")
+    for p, d, t, s, tipo in sorted(agenda):
+        print(f"  Profissional {p}, Data: {d}, Turno: {t}, Sala: {s}, Tipo: {tipo}")
+    if nao_alocados:
+        print(f"Atendimentos sem sala compatível: {len(nao_alocados)}")
+    print(f"Objetivo: {resultado.objetivo:.2f}")
+
+    if args.comparar:
+        inicio = time.perf_counter()
+        completo = ap.construir_modelo(indices)[0]
+        resultado_completo = resolver(completo, config)
+        tempo_completo = time.perf_counter() - inicio
+        print(f"\nModelo completo: {completo.numVariables()} variáveis, {completo.numConstraints()} restrições, "
+              f"{tempo_completo:.2f}s")
+        print(f"Objetivo completo: {resultado_completo.objetivo:.2f}")
+        diferenca = resultado_completo.objetivo - resultado.objetivo
+        print(f"Diferença (completo - dois estágios): {diferenca:.4f} "
+              f"({100 * diferenca / max(abs(resultado_completo.objetivo), 1e-9):.2f}%)")
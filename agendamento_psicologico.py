@@ -1,15 +1,16 @@
+import argparse
+import os
+
 import pandas as pd
 from pulp import *
 
-# Carregar os dados de profissionais, salas e demandas a partir de arquivos CSV.
-# Estes dados são a base para a formulação do problema de otimização.
-profissionais = pd.read_csv('profissionais.csv')
-salas = pd.read_csv('salas.csv')
-demandas = pd.read_csv('demandas.csv')
-
-# Definir os dias da semana e turnos de operação que são considerados no agendamento.
-dias = ['seg', 'ter', 'qua', 'qui', 'sex', 'sab']
-turnos = ['manhã', 'tarde']
+import extracao
+import instrumentacao
+import presolve
+from configuracao_solver import adicionar_argumentos, imprimir_resumo, resolver_com_argumentos
+# Os dias da semana e turnos de operação considerados no agendamento vêm da instância.
+from instancia import Instancia, dias, turnos
+from instrumentacao import PERFILADOR_NULO
 
 # Definir a duração padrão de cada atendimento em horas. Este valor é crucial para
 # o cálculo da carga horária e utilização das salas.
@@ -19,227 +20,280 @@ duracao_atendimento = 1  # 1 hora por atendimento
 # na função objetivo para priorizar atendimentos mais urgentes ou importantes.
 pesos = {'urgência': 5, 'triagem': 3, 'rotina': 1}
 
-# Pré-processamento das disponibilidades dos profissionais.
-# A coluna de disponibilidade em cada dia é convertida de uma string para uma lista
-# de turnos, facilitando o acesso e a validação no modelo.
-for dia in dias:
-    col = f'disponibilidade_{dia}'
-    profissionais[col] = profissionais[col].fillna('').apply(lambda x: [t.strip() for t in str(x).split(',') if t.strip()])
-
-# Criar o problema de Programação Linear. Definido como um problema de maximização
-# (`LpMaximize`), pois o objetivo principal é maximizar o valor total dos atendimentos.
-prob = LpProblem("Agendamento_Psicologico", LpMaximize)
-
-# =============================================================================
-# Variáveis de Decisão
-# =============================================================================
-
-# Variável binária `x[(p, d, t, s, tipo_atendimento)]`:
-# Representa se um profissional `p` está agendado para um atendimento do tipo
-# `tipo_atendimento` em uma data `d`, turno `t`, na sala `s`.
-# Valor 1: o agendamento ocorre; Valor 0: não ocorre.
-x = LpVariable.dicts("x", 
-                      [(p, d, t, s, tipo_atendimento) 
-                       for p in profissionais['id_profissional'] 
-                       for d in demandas['data'] 
-                       for t in turnos 
-                       for s in salas['id_sala'] 
-                       for tipo_atendimento in demandas['tipo_atendimento'].unique()], 
-                      0, 1, LpBinary)
-
-# Variável contínua `folga[(data, turno, tipo_atendimento)]`:
-# Indica a quantidade de demandas de um `tipo_atendimento` específico em uma
-# `data` e `turno` que não puderam ser atendidas. Essencial para quantificar
-# a demanda reprimida e aplicar penalidades na função objetivo.
-folga = LpVariable.dicts("folga", 
-                           [(d, t, tipo) 
-                            for d in demandas['data'] 
-                            for t in turnos 
-                            for tipo in demandas['tipo_atendimento'].unique()], 
-                           0, None, LpContinuous)
-
-# Variável contínua `desbalanceamento[p]`:
-# Mede o desvio absoluto da carga horária de um profissional `p` em relação à
-# carga horária média esperada de todos os profissionais. Utilizada para penalizar
-# desequilíbrios na distribuição de trabalho na função objetivo.
-desbalanceamento = LpVariable.dicts("desbalanceamento", 
-                                      [p for p in profissionais['id_profissional']], 
-                                      0, None, LpContinuous)
-
-# =============================================================================
-# Função Objetivo
-# =============================================================================
-
-# A função objetivo busca MAXIMIZAR o benefício total dos atendimentos agendados
-# e MINIMIZAR as penalidades associadas às demandas não atendidas (folga) e ao
-# desequilíbrio da carga de trabalho dos profissionais.
-# Componente 1: Soma ponderada dos atendimentos alocados (benefício).
-# Componente 2: Penalidade por demandas não atendidas (folga), ponderada pelos `pesos`.
-# Componente 3: Penalidade pelo desbalanceamento da carga de trabalho dos profissionais.
-prob += lpSum(pesos[tipo_atendimento] * x[(p, d, t, s, tipo_atendimento)] * duracao_atendimento
-              for p, d, t, s, tipo_atendimento in x) \
-        - lpSum(pesos[tipo] * folga[(d, t, tipo)] for d, t, tipo in folga) \
-        - 0.1 * lpSum(desbalanceamento[p] for p in profissionais['id_profissional']),
-        "Total_de_Atendimentos_Ponderados_e_Balanceamento"
-
-# =============================================================================
-# Restrições
-# =============================================================================
-
-# Restrição 1: Um profissional só pode realizar um atendimento por turno específico.
-# Garante que cada psicólogo esteja agendado para, no máximo, um atendimento
-# por cada combinação de dia e turno, respeitando sua disponibilidade.
-for p in profissionais['id_profissional']:
-    for d in demandas['data']:
-        dia_semana = demandas[demandas['data'] == d]['dia_semana'].iloc[0]
-        for t in turnos:
-            if t in profissionais[profissionais['id_profissional'] == p][f'disponibilidade_{dia_semana}'].iloc[0]:
-                prob += lpSum(x[(p, d, t, s, tipo)] 
-                              for s in salas['id_sala'] 
-                              for tipo in demandas['tipo_atendimento'].unique()) <= 1, \
-                          f"R1_Profissional_Um_Atendimento_Por_Turno_{p}_{d}_{t}"
-
-# Restrição 2: Uma sala só pode ser usada por um profissional por turno.
-# Assegura que cada sala seja utilizada por, no máximo, um profissional em cada
-# combinação de dia e turno, conforme a disponibilidade da sala.
-for s in salas['id_sala']:
-    for d in demandas['data']:
-        dia_semana_sala = salas[salas['id_sala'] == s]['dias_funcionamento'].iloc[0]
-        for t in turnos:
-            # Verifica se a sala está disponível para o dia da semana e turno.
-            if pd.isna(dia_semana_sala) or (dia_semana in dia_semana_sala.split(',') and \
-                                            t in salas[salas['id_sala'] == s]['turnos_disponiveis'].iloc[0].split(',')):
-                prob += lpSum(x[(p, d, t, s, tipo)] 
-                              for p in profissionais['id_profissional'] 
-                              for tipo in demandas['tipo_atendimento'].unique()) <= 1, \
-                          f"R2_Sala_Exclusiva_Por_Turno_{s}_{d}_{t}"
-
-# Restrição 3: Atender a demanda prevista ou registrar folga.
-# Para cada combinação de data, turno e tipo de atendimento, a soma dos atendimentos
-# alocados (x) mais a quantidade de folga deve ser igual à demanda prevista.
-for index, row in demandas.iterrows():
-    data = row['data']
-    turno = row['turno']
-    tipo = row['tipo_atendimento']
-    quantidade_prevista = row['quantidade_prevista']
-    prob += lpSum(x[(p, data, turno, s, tipo)] 
-                  for p in profissionais['id_profissional'] 
-                  for s in salas['id_sala']) + folga[(data, turno, tipo)] == quantidade_prevista, \
-              f"R3_Atender_Demanda_ou_Folga_{data}_{turno}_{tipo}"
-
-# Restrição 4: Capacidade máxima da sala por turno.
-# Garante que o número total de atendimentos agendados em uma sala não exceda
-# sua capacidade máxima para aquele turno específico. Cada atendimento ocupa `duracao_atendimento`.
-for s in salas['id_sala']:
-    capacidade_sala = salas[salas['id_sala'] == s]['capacidade'].iloc[0]
-    for d in demandas['data']:
-        dia_semana_sala = salas[salas['id_sala'] == s]['dias_funcionamento'].iloc[0]
-        for t in turnos:
-            # Verifica se a sala está disponível para o dia da semana e turno.
-            if pd.isna(dia_semana_sala) or (dia_semana in dia_semana_sala.split(',') and \
-                                            t in salas[salas['id_sala'] == s]['turnos_disponiveis'].iloc[0].split(',')):
-                prob += lpSum(x[(p, d, t, s, tipo)] * duracao_atendimento
-                              for p in profissionais['id_profissional'] 
-                              for tipo in demandas['tipo_atendimento'].unique()) <= capacidade_sala, \
-                          f"R4_Capacidade_Sala_Por_Turno_{s}_{d}_{t}"
-
-# Restrição 5: Carga horária máxima dos profissionais e balanceamento.
-# Assegura que a carga horária total de cada profissional não exceda seu limite máximo.
-# Além disso, define o `desbalanceamento[p_id]` como a diferença absoluta entre
-# a carga horária do profissional `p_id` e a média esperada.
-for p_id in profissionais['id_profissional']:
-    carga_horaria_max = profissionais[profissionais['id_profissional'] == p_id]['carga_horaria_max'].iloc[0]
-    # Calcula o total de horas agendadas para o profissional p_id.
-    total_horas_p = lpSum(x[(p_id, d, t, s, tipo)] * duracao_atendimento 
-                          for d in demandas['data'] 
-                          for t in turnos 
-                          for s in salas['id_sala'] 
-                          for tipo in demandas['tipo_atendimento'].unique()
-                          if (p_id, d, t, s, tipo) in x) # Garante que a chave existe no dicionário x
-    prob += total_horas_p <= carga_horaria_max, f"R5_Carga_Horaria_Max_{p_id}"
-    
-    # Calculamos a média aproximada da carga horária esperada para todos os profissionais.
-    # Esta média serve como um alvo para o balanceamento da carga de trabalho.
-    media_carga_esperada = (sum(profissionais['carga_horaria_max']) * duracao_atendimento) / len(profissionais['id_profissional'])
-    
-    # Restrições para o desbalanceamento: modelam o valor absoluto.
-    # `desbalanceamento[p_id]` deve ser maior ou igual à diferença positiva
-    # e à diferença negativa entre `total_horas_p` e `media_carga_esperada`.
-    prob += total_horas_p - media_carga_esperada <= desbalanceamento[p_id], f"R5_Desbalanceamento_Positivo_{p_id}"
-    prob += media_carga_esperada - total_horas_p <= desbalanceamento[p_id], f"R5_Desbalanceamento_Negativo_{p_id}"
-
-# =============================================================================
-# Resolução do Problema
-# =============================================================================
-
-# Escreve o problema de Programação Linear em um arquivo no formato .lp.
-# Isso é útil para depuração e para visualizar a estrutura do modelo.
-prob.writeLP("agendamento_psicologico.lp")
-
-# Resolve o problema usando o solver padrão (geralmente CBC, se disponível).
-# O solver encontra os valores ótimos para as variáveis de decisão que satisfazem
-# todas as restrições e otimizam a função objetivo.
-prob.solve()
-
-# Exibe o status da solução encontrada pelo solver (Optimal, Infeasible, Unbounded, etc.).
-print("Status:", LpStatus[prob.status])
-
-# =============================================================================
-# Apresentação dos Resultados
-# =============================================================================
-
-print("\n--- Resultados do Agendamento Psicológico ---")
-
-# Calcula e imprime o total de atendimentos ponderados atendidos.
-# Percorre todas as variáveis de decisão `x` e soma os valores dos atendimentos
-# que foram agendados, multiplicando-os pelos seus respectivos pesos.
-total_atendimentos_ponderados = 0
-for p, d, t, s, tipo_atendimento in x:
-    if x[(p, d, t, s, tipo_atendimento)].varValue is not None and x[(p, d, t, s, tipo_atendimento)].varValue > 0:
-        total_atendimentos_ponderados += pesos[tipo_atendimento] * duracao_atendimento
-
-print(f"Total de atendimentos ponderados: {total_atendimentos_ponderados}")
-
-# Detalha a carga de trabalho de cada profissional.
-# Soma as horas de atendimento alocadas para cada profissional.
-carga_trabalho_profissionais = {p_id: 0 for p_id in profissionais['id_profissional']}
-for p, d, t, s, tipo_atendimento in x:
-    if x[(p, d, t, s, tipo_atendimento)].varValue is not None and x[(p, d, t, s, tipo_atendimento)].varValue > 0:
-        carga_trabalho_profissionais[p] += duracao_atendimento
-
-print("\nCarga horária dos profissionais:")
-for p_id, carga in carga_trabalho_profissionais.items():
-    print(f"  Profissional {p_id}: {carga} horas")
-
-# Detalha a utilização da capacidade das salas por data, turno e sala.
-# Calcula a ocupação de cada sala e compara com sua capacidade máxima.
-capacidade_salas_ocupada = {}
-for d in demandas['data']:
-    for t in turnos:
-        for s in salas['id_sala']:
-            # Soma os valores de x para calcular a ocupação de uma sala em um dado turno.
-            ocupacao = sum(x[(p, d, t, s, tipo)].varValue for p in profissionais['id_profissional'] for tipo in demandas['tipo_atendimento'].unique() if (p, d, t, s, tipo) in x and x[(p, d, t, s, tipo)].varValue is not None)
-            if ocupacao is not None and ocupacao > 0:
-                capacidade_salas_ocupada[(d, t, s)] = ocupacao
-
-print("\nUtilização da capacidade das salas:")
-for (data, turno, sala), ocupacao in capacidade_salas_ocupada.items():
-    capacidade_max = salas[salas['id_sala'] == sala]['capacidade'].iloc[0]
-    print(f"  Data: {data}, Turno: {turno}, Sala: {sala}, Ocupação: {ocupacao:.0f}/{capacidade_max:.0f}")
-
-# Detalha as demandas não atendidas (folga).
-# Exibe a quantidade de cada tipo de demanda que não pôde ser agendada.
-print("\nDemandas não atendidas (folga):")
-folga_total = 0
-for d, t, tipo in folga:
-    if folga[(d, t, tipo)].varValue is not None and folga[(d, t, tipo)].varValue > 0:
-        print(f"  Data: {d}, Turno: {t}, Tipo: {tipo}, Quantidade: {folga[(d, t, tipo)].varValue:.0f}")
-        folga_total += folga[(d, t, tipo)].varValue
-
-if folga_total == 0:
-    print("  Todas as demandas foram atendidas.")
-
-# Imprime o valor final da função objetivo. Este valor reflete o custo total
-# minimizado, considerando os atendimentos agendados, as penalidades por folga
-# e as penalidades por desbalanceamento de carga.
-print(f"\nCusto Total do Objetivo (com penalidade de desbalanceamento): {prob.objective.value():.2f}") 
\ No newline at end of file
+
+def carregar_dados(diretorio='.'):
+    # Carregar os dados de profissionais, salas e demandas a partir de arquivos CSV.
+    # Estes dados são a base para a formulação do problema de otimização.
+    profissionais = pd.read_csv(os.path.join(diretorio, 'profissionais.csv'))
+    salas = pd.read_csv(os.path.join(diretorio, 'salas.csv'))
+    demandas = pd.read_csv(os.path.join(diretorio, 'demandas.csv'))
+
+    # Pré-processamento das disponibilidades dos profissionais.
+    # A coluna de disponibilidade em cada dia é convertida de uma string para uma lista
+    # de turnos, facilitando o acesso e a validação no modelo.
+    for dia in dias:
+        col = f'disponibilidade_{dia}'
+        profissionais[col] = profissionais[col].fillna('').apply(lambda x: [t.strip() for t in str(x).split(',') if t.strip()])
+    return profissionais, salas, demandas
+
+
+def preparar_indices(profissionais, salas, demandas):
+    # Índices a partir de DataFrames já carregados; ver `indices_da_instancia`.
+    return indices_da_instancia(Instancia.de_dataframes(profissionais, salas, demandas))
+
+
+def indices_da_instancia(instancia):
+    ids = instancia.profissionais
+
+    # (dia, turno) em que cada profissional está disponível.
+    disponivel = {p: instancia.turnos_disponiveis(p) for p in ids}
+
+    # Salas abertas em cada (dia, turno). Uma sala sem dias de funcionamento
+    # informados é considerada aberta em todos os dias e turnos.
+    salas_abertas = {(dia, turno): instancia.salas_abertas(dia, turno) for dia in dias for turno in turnos}
+
+    # Demanda por (data, turno, tipo) e dia da semana de cada data. As datas
+    # aparecem repetidas em `demandas` (uma linha por turno e tipo); a instância
+    # já as deduplica.
+    return {
+        'profissionais': ids,
+        'carga_max': instancia.carga_max,
+        'disponivel': disponivel,
+        'capacidade_sala': instancia.capacidade_sala,
+        'salas_abertas': salas_abertas,
+        'demanda': instancia.demanda,
+        'dia_da_data': instancia.dia_da_data,
+    }
+
+
+def funcao_objetivo(x, folga, desbalanceamento, pesos_tipo=None, coef_folga=1, coef_desbalanceamento=0.1):
+    # Componente 1: Soma ponderada dos atendimentos alocados (benefício).
+    # Componente 2: Penalidade por demandas não atendidas (folga), ponderada pelos `pesos`.
+    # Componente 3: Penalidade pelo desbalanceamento da carga de trabalho dos profissionais.
+    pesos_tipo = pesos_tipo or pesos
+    termos = [(var, pesos_tipo[chave[4]] * duracao_atendimento) for chave, var in x.items()]
+    termos += [(var, -coef_folga * pesos_tipo[chave[2]]) for chave, var in folga.items()]
+    termos += [(var, -coef_desbalanceamento) for var in desbalanceamento.values()]
+    objetivo = LpAffineExpression(termos)
+    objetivo.name = "Total_de_Atendimentos_Ponderados_e_Balanceamento"
+    return objetivo
+
+
+def construir_modelo(indices, perfil=PERFILADOR_NULO, **coeficientes):
+    # `perfil` cronometra a criação das variáveis e de cada família de restrições.
+    # `coeficientes` (pesos_tipo, coef_folga, coef_desbalanceamento) substituem os
+    # pesos padrão da função objetivo.
+    ids = indices['profissionais']
+    disponivel = indices['disponivel']
+    salas_abertas = indices['salas_abertas']
+    dia_da_data = indices['dia_da_data']
+
+    # Criar o problema de Programação Linear. Definido como um problema de maximização
+    # (`LpMaximize`), pois o objetivo principal é maximizar o valor total dos atendimentos.
+    prob = LpProblem("Agendamento_Psicologico", LpMaximize)
+
+    # =========================================================================
+    # Variáveis de Decisão
+    # =========================================================================
+
+    # Variável binária `x[(p, d, t, s, tipo_atendimento)]`:
+    # Representa se um profissional `p` está agendado para um atendimento do tipo
+    # `tipo_atendimento` em uma data `d`, turno `t`, na sala `s`.
+    # Valor 1: o agendamento ocorre; Valor 0: não ocorre.
+    # Só são criadas as combinações viáveis: existe demanda daquele tipo em (d, t),
+    # o profissional está disponível e a sala funciona naquele dia da semana e turno.
+    with perfil.fase('variaveis'):
+        chaves = [(p, d, t, s, tipo)
+                  for (d, t, tipo) in indices['demanda']
+                  for p in ids if (dia_da_data[d], t) in disponivel[p]
+                  for s in salas_abertas[(dia_da_data[d], t)]]
+        x = LpVariable.dicts("x", chaves, 0, 1, LpBinary)
+
+    # Variável contínua `folga[(data, turno, tipo_atendimento)]`:
+    # Indica a quantidade de demandas de um `tipo_atendimento` específico em uma
+    # `data` e `turno` que não puderam ser atendidas. Essencial para quantificar
+    # a demanda reprimida e aplicar penalidades na função objetivo.
+    folga = LpVariable.dicts("folga", list(indices['demanda']), 0, None, LpContinuous)
+
+    # Variável contínua `desbalanceamento[p]`:
+    # Mede o desvio absoluto da carga horária de um profissional `p` em relação à
+    # carga horária média esperada de todos os profissionais. Utilizada para penalizar
+    # desequilíbrios na distribuição de trabalho na função objetivo.
+    desbalanceamento = LpVariable.dicts("desbalanceamento", ids, 0, None, LpContinuous)
+
+    # Agrupamentos das variáveis usados pelas restrições, montados em uma única passada.
+    with perfil.fase('agrupamentos'):
+        por_profissional_turno = {}
+        por_sala_turno = {}
+        por_demanda = {}
+        por_profissional = {p: [] for p in ids}
+        for chave in chaves:
+            p, d, t, s, tipo = chave
+            var = x[chave]
+            por_profissional_turno.setdefault((p, d, t), []).append(var)
+            por_sala_turno.setdefault((s, d, t), []).append(var)
+            por_demanda.setdefault((d, t, tipo), []).append(var)
+            por_profissional[p].append(var)
+
+    # =========================================================================
+    # Função Objetivo
+    # =========================================================================
+
+    # A função objetivo busca MAXIMIZAR o benefício total dos atendimentos agendados
+    # e MINIMIZAR as penalidades associadas às demandas não atendidas (folga) e ao
+    # desequilíbrio da carga de trabalho dos profissionais.
+    # Os componentes estão em `funcao_objetivo`.
+    with perfil.fase('objetivo'):
+        prob.setObjective(funcao_objetivo(x, folga, desbalanceamento, **coeficientes))
+
+    # =========================================================================
+    # Restrições
+    # =========================================================================
+
+    # Restrição 1: Um profissional só pode realizar um atendimento por turno específico.
+    # Garante que cada psicólogo esteja agendado para, no máximo, um atendimento
+    # por cada combinação de dia e turno, respeitando sua disponibilidade.
+    with perfil.fase('restricoes_R1'):
+        for (p, d, t), vars_ in por_profissional_turno.items():
+            prob += lpSum(vars_) <= 1, f"R1_Profissional_Um_Atendimento_Por_Turno_{p}_{d}_{t}"
+
+    # Restrição 2: Uma sala só pode ser usada por um profissional por turno.
+    # Assegura que cada sala seja utilizada por, no máximo, um profissional em cada
+    # combinação de dia e turno, conforme a disponibilidade da sala.
+    with perfil.fase('restricoes_R2'):
+        for (s, d, t), vars_ in por_sala_turno.items():
+            prob += lpSum(vars_) <= 1, f"R2_Sala_Exclusiva_Por_Turno_{s}_{d}_{t}"
+
+    # Restrição 3: Atender a demanda prevista ou registrar folga.
+    # Para cada combinação de data, turno e tipo de atendimento, a soma dos atendimentos
+    # alocados (x) mais a quantidade de folga deve ser igual à demanda prevista.
+    with perfil.fase('restricoes_R3'):
+        for (d, t, tipo), quantidade_prevista in indices['demanda'].items():
+            prob += lpSum(por_demanda.get((d, t, tipo), [])) + folga[(d, t, tipo)] == quantidade_prevista, \
+                    f"R3_Atender_Demanda_ou_Folga_{d}_{t}_{tipo}"
+
+    # Restrição 4: Capacidade máxima da sala por turno.
+    # Garante que o número total de atendimentos agendados em uma sala não exceda
+    # sua capacidade máxima para aquele turno específico. Cada atendimento ocupa `duracao_atendimento`.
+    with perfil.fase('restricoes_R4'):
+        for (s, d, t), vars_ in por_sala_turno.items():
+            prob += lpSum(v * duracao_atendimento for v in vars_) <= indices['capacidade_sala'][s], \
+                    f"R4_Capacidade_Sala_Por_Turno_{s}_{d}_{t}"
+
+    # Restrição 5: Carga horária máxima dos profissionais e balanceamento.
+    # Assegura que a carga horária total de cada profissional não exceda seu limite máximo.
+    # Além disso, define o `desbalanceamento[p_id]` como a diferença absoluta entre
+    # a carga horária do profissional `p_id` e a média esperada.
+    # A média aproximada da carga horária esperada serve como alvo para o balanceamento.
+    media_carga_esperada = (sum(indices['carga_max'].values()) * duracao_atendimento) / len(ids)
+    with perfil.fase('restricoes_R5'):
+        for p_id in ids:
+            # Calcula o total de horas agendadas para o profissional p_id.
+            total_horas_p = lpSum(v * duracao_atendimento for v in por_profissional[p_id])
+            prob += total_horas_p <= indices['carga_max'][p_id], f"R5_Carga_Horaria_Max_{p_id}"
+
+            # Restrições para o desbalanceamento: modelam o valor absoluto.
+            # `desbalanceamento[p_id]` deve ser maior ou igual à diferença positiva
+            # e à diferença negativa entre `total_horas_p` e `media_carga_esperada`.
+            prob += total_horas_p - media_carga_esperada <= desbalanceamento[p_id], \
+                    f"R5_Desbalanceamento_Positivo_{p_id}"
+            prob += media_carga_esperada - total_horas_p <= desbalanceamento[p_id], \
+                    f"R5_Desbalanceamento_Negativo_{p_id}"
+
+    perfil.contar_modelo(prob)
+    return prob, x, folga, desbalanceamento
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Modelo de agendamento psicológico.")
+    parser.add_argument('--lp', metavar='ARQUIVO.lp', help="Grava o modelo no formato .lp")
+    parser.add_argument('--saida', metavar='ARQUIVO', type=extracao.arquivo_saida,
+                        help="Grava a agenda (e a folga) em .csv ou .parquet")
+    adicionar_argumentos(parser)
+    presolve.adicionar_argumentos(parser)
+    instrumentacao.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    perfil = instrumentacao.perfilador_de_argumentos(args)
+
+    # Instância lida do cache compilado (recompilado quando os CSVs mudam)
+    with perfil.fase('carga_dados'):
+        instancia = Instancia('.').carregar()
+    with perfil.fase('indices'):
+        indices = indices_da_instancia(instancia)
+    with perfil.fase('construcao'):
+        prob, x, folga, desbalanceamento = construir_modelo(indices, perfil=perfil)
+
+    # =============================================================================
+    # Resolução do Problema
+    # =============================================================================
+
+    # Escreve o problema de Programação Linear em um arquivo no formato .lp quando
+    # pedido (--lp). Isso é útil para depuração e para visualizar a estrutura do modelo.
+    if args.lp:
+        with perfil.fase('escrita_lp'):
+            prob.writeLP(args.lp)
+
+    # Resolve o problema usando o CBC. O solver encontra os valores ótimos para as
+    # variáveis de decisão que satisfazem todas as restrições e otimizam a função
+    # objetivo. Threads, limite de tempo, gap e o modo corrida vêm da linha de comando.
+    with perfil.fase('resolucao'):
+        imprimir_resumo(presolve.resolver_com_presolve(prob, args, resolver_com_argumentos, perfil))
+
+    # Exibe o status da solução encontrada pelo solver (Optimal, Infeasible, Unbounded, etc.).
+    print("Status:", LpStatus[prob.status])
+
+    # =============================================================================
+    # Apresentação dos Resultados
+    # =============================================================================
+
+    with perfil.fase('extracao'):
+        # Lê os valores das variáveis uma única vez para tabelas (uma linha por
+        # atendimento e uma por demanda); os relatórios abaixo são agregações delas.
+        agenda = extracao.tabela_agenda(x, extracao.CAMPOS_AGENDAMENTO)
+        folgas = extracao.tabela_folga(folga)
+        if args.saida:
+            extracao.salvar_solucao(args.saida, agenda, folgas)
+
+        print("\n--- Resultados do Agendamento Psicológico ---")
+
+        # Total de atendimentos ponderados: soma dos pesos dos atendimentos agendados.
+        coef_atendimento = {tipo: peso * duracao_atendimento for tipo, peso in pesos.items()}
+        total_atendimentos_ponderados = agenda['tipo_atendimento'].map(coef_atendimento).sum()
+        print(f"Total de atendimentos ponderados: {total_atendimentos_ponderados}")
+
+        # Carga de trabalho de cada profissional: horas de atendimento alocadas.
+        print("\nCarga horária dos profissionais:")
+        carga = extracao.carga_por_profissional(agenda, duracao_atendimento, indices['profissionais'])
+        for p_id, horas in carga.items():
+            print(f"  Profissional {p_id}: {horas} horas")
+
+        # Utilização da capacidade das salas por data, turno e sala, comparada à capacidade máxima.
+        print("\nUtilização da capacidade das salas:")
+        ocupacao = extracao.ocupacao_salas(agenda, indices['capacidade_sala'], duracao_atendimento)
+        for data, turno, sala, horas, capacidade_max in ocupacao.itertuples(index=False):
+            print(f"  Data: {data}, Turno: {turno}, Sala: {sala}, Ocupação: {horas:.0f}/{capacidade_max:.0f}")
+
+        # Demandas não atendidas (folga): quantidade de cada tipo de demanda que não pôde ser agendada.
+        print("\nDemandas não atendidas (folga):")
+        nao_atendidas = folgas[folgas['folga'] > 0]
+        for data, turno, tipo, quantidade in nao_atendidas.itertuples(index=False):
+            print(f"  Data: {data}, Turno: {turno}, Tipo: {tipo}, Quantidade: {quantidade:.0f}")
+        if nao_atendidas.empty:
+            print("  Todas as demandas foram atendidas.")
+        else:
+            print("  Por tipo:", extracao.folga_por_tipo(nao_atendidas).to_dict())
+
+        # Composição do objetivo: benefício dos atendimentos, penalidade por folga e
+        # penalidade por desbalanceamento de carga.
+        composicao = extracao.composicao_objetivo(
+            agenda, folgas, coef_atendimento, {tipo: -peso for tipo, peso in pesos.items()},
+            {'desbalanceamento': -0.1 * sum(v.varValue or 0 for v in desbalanceamento.values())})
+        print("\nComposição do objetivo:")
+        for parte, valor in composicao.items():
+            print(f"  {parte}: {valor:.2f}")
+
+        # Valor final da função objetivo, considerando os atendimentos agendados, as
+        # penalidades por folga e as penalidades por desbalanceamento de carga.
+        print(f"\nCusto Total do Objetivo (com penalidade de desbalanceamento): {prob.objective.value():.2f}")
+
+    instrumentacao.finalizar(perfil, args)
@@ -1,67 +1,269 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import argparse
+import concurrent.futures
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import time
+
 import numpy as np
+import pandas as pd
+
+import extracao
+from instancia import Instancia, dias, tipos, turnos
+
+# Geração dos gráficos de apresentação em duas etapas. Primeiro os dados de cada
+# gráfico são agregados de forma vetorizada (arrays da instância e groupby nas
+# tabelas da solução); depois só os gráficos cujos dados mudaram são desenhados,
+# em processos separados com o backend Agg. O hash dos dados agregados e do código
+# de desenho de cada gráfico fica em `.apresentacao_hashes.json`, no diretório de
+# saída; o pyplot só é importado quando há algo a desenhar.
+#
+# Com `--agenda` (arquivo gravado por `--saida` em um dos modelos, com a folga ao
+# lado em `<agenda>_folga.csv`), entram também os gráficos da solução: carga por
+# profissional, ocupação das salas e folga por tipo.
+
+MANIFESTO = '.apresentacao_hashes.json'
+
+
+# =============================================================================
+# Agregação dos dados
+# =============================================================================
+
+def dados_instancia(instancia):
+    # Dados dos quatro gráficos da instância, indexados pelo arquivo de saída.
+    linhas = pd.DataFrame(instancia.linhas, columns=['data', 'dia_semana', 'turno', 'tipo_atendimento',
+                                                     'quantidade_prevista'])
+    linhas['rotulo'] = linhas['data'] + ' ' + linhas['turno']
+    demanda = {tipo: (grupo['rotulo'].tolist(), grupo['quantidade_prevista'].tolist())
+               for tipo, grupo in linhas.groupby('tipo_atendimento', sort=False)}
+
+    capacidade = instancia.arrays['capacidade_slot'].sum(axis=0)
+    turnos_por_dia = instancia.matriz_disponibilidade().reshape(-1, len(dias), len(turnos)).sum(axis=2)
+    return {
+        'apres_demanda_prevista.png': ('demanda_prevista', demanda),
+        'apres_capacidade_salas.png': ('capacidade_salas', {
+            'rotulos': [f'{dia}\n{turno}' for dia in dias for turno in turnos],
+            'capacidade': capacidade.tolist()}),
+        'apres_carga_profissionais.png': ('carga_maxima', {
+            'nomes': instancia.nomes, 'carga_max': list(instancia.carga_max.values())}),
+        'apres_disponibilidade_profissionais.png': ('disponibilidade', {
+            'nomes': instancia.nomes, 'turnos_por_dia': turnos_por_dia.tolist()}),
+    }
+
+
+def dados_solucao(instancia, agenda, folgas, duracao=1):
+    # Dados dos gráficos da agenda resolvida (escalonamento ou agendamento).
+    ids = instancia.profissionais
+    datas = pd.to_datetime(pd.Series(instancia.datas)).dt.isocalendar()
+    n_semanas = len(datas[['year', 'week']].drop_duplicates())
+    carga = extracao.carga_por_profissional(agenda, duracao, ids)
+
+    # Ocupação por sala (ou por turno, na agenda sem salas) e (data, turno), dividida
+    # pela capacidade do slot; turnos em que a sala está fechada ficam em branco.
+    colunas = pd.MultiIndex.from_product([instancia.datas, turnos], names=['data', 'turno'])
+    dia = pd.Series(instancia.dia_da_data).map(dias.index)
+    slots = dia.loc[colunas.get_level_values('data')].to_numpy() * len(turnos) + \
+        np.tile(np.arange(len(turnos)), len(instancia.datas))
+    capacidade_slot = instancia.arrays['capacidade_slot'][:, slots]
+    if 'sala' in agenda:
+        ocupacao = agenda.groupby(['sala', 'data', 'turno']).size().unstack(['data', 'turno'])
+        ocupacao = ocupacao.reindex(index=instancia.salas, columns=colunas, fill_value=0).fillna(0)
+        linhas_mapa = [f'Sala {s}' for s in instancia.salas]
+    else:
+        ocupacao = agenda.groupby(['data', 'turno']).size().reindex(colunas, fill_value=0).to_frame().T
+        capacidade_slot = capacidade_slot.sum(axis=0, keepdims=True)
+        linhas_mapa = ['Todas as salas']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        utilizacao = np.where(capacidade_slot > 0, ocupacao.to_numpy() * duracao / capacidade_slot, np.nan)
+
+    por_tipo = folgas.pivot_table(index='tipo_atendimento', columns='turno', values='folga', aggfunc='sum',
+                                  fill_value=0).reindex(index=tipos, columns=turnos, fill_value=0)
+    return {
+        'apres_carga_agenda.png': ('carga_agenda', {
+            'nomes': instancia.nomes, 'horas': carga.to_numpy().tolist(),
+            'limite': [c * n_semanas for c in instancia.carga_max.values()]}),
+        'apres_ocupacao_salas.png': ('ocupacao_salas', {
+            'linhas': linhas_mapa, 'colunas': [f'{d}\n{t}' for d, t in colunas], 'utilizacao': utilizacao}),
+        'apres_folga_tipo.png': ('folga_tipo', {
+            'tipos': por_tipo.index.tolist(), 'turnos': turnos, 'folga': por_tipo.to_numpy().tolist()}),
+    }
+
+
+# =============================================================================
+# Desenho (executado nos processos do pool)
+# =============================================================================
+
+def demanda_prevista(plt, dados, caminho):
+    # 1. Gráfico: Demanda prevista por tipo e turno ao longo da semana
+    plt.figure(figsize=(14,6))
+    for tipo, (rotulos, quantidades) in dados.items():
+        plt.plot(rotulos, quantidades, marker='o', label=tipo)
+    plt.xticks(rotation=90)
+    plt.ylabel('Demanda Prevista')
+    plt.title('Demanda Prevista por Tipo de Atendimento e Turno')
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(caminho)
+    plt.close()
+
+
+def capacidade_salas(plt, dados, caminho):
+    # 2. Gráfico: Capacidade total das salas por turno
+    plt.figure(figsize=(10,5))
+    plt.bar(dados['rotulos'], dados['capacidade'], color='mediumseagreen')
+    plt.ylabel('Capacidade Total das Salas')
+    plt.title('Capacidade Total das Salas por Dia e Turno')
+    plt.tight_layout()
+    plt.savefig(caminho)
+    plt.close()
+
+
+def carga_maxima(plt, dados, caminho):
+    # 3. Gráfico: Carga horária máxima dos profissionais
+    plt.figure(figsize=(8,5))
+    plt.bar(dados['nomes'], dados['carga_max'], color='cornflowerblue')
+    plt.ylabel('Carga Horária Máxima (h/semana)')
+    plt.title('Carga Horária Máxima dos Profissionais')
+    plt.xticks(rotation=30)
+    plt.tight_layout()
+    plt.savefig(caminho)
+    plt.close()
+
+
+def disponibilidade(plt, dados, caminho):
+    # 4. Gráfico: Disponibilidade dos profissionais por dia da semana
+    plt.figure(figsize=(12,6))
+    for nome, disponiveis in zip(dados['nomes'], dados['turnos_por_dia']):
+        plt.plot(dias, disponiveis, marker='o', label=nome)
+    plt.ylabel('Turnos Disponíveis')
+    plt.title('Disponibilidade dos Profissionais por Dia da Semana')
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(caminho)
+    plt.close()
+
+
+def carga_agenda(plt, dados, caminho):
+    # 5. Gráfico: Horas agendadas por profissional, com o limite no horizonte
+    plt.figure(figsize=(8,5))
+    plt.bar(dados['nomes'], dados['horas'], color='cornflowerblue', label='Horas agendadas')
+    plt.scatter(dados['nomes'], dados['limite'], color='firebrick', marker='_', s=600, label='Carga máxima')
+    plt.ylabel('Horas')
+    plt.title('Carga Horária Agendada por Profissional')
+    plt.xticks(rotation=30)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(caminho)
+    plt.close()
+
+
+def ocupacao_salas(plt, dados, caminho):
+    # 6. Gráfico: Mapa de calor da ocupação das salas por data e turno
+    utilizacao = np.ma.masked_invalid(np.asarray(dados['utilizacao'], dtype=float))
+    plt.figure(figsize=(max(8, 0.5 * len(dados['colunas'])), 1.5 + 0.5 * len(dados['linhas'])))
+    plt.imshow(utilizacao, aspect='auto', cmap='YlOrRd', vmin=0, vmax=1)
+    plt.colorbar(label='Ocupação / capacidade')
+    plt.xticks(range(len(dados['colunas'])), dados['colunas'], rotation=90)
+    plt.yticks(range(len(dados['linhas'])), dados['linhas'])
+    plt.title('Ocupação das Salas por Data e Turno')
+    plt.tight_layout()
+    plt.savefig(caminho)
+    plt.close()
+
+
+def folga_tipo(plt, dados, caminho):
+    # 7. Gráfico: Demanda não atendida (folga) por tipo, empilhada por turno
+    plt.figure(figsize=(8,5))
+    base = np.zeros(len(dados['tipos']))
+    for j, turno in enumerate(dados['turnos']):
+        valores = np.array([linha[j] for linha in dados['folga']], dtype=float)
+        plt.bar(dados['tipos'], valores, bottom=base, label=turno)
+        base += valores
+    plt.ylabel('Demanda Não Atendida')
+    plt.title('Folga por Tipo de Atendimento')
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(caminho)
+    plt.close()
+
+
+GRAFICOS = {f.__name__: f for f in (demanda_prevista, capacidade_salas, carga_maxima, disponibilidade,
+                                     carga_agenda, ocupacao_salas, folga_tipo)}
+
+
+def _desenhar(grafico, dados, caminho):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    GRAFICOS[grafico](plt, dados, caminho)
+    return caminho
+
+
+# =============================================================================
+# Cache e execução
+# =============================================================================
+
+def hash_grafico(grafico, dados):
+    # Muda quando os dados agregados ou o código de desenho do gráfico mudam.
+    h = hashlib.sha256(inspect.getsource(GRAFICOS[grafico]).encode())
+    h.update(pickle.dumps(dados, protocol=4))
+    return h.hexdigest()
+
+
+def gerar(graficos, diretorio_saida='.', processos=None, forcar=False):
+    # Desenha os gráficos pendentes em paralelo; devolve (gerados, pulados).
+    caminho_manifesto = os.path.join(diretorio_saida, MANIFESTO)
+    manifesto = {}
+    if os.path.exists(caminho_manifesto) and not forcar:
+        with open(caminho_manifesto) as f:
+            manifesto = json.load(f)
+
+    pendentes = {}
+    for arquivo, (grafico, dados) in graficos.items():
+        h = hash_grafico(grafico, dados)
+        if forcar or manifesto.get(arquivo) != h or not os.path.exists(os.path.join(diretorio_saida, arquivo)):
+            pendentes[arquivo] = (grafico, dados, h)
+
+    if pendentes:
+        processos = processos or min(len(pendentes), os.cpu_count() or 1)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processos) as executor:
+            futuros = {arquivo: executor.submit(_desenhar, grafico, dados, os.path.join(diretorio_saida, arquivo))
+                       for arquivo, (grafico, dados, _) in pendentes.items()}
+            for arquivo, futuro in futuros.items():
+                futuro.result()
+                manifesto[arquivo] = pendentes[arquivo][2]
+        with open(caminho_manifesto, 'w') as f:
+            json.dump(manifesto, f, indent=2, sort_keys=True)
+    return list(pendentes), [arquivo for arquivo in graficos if arquivo not in pendentes]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gera os gráficos de apresentação dos dados e da solução.")
+    parser.add_argument('--diretorio', default='.')
+    parser.add_argument('--saida', default='.', help="Diretório dos PNGs")
+    parser.add_argument('--agenda', metavar='ARQUIVO',
+                        help="Agenda gravada por --saida de um dos modelos (a folga fica em <agenda>_folga)")
+    parser.add_argument('--duracao', type=float, default=1, help="Duração de cada atendimento, em horas")
+    parser.add_argument('--processos', type=int)
+    parser.add_argument('--forcar', action='store_true', help="Redesenha mesmo os gráficos inalterados")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    instancia = Instancia(args.diretorio)
+    graficos = dados_instancia(instancia)
+    if args.agenda:
+        base, extensao = os.path.splitext(args.agenda)
+        graficos.update(dados_solucao(instancia, extracao.ler(args.agenda), extracao.ler(f"{base}_folga{extensao}"),
+                                      args.duracao))
+    os.makedirs(args.saida, exist_ok=True)
+    gerados, pulados = gerar(graficos, args.saida, args.processos, args.forcar)
 
-df_prof = pd.read_csv('profissionais.csv')
-df_salas = pd.read_csv('salas.csv')
-df_demanda = pd.read_csv('demandas.csv')
-
-dias = ['seg', 'ter', 'qua', 'qui', 'sex', 'sab']
-turnos = ['manhã', 'tarde']
-
-# 1. Gráfico: Demanda prevista por tipo e turno ao longo da semana
-plt.figure(figsize=(14,6))
-for tipo in df_demanda['tipo_atendimento'].unique():
-    dados = df_demanda[df_demanda['tipo_atendimento'] == tipo]
-    plt.plot(dados['data'] + ' ' + dados['turno'], dados['quantidade_prevista'], marker='o', label=tipo)
-plt.xticks(rotation=90)
-plt.ylabel('Demanda Prevista')
-plt.title('Demanda Prevista por Tipo de Atendimento e Turno')
-plt.legend()
-plt.tight_layout()
-plt.savefig('apres_demanda_prevista.png')
-plt.close()
-
-# 2. Gráfico: Capacidade total das salas por turno
-capacidade_turno = []
-labels_turno = []
-for dia in dias:
-    for turno in turnos:
-        cap = df_salas[df_salas['dias_funcionamento'].str.contains(dia) & df_salas['turnos_disponiveis'].str.contains(turno)]['capacidade'].sum()
-        capacidade_turno.append(cap)
-        labels_turno.append(f'{dia}\n{turno}')
-plt.figure(figsize=(10,5))
-plt.bar(labels_turno, capacidade_turno, color='mediumseagreen')
-plt.ylabel('Capacidade Total das Salas')
-plt.title('Capacidade Total das Salas por Dia e Turno')
-plt.tight_layout()
-plt.savefig('apres_capacidade_salas.png')
-plt.close()
-
-# 3. Gráfico: Carga horária máxima dos profissionais
-plt.figure(figsize=(8,5))
-plt.bar(df_prof['nome'], df_prof['carga_horaria_max'], color='cornflowerblue')
-plt.ylabel('Carga Horária Máxima (h/semana)')
-plt.title('Carga Horária Máxima dos Profissionais')
-plt.xticks(rotation=30)
-plt.tight_layout()
-plt.savefig('apres_carga_profissionais.png')
-plt.close()
-
-# 4. Gráfico: Disponibilidade dos profissionais por dia da semana
-plt.figure(figsize=(12,6))
-for idx, row in df_prof.iterrows():
-    disponiveis = [len(str(row[f'disponibilidade_{dia}']).split(',')) if pd.notnull(row[f'disponibilidade_{dia}']) else 0 for dia in dias]
-    plt.plot(dias, disponiveis, marker='o', label=row['nome'])
-plt.ylabel('Turnos Disponíveis')
-plt.title('Disponibilidade dos Profissionais por Dia da Semana')
-plt.legend()
-plt.tight_layout()
-plt.savefig('apres_disponibilidade_profissionais.png')
-plt.close()
-
-print('Gráficos gerados:')
-print('- apres_demanda_prevista.png')
-print('- apres_capacidade_salas.png')
-print('- apres_carga_profissionais.png')
-print('- apres_disponibilidade_profissionais.png') 
\ No newline at end of file
+    print(f'Gráficos gerados ({time.perf_counter() - inicio:.2f}s):')
+    for arquivo in gerados:
+        print(f'- {arquivo}')
+    if pulados:
+        print('Inalterados (pulados):')
+        for arquivo in pulados:
+            print(f'- {arquivo}')
@@ -0,0 +1,197 @@
+import argparse
+import datetime
+import json
+import multiprocessing as mp
+import os
+import queue
+import subprocess
+import tempfile
+import time
+
+import pandas as pd
+
+import agendamento_psicologico as ap
+import extracao
+import modelo_escalonamento as me
+import subturnos as st
+from configuracao_solver import adicionar_argumentos, configuracao_de_argumentos, resolver
+from gerador_instancias import gerar_instancia, salvar_instancia
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Benchmark de escalabilidade dos dois modelos sobre instâncias sintéticas. Cada
+# combinação (tamanho, modelo) roda em um processo próprio, para que o pico de
+# memória (RSS) medido seja apenas o daquela execução. Os resultados são gravados
+# em JSON e CSV, com o commit atual, para comparação entre versões.
+
+# Os modelos de subturnos usam os dados e índices do agendamento, com construtor próprio;
+# a formulação agregada parte da escala gulosa (warm start). subturnos e
+# subturnos_ingenuo resolvem o mesmo problema (uma sala por profissional no turno);
+# subturnos_livre é a formulação por slot sem essa regra.
+MODELOS = {'escalonamento': me, 'agendamento': ap, 'subturnos': ap, 'subturnos_ingenuo': ap, 'subturnos_livre': ap}
+CONSTRUTORES = {'subturnos': st.construir_com_inicio, 'subturnos_ingenuo': st.construir_modelo_ingenuo,
+                'subturnos_livre': lambda indices: st.construir_modelo_ingenuo(indices, sala_unica=False)}
+
+
+def _contar_agenda(campos):
+    # Um atendimento por variável binária escolhida; `campos` nomeia as chaves de x.
+    return lambda x, folga: (len(extracao.tabela_agenda(x, campos)), extracao.tabela_folga(folga)['folga'].sum())
+
+
+def _contar_sessoes(n, folga):
+    # Formulação agregada dos subturnos: n[p, d, t, tipo] já é o número de sessões.
+    return int(sum(round(v.varValue or 0) for v in n.values())), extracao.tabela_folga(folga)['folga'].sum()
+
+
+# (atendimentos, folga total) da solução, a partir das variáveis devolvidas pelo construtor
+CONTAGENS = {'escalonamento': _contar_agenda(extracao.CAMPOS_ESCALONAMENTO),
+             'agendamento': _contar_agenda(extracao.CAMPOS_AGENDAMENTO),
+             'subturnos': _contar_sessoes,
+             'subturnos_ingenuo': _contar_agenda(st.CAMPOS_INGENUO),
+             'subturnos_livre': _contar_agenda(st.CAMPOS_INGENUO)}
+
+
+def _pico_rss_mb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB no Linux
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def medir(nome_modelo, diretorio, config):
+    # Mede cada fase de um modelo sobre a instância gravada em `diretorio`.
+    script = MODELOS[nome_modelo]
+    tempos = {}
+
+    inicio = time.perf_counter()
+    profissionais, salas, demandas = script.carregar_dados(diretorio)
+    tempos['carga'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    construir = CONSTRUTORES.get(nome_modelo, script.construir_modelo)
+    prob, x, folga = construir(script.preparar_indices(profissionais, salas, demandas))[:3]
+    tempos['construcao'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    prob.writeLP(os.path.join(diretorio, 'modelo.lp'))
+    tempos['escrita_lp'] = time.perf_counter() - inicio
+
+    resultado = resolver(prob, config, warm_start=nome_modelo == 'subturnos')
+    tempos['resolucao'] = resultado.tempo
+
+    # Sem solução viável, os valores nas variáveis são os da relaxação: nada a contar.
+    inicio = time.perf_counter()
+    atendimentos, folga_total = CONTAGENS[nome_modelo](x, folga) if resultado.objetivo is not None else (None, None)
+    tempos['extracao'] = time.perf_counter() - inicio
+
+    return {
+        'modelo': nome_modelo,
+        'variaveis': prob.numVariables(),
+        'restricoes': prob.numConstraints(),
+        **{f'tempo_{fase}': t for fase, t in tempos.items()},
+        'status': resultado.status,
+        'objetivo': resultado.objetivo,
+        'gap': resultado.gap,
+        'interrompido': resultado.interrompido,  # parou no limite de tempo: status "Optimal" não provado
+        'atendimentos': atendimentos,
+        'folga_total': folga_total,
+        'pico_rss_mb': _pico_rss_mb(),
+    }
+
+
+def _executar_caso(tamanho, nome_modelo, semente, config, fila):
+    n_prof, n_salas, n_semanas = tamanho
+    with tempfile.TemporaryDirectory() as diretorio:
+        salvar_instancia(diretorio, *gerar_instancia(n_prof, n_salas, n_semanas, semente))
+        resultado = medir(nome_modelo, diretorio, config)
+    fila.put(dict(profissionais=n_prof, salas=n_salas, semanas=n_semanas, semente=semente, **resultado))
+
+
+def _aguardar(processo, fila):
+    # Resultado do processo filho, ou None se ele terminar (falha, falta de memória)
+    # sem entregá-lo.
+    while True:
+        try:
+            return fila.get(timeout=1)
+        except queue.Empty:
+            if not processo.is_alive():
+                try:
+                    return fila.get(timeout=1)  # entregue logo antes de terminar
+                except queue.Empty:
+                    return None
+
+
+def executar_benchmark(tamanhos, modelos, semente=0, config=None):
+    contexto = mp.get_context('spawn')
+    resultados = []
+    for tamanho in tamanhos:
+        for nome_modelo in modelos:
+            fila = contexto.Queue()
+            processo = contexto.Process(target=_executar_caso, args=(tamanho, nome_modelo, semente, config, fila))
+            processo.start()
+            linha = _aguardar(processo, fila)
+            processo.join()
+            if linha is None:
+                n_prof, n_salas, n_semanas = tamanho
+                linha = dict(profissionais=n_prof, salas=n_salas, semanas=n_semanas, semente=semente,
+                             modelo=nome_modelo, status=f'Falhou (código de saída {processo.exitcode})')
+                print(f"{tamanho} {nome_modelo}: {linha['status']}")
+            else:
+                print(f"{tamanho} {nome_modelo}: {linha['variaveis']} variáveis, "
+                      f"construção {linha['tempo_construcao']:.2f}s, resolução {linha['tempo_resolucao']:.2f}s")
+            resultados.append(linha)
+    return pd.DataFrame(resultados)
+
+
+def comparar(atual, anterior):
+    # Razão atual/anterior dos tempos e da memória para os casos presentes nos dois resultados.
+    chaves = ['profissionais', 'salas', 'semanas', 'modelo']
+    colunas = [c for c in atual.columns if c.startswith('tempo_')] + ['pico_rss_mb']
+    juntos = atual.merge(anterior, on=chaves, suffixes=('', '_anterior'))
+    for c in colunas:
+        juntos[f'razao_{c}'] = juntos[c] / juntos[f'{c}_anterior']
+    return juntos[chaves + [f'razao_{c}' for c in colunas]]
+
+
+def _tamanho(texto):
+    # Formato PROFISSIONAISxSALASxSEMANAS, por exemplo 50x20x12
+    n_prof, n_salas, n_semanas = (int(v) for v in texto.lower().split('x'))
+    return n_prof, n_salas, n_semanas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de escalabilidade dos modelos em instâncias sintéticas.")
+    parser.add_argument('--tamanhos', nargs='+', type=_tamanho, default=[(5, 3, 1), (20, 8, 4), (50, 20, 12)],
+                        help="Tamanhos no formato PROFISSIONAISxSALASxSEMANAS")
+    parser.add_argument('--modelos', nargs='+', choices=sorted(MODELOS),
+                        default=['agendamento', 'escalonamento', 'subturnos'])
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--saida', default='benchmark', help="Prefixo dos arquivos .json e .csv de resultado")
+    parser.add_argument('--anterior', help="JSON de uma execução anterior para comparação")
+    adicionar_argumentos(parser)
+    # Sem limite, os tamanhos padrão maiores levam horas; cada caso para em 300 s e sai marcado como interrompido
+    parser.set_defaults(limite_tempo=300)
+    args = parser.parse_args()
+
+    tabela = executar_benchmark(args.tamanhos, args.modelos, args.semente, configuracao_de_argumentos(args))
+    tabela.to_csv(f'{args.saida}.csv', index=False)
+    with open(f'{args.saida}.json', 'w') as f:
+        json.dump({'commit': _commit_atual(), 'data': datetime.datetime.now().isoformat(timespec='seconds'),
+                   'resultados': tabela.to_dict('records')}, f, indent=2, ensure_ascii=False)
+    print(tabela.to_string(index=False))
+
+    if args.anterior:
+        with open(args.anterior) as f:
+            anterior = pd.DataFrame(json.load(f)['resultados'])
+        print("\nComparação com a execução anterior (atual / anterior):")
+        print(comparar(tabela, anterior).to_string(index=False))
@@ -0,0 +1,228 @@
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+import modelo_escalonamento as me
+from heuristica_gulosa import escalonamento_guloso, iniciar_escalonamento
+
+# Busca local (simulated annealing) sobre escalas do modelo de escalonamento.
+# A escala é representada por uma matriz booleana profissionais x linhas de
+# demanda, e o custo do modelo (-3·peso por atendimento, 2·peso por unidade de
+# folga e 0.1·max_carga) é mantido por totais acumulados: benefício, penalidade
+# de folga, atendimentos por linha, ocupação por (data, turno) e carga por
+# (profissional, semana). A carga máxima vem de um histograma das cargas, de modo
+# que cada movimento é avaliado em O(1) (amortizado), sem recalcular a escala.
+#
+# Movimentos: trocar o profissional de um atendimento, mover um atendimento para
+# outro turno, remover e adicionar um atendimento. O modelo de escalonamento não
+# tem índice de sala (a capacidade é a soma das salas abertas no turno), então
+# mover entre turnos já cobre a realocação de salas.
+
+
+class BuscaLocal:
+
+    def __init__(self, indices, agenda=None, semente=0):
+        self.indices = indices
+        self.rng = random.Random(semente)
+        self.ids = indices['profissionais']
+        posicao = {p: i for i, p in enumerate(self.ids)}
+        linhas = indices['linhas']
+        semanas = sorted(set(indices['semana_da_data'].values()))
+        turnos_data = sorted({(data, turno) for data, _, turno, _, _ in linhas})
+        posicao_turno = {chave: j for j, chave in enumerate(turnos_data)}
+
+        self.peso = [me.pesos[tipo] for _, _, _, tipo, _ in linhas]
+        self.quantidade = [q for *_, q in linhas]
+        self.semana = [semanas.index(indices['semana_da_data'][data]) for data, *_ in linhas]
+        self.turno = [posicao_turno[(data, turno)] for data, _, turno, _, _ in linhas]
+        self.capacidade = [indices['capacidade'][(indices['dia_da_data'][d], t)] for d, t in turnos_data]
+        # Limite semanal em número de atendimentos
+        self.limite = [int(indices['carga_max'][p] // me.duracao_atendimento) for p in self.ids]
+        self.candidatos = [[posicao[p] for p in ps] for ps in indices['profissionais_por_linha']]
+        self.linhas_do_profissional = [[] for _ in self.ids]
+        for i, ps in enumerate(self.candidatos):
+            for j in ps:
+                self.linhas_do_profissional[j].append(i)
+
+        # Estado e totais acumulados
+        self.escala = np.zeros((len(self.ids), len(linhas)), dtype=bool)
+        self.atendidos = [0] * len(linhas)
+        self.ocupacao = [0] * len(turnos_data)
+        self.carga = [[0] * len(semanas) for _ in self.ids]
+        self.histograma = [0] * (max(self.limite, default=0) + 2)
+        self.histograma[0] = len(self.ids) * len(semanas)
+        self.maximo = 0
+        self.beneficio = 0.0
+        self.penalidade_folga = sum(2 * w * q for w, q in zip(self.peso, self.quantidade))
+        self.atribuicoes = []  # pares (profissional, linha) da escala atual
+        self.posicao_atribuicao = {}
+
+        chave_linha = {(data, turno, tipo): i for i, (data, _, turno, tipo, _) in enumerate(linhas)}
+        if agenda is None:
+            agenda = escalonamento_guloso(indices, excedente=True)
+        for p, data, turno, tipo in agenda:
+            self._adicionar(posicao[p], chave_linha[(data, turno, tipo)])
+        self.melhor_custo = self.custo
+        self.melhor_escala = self.escala.copy()
+
+    @property
+    def custo(self):
+        return self.beneficio + self.penalidade_folga + 0.1 * self.maximo * me.duracao_atendimento
+
+    # ------------------------------------------------------------------
+    # Atualizações O(1) dos totais
+    # ------------------------------------------------------------------
+
+    def _adicionar(self, j, i):
+        self.escala[j, i] = True
+        self.posicao_atribuicao[(j, i)] = len(self.atribuicoes)
+        self.atribuicoes.append((j, i))
+        self.beneficio -= 3 * self.peso[i]
+        if self.atendidos[i] < self.quantidade[i]:
+            self.penalidade_folga -= 2 * self.peso[i]
+        self.atendidos[i] += 1
+        self.ocupacao[self.turno[i]] += 1
+        n = self.carga[j][self.semana[i]]
+        self.carga[j][self.semana[i]] = n + 1
+        self.histograma[n] -= 1
+        self.histograma[n + 1] += 1
+        self.maximo = max(self.maximo, n + 1)
+
+    def _remover(self, j, i):
+        self.escala[j, i] = False
+        k = self.posicao_atribuicao.pop((j, i))
+        ultimo = self.atribuicoes.pop()
+        if ultimo != (j, i):
+            self.atribuicoes[k] = ultimo
+            self.posicao_atribuicao[ultimo] = k
+        self.beneficio += 3 * self.peso[i]
+        self.atendidos[i] -= 1
+        if self.atendidos[i] < self.quantidade[i]:
+            self.penalidade_folga += 2 * self.peso[i]
+        self.ocupacao[self.turno[i]] -= 1
+        n = self.carga[j][self.semana[i]]
+        self.carga[j][self.semana[i]] = n - 1
+        self.histograma[n] -= 1
+        self.histograma[n - 1] += 1
+        while self.maximo > 0 and self.histograma[self.maximo] == 0:
+            self.maximo -= 1
+
+    def _cabe(self, j, i, liberado=None):
+        # (j, i) pode ser adicionado; `liberado` é o par que sai no mesmo movimento.
+        if self.escala[j, i]:
+            return False
+        mesmo_turno = liberado is not None and self.turno[liberado[1]] == self.turno[i]
+        if not mesmo_turno and self.ocupacao[self.turno[i]] >= self.capacidade[self.turno[i]]:
+            return False
+        mesma_semana = liberado is not None and liberado[0] == j and self.semana[liberado[1]] == self.semana[i]
+        return mesma_semana or self.carga[j][self.semana[i]] < self.limite[j]
+
+    # ------------------------------------------------------------------
+    # Movimentos: aplicam a alteração e devolvem como desfazê-la (ou None)
+    # ------------------------------------------------------------------
+
+    def _trocar_profissional(self):
+        if not self.atribuicoes:
+            return None
+        j, i = self.rng.choice(self.atribuicoes)
+        novo = self.rng.choice(self.candidatos[i])
+        if novo == j or not self._cabe(novo, i, (j, i)):
+            return None
+        self._remover(j, i)
+        self._adicionar(novo, i)
+        return lambda: (self._remover(novo, i), self._adicionar(j, i))
+
+    def _mover_turno(self):
+        if not self.atribuicoes:
+            return None
+        j, i = self.rng.choice(self.atribuicoes)
+        destino = self.rng.choice(self.linhas_do_profissional[j])
+        if destino == i or not self._cabe(j, destino, (j, i)):
+            return None
+        self._remover(j, i)
+        self._adicionar(j, destino)
+        return lambda: (self._remover(j, destino), self._adicionar(j, i))
+
+    def _remover_atendimento(self):
+        if not self.atribuicoes:
+            return None
+        j, i = self.rng.choice(self.atribuicoes)
+        self._remover(j, i)
+        return lambda: self._adicionar(j, i)
+
+    def _adicionar_atendimento(self):
+        i = self.rng.randrange(len(self.candidatos))
+        if not self.candidatos[i]:
+            return None
+        j = self.rng.choice(self.candidatos[i])
+        if not self._cabe(j, i):
+            return None
+        self._adicionar(j, i)
+        return lambda: self._remover(j, i)
+
+    # ------------------------------------------------------------------
+    # Simulated annealing
+    # ------------------------------------------------------------------
+
+    def executar(self, limite_tempo=5.0, temperatura_inicial=2.0, temperatura_final=0.01, max_iteracoes=None):
+        # Resfriamento geométrico em função do tempo decorrido: ao fim do orçamento a
+        # temperatura chega a `temperatura_final`. Devolve o melhor custo encontrado.
+        movimentos = [self._trocar_profissional, self._mover_turno,
+                      self._remover_atendimento, self._adicionar_atendimento]
+        inicio = time.perf_counter()
+        temperatura = temperatura_inicial
+        razao = temperatura_final / temperatura_inicial
+        iteracao = 0
+        custo = self.custo
+        while max_iteracoes is None or iteracao < max_iteracoes:
+            if iteracao % 256 == 0:
+                fracao = (time.perf_counter() - inicio) / limite_tempo
+                if fracao >= 1:
+                    break
+                temperatura = temperatura_inicial * razao ** fracao
+            iteracao += 1
+            desfazer = self.rng.choice(movimentos)()
+            if desfazer is None:
+                continue
+            novo = self.custo
+            delta = novo - custo
+            if delta <= 0 or self.rng.random() < math.exp(-delta / temperatura):
+                custo = novo
+                if custo < self.melhor_custo - 1e-9:
+                    self.melhor_custo = custo
+                    self.melhor_escala = self.escala.copy()
+            else:
+                desfazer()
+        self.iteracoes = iteracao
+        return self.melhor_custo
+
+    def agenda(self):
+        # Melhor escala encontrada, no formato das chaves de `x` do modelo.
+        linhas = self.indices['linhas']
+        return [(self.ids[j], linhas[i][0], linhas[i][2], linhas[i][3])
+                for j, i in zip(*np.nonzero(self.melhor_escala))]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Busca local (simulated annealing) para o modelo de escalonamento.")
+    parser.add_argument('--diretorio', default='.')
+    parser.add_argument('--limite-tempo', type=float, default=5.0, help="Orçamento de tempo, em segundos")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--temperatura', type=float, default=2.0, help="Temperatura inicial")
+    args = parser.parse_args()
+
+    indices = me.preparar_indices(*me.carregar_dados(args.diretorio))
+    busca = BuscaLocal(indices, semente=args.semente)
+    print(f"Custo da escala gulosa: {busca.custo:.2f}")
+    melhor = busca.executar(args.limite_tempo, args.temperatura)
+    print(f"Custo após a busca local: {melhor:.2f} ({busca.iteracoes} iterações em {args.limite_tempo:.1f}s)")
+
+    # Conferência com o modelo PuLP: a escala é viável e o objetivo coincide
+    model, x, folga, max_carga = me.construir_modelo(indices)
+    agenda = busca.agenda()
+    iniciar_escalonamento(indices, agenda, x, folga, max_carga)
+    print(f"Viável: {model.valid()}, objetivo no modelo: {model.objective.value():.2f}, "
+          f"atendimentos: {len(agenda)}")
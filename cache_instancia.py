@@ -0,0 +1,175 @@
+import argparse
+import hashlib
+import os
+import struct
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+# Cache da instância compilada. Os três CSVs são convertidos uma vez em arrays
+# compactos — disponibilidade dos profissionais como máscara de bits por slot
+# (dia, turno), capacidade de cada sala em cada slot e a demanda como tensor
+# (data, turno, tipo) — e gravados em um .npz sem compressão, cujo nome vem do
+# sha256 do conteúdo dos CSVs. Nas execuções seguintes (e nos processos de um
+# pool), os membros do .npz são mapeados direto do disco com `np.memmap`, sem
+# cópia e sem passar pelo pandas. Alterar qualquer CSV muda o hash e recompila.
+
+dias = ['seg', 'ter', 'qua', 'qui', 'sex', 'sab']
+turnos = ['manhã', 'tarde']
+tipos = ['urgência', 'triagem', 'rotina']
+
+ARQUIVOS = ('profissionais.csv', 'salas.csv', 'demandas.csv')
+VERSAO = 2  # muda quando o formato dos arrays muda
+
+
+def _separar(valor):
+    # Aceita a string do CSV ("manhã,tarde") ou a lista já separada por `carregar_dados`.
+    if isinstance(valor, (list, tuple, set)):
+        return list(valor)
+    return [t.strip() for t in str(valor).split(',') if t.strip()] if pd.notna(valor) else []
+
+
+def slot(dia, turno):
+    return dias.index(dia) * len(turnos) + turnos.index(turno)
+
+
+def hash_entradas(diretorio='.'):
+    h = hashlib.sha256(f"instancia-v{VERSAO}".encode())
+    for nome in ARQUIVOS:
+        with open(os.path.join(diretorio, nome), 'rb') as f:
+            h.update(nome.encode())
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def compilar(diretorio='.'):
+    # Lê os CSVs e devolve os arrays da instância.
+    return compilar_dataframes(pd.read_csv(os.path.join(diretorio, 'profissionais.csv')),
+                               pd.read_csv(os.path.join(diretorio, 'salas.csv')),
+                               pd.read_csv(os.path.join(diretorio, 'demandas.csv')))
+
+
+def compilar_dataframes(profissionais, salas, demandas):
+    # Mesmos arrays a partir de DataFrames já carregados (por exemplo, uma janela da
+    # demanda no horizonte rolante). Carga e capacidade mantêm o tipo da coluna.
+    # Bit `slot(dia, turno)` ligado quando o profissional está disponível
+    disponibilidade = np.zeros(len(profissionais), dtype=np.uint16)
+    for dia in dias:
+        for i, valor in enumerate(profissionais[f'disponibilidade_{dia}']):
+            for turno in _separar(valor):
+                if turno in turnos:
+                    disponibilidade[i] |= 1 << slot(dia, turno)
+
+    # Capacidade de cada sala em cada slot (zero quando fechada). Uma sala sem dias
+    # ou turnos informados é considerada aberta em todos, como no agendamento.
+    capacidade_sala = salas['capacidade'].to_numpy()
+    capacidade_slot = np.zeros((len(salas), len(dias) * len(turnos)), dtype=capacidade_sala.dtype)
+    for k, (cap, dias_sala, turnos_sala) in enumerate(zip(capacidade_sala, salas['dias_funcionamento'],
+                                                          salas['turnos_disponiveis'])):
+        dias_sala = _separar(dias_sala) or dias
+        turnos_sala = _separar(turnos_sala) or turnos
+        for dia in dias_sala:
+            for turno in turnos_sala:
+                if dia in dias and turno in turnos:
+                    capacidade_slot[k, slot(dia, turno)] = cap
+
+    # Datas na ordem em que aparecem; o dia da semana é o da primeira ocorrência
+    codigo_data, datas = pd.factorize(demandas['data'])
+    primeira = pd.Series(range(len(demandas))).groupby(codigo_data).first().to_numpy()
+    dia_da_data = demandas['dia_semana'].map(dias.index).to_numpy()[primeira]
+    codigo_turno = demandas['turno'].map(turnos.index).to_numpy()
+    codigo_tipo = demandas['tipo_atendimento'].map(tipos.index).to_numpy()
+    quantidade = demandas['quantidade_prevista'].to_numpy(dtype=np.int64)
+
+    # Tensor (data, turno, tipo) e as linhas de demanda na ordem do CSV
+    demanda = np.zeros((len(datas), len(turnos), len(tipos)), dtype=np.int64)
+    np.add.at(demanda, (codigo_data, codigo_turno, codigo_tipo), quantidade)
+    linhas = np.column_stack([codigo_data, codigo_turno, codigo_tipo, quantidade]).astype(np.int64)
+
+    return {
+        'ids_profissional': profissionais['id_profissional'].to_numpy(dtype=np.int64),
+        'nome': profissionais['nome'].to_numpy(dtype=str),
+        'especialidade': profissionais['especialidade'].to_numpy(dtype=str),
+        'carga_max': profissionais['carga_horaria_max'].to_numpy(),
+        'disponibilidade': disponibilidade,
+        'ids_sala': salas['id_sala'].to_numpy(dtype=np.int64),
+        'capacidade_sala': capacidade_sala,
+        'capacidade_slot': capacidade_slot,
+        'datas': np.asarray(datas, dtype=str),
+        'dia_da_data': dia_da_data.astype(np.int8),
+        'demanda': demanda,
+        'linhas': linhas,
+    }
+
+
+def disponibilidade_matriz(disponibilidade):
+    # Máscara de bits -> matriz booleana (profissionais x slots).
+    return ((np.asarray(disponibilidade)[:, None] >> np.arange(len(dias) * len(turnos))) & 1).astype(bool)
+
+
+def gravar(caminho, arrays):
+    # Grava em um arquivo temporário e renomeia, para que processos concorrentes
+    # nunca vejam um .npz incompleto.
+    pasta = os.path.dirname(caminho) or '.'
+    os.makedirs(pasta, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=pasta, suffix='.npz')
+    with os.fdopen(descritor, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(temporario, caminho)
+
+
+def abrir(caminho):
+    # Mapeia cada membro (.npy sem compressão) do .npz diretamente do arquivo.
+    arrays = {}
+    with zipfile.ZipFile(caminho) as arquivo_zip, open(caminho, 'rb') as f:
+        for info in arquivo_zip.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{info.filename} está comprimido e não pode ser mapeado")
+            # Cabeçalho local do zip: 30 bytes fixos + nome + campo extra
+            f.seek(info.header_offset)
+            tamanho_nome, tamanho_extra = struct.unpack('<HH', f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + tamanho_nome + tamanho_extra)
+            versao = np.lib.format.read_magic(f)
+            if versao == (1, 0):
+                forma, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                forma, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            nome = info.filename[:-len('.npy')]
+            if int(np.prod(forma)) == 0:
+                arrays[nome] = np.empty(forma, dtype=dtype)
+            else:
+                arrays[nome] = np.memmap(caminho, dtype=dtype, mode='r', offset=f.tell(), shape=forma,
+                                         order='F' if fortran else 'C')
+    return arrays
+
+
+def caminho_cache(diretorio='.', diretorio_cache=None):
+    diretorio_cache = diretorio_cache or os.path.join(diretorio, '.cache_instancia')
+    return os.path.join(diretorio_cache, f"instancia_{hash_entradas(diretorio)[:20]}.npz")
+
+
+def carregar(diretorio='.', diretorio_cache=None):
+    # Arrays da instância de `diretorio`, compilando e gravando o cache se necessário.
+    caminho = caminho_cache(diretorio, diretorio_cache)
+    if not os.path.exists(caminho):
+        gravar(caminho, compilar(diretorio))
+    return abrir(caminho)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compila a instância em um cache .npz mapeável em memória.")
+    parser.add_argument('--diretorio', default='.')
+    parser.add_argument('--cache', help="Diretório do cache (padrão: <diretorio>/.cache_instancia)")
+    args = parser.parse_args()
+
+    caminho = caminho_cache(args.diretorio, args.cache)
+    existia = os.path.exists(caminho)
+    inicio = time.perf_counter()
+    arrays = carregar(args.diretorio, args.cache)
+    print(f"{'Cache encontrado' if existia else 'Instância compilada'}: {caminho} "
+          f"({1000 * (time.perf_counter() - inicio):.1f} ms)")
+    for nome, array in arrays.items():
+        print(f"  {nome}: {array.dtype} {array.shape}")
@@ -0,0 +1,133 @@
+import argparse
+import time
+
+from pulp import LpMinimize, LpProblem, LpVariable, lpSum
+
+import modelo_escalonamento as me
+
+# Comparação entre o construtor original de `modelo_escalonamento.py` (laços com
+# iterrows e filtros do pandas a cada iteração) e o construtor indexado atual.
+# Além dos tempos, verifica se os dois modelos gerados são equivalentes: o atual só
+# cria variáveis para pares disponíveis, o que equivale ao original depois de eliminar
+# as variáveis que ele fixava em zero.
+
+
+def construir_modelo_legado(profissionais, salas, demandas):
+    # Cópia fiel da construção original do modelo, mantida apenas como referência.
+    pesos = me.pesos
+    turnos = me.turnos
+    duracao_atendimento = me.duracao_atendimento
+
+    x = LpVariable.dicts(
+        "Atendimento",
+        ((p, row['data'], row['turno'], row['tipo_atendimento'])
+         for p in profissionais['id_profissional']
+         for _, row in demandas.iterrows()),
+        cat='Binary'
+    )
+    folga = LpVariable.dicts(
+        "Folga",
+        ((row['data'], row['turno'], row['tipo_atendimento'])
+         for _, row in demandas.iterrows()),
+        lowBound=0, cat='Integer'
+    )
+    max_carga = LpVariable('max_carga', lowBound=0)
+    model = LpProblem("Escalonamento_Cuidar_Bem", LpMinimize)
+    model += (
+        -3 * lpSum(x[(p, row['data'], row['turno'], row['tipo_atendimento'])] * pesos[row['tipo_atendimento']]
+                   for p in profissionais['id_profissional']
+                   for _, row in demandas.iterrows())
+        + 2 * lpSum(folga[(row['data'], row['turno'], row['tipo_atendimento'])] * pesos[row['tipo_atendimento']]
+                    for _, row in demandas.iterrows())
+        + 0.1 * max_carga
+    )
+    for _, row in demandas.iterrows():
+        model += (
+            lpSum(x[(p, row['data'], row['turno'], row['tipo_atendimento'])]
+                  for p in profissionais['id_profissional']) + folga[(row['data'], row['turno'], row['tipo_atendimento'])] >= row['quantidade_prevista'],
+            f"Demanda_{row['data']}_{row['turno']}_{row['tipo_atendimento']}"
+        )
+    for _, prof in profissionais.iterrows():
+        for _, row in demandas.iterrows():
+            dia_semana = row['dia_semana']
+            turno = row['turno']
+            if turno not in prof[f'disponibilidade_{dia_semana}']:
+                model += (
+                    x[(prof['id_profissional'], row['data'], turno, row['tipo_atendimento'])] == 0,
+                    f"Disponibilidade_{prof['id_profissional']}_{row['data']}_{turno}_{row['tipo_atendimento']}"
+                )
+    for _, prof in profissionais.iterrows():
+        carga_prof = lpSum(x[(prof['id_profissional'], row['data'], row['turno'], row['tipo_atendimento'])] * duracao_atendimento
+                           for _, row in demandas.iterrows())
+        model += (carga_prof <= prof['carga_horaria_max'], f"CargaHoraria_{prof['id_profissional']}")
+        model += (carga_prof <= max_carga, f"EquilibrioCarga_{prof['id_profissional']}")
+    for data in demandas['data'].unique():
+        for turno in turnos:
+            dia = demandas[demandas['data'] == data]['dia_semana'].iloc[0]
+            capacidade_total = salas[salas['dias_funcionamento'].str.contains(dia) & salas['turnos_disponiveis'].str.contains(turno)]['capacidade'].sum()
+            model += (
+                lpSum(x[(p, data, turno, tipo)]
+                      for p in profissionais['id_profissional']
+                      for tipo in demandas[(demandas['data'] == data) & (demandas['turno'] == turno)]['tipo_atendimento'].unique()) <= capacidade_total,
+                f"CapacidadeSalas_{data}_{turno}"
+            )
+    return model
+
+
+def _fixadas_em_zero(model):
+    # Variáveis fixadas em zero por restrições de uma única variável (x == 0),
+    # como as antigas restrições `Disponibilidade_...`.
+    fixadas = set()
+    for r in model.constraints.values():
+        if r.sense == 0 and r.constant == 0 and len(r) == 1:
+            fixadas.update(v.name for v in r.keys())
+    return fixadas
+
+
+def _assinatura(model):
+    # Representação canônica do modelo: variáveis com limites, objetivo e restrições por nome.
+    # Variáveis fixadas em zero e as restrições que as fixam são descartadas, de modo que o
+    # modelo original (denso) e o atual (esparso) possam ser comparados diretamente.
+    fixadas = _fixadas_em_zero(model)
+    variaveis = {v.name: (v.lowBound, v.upBound, v.cat) for v in model.variables() if v.name not in fixadas}
+    objetivo = {v.name: c for v, c in model.objective.items() if c != 0 and v.name not in fixadas}
+    restricoes = {
+        nome: (r.sense, -r.constant, {v.name: c for v, c in r.items() if c != 0 and v.name not in fixadas})
+        for nome, r in model.constraints.items()
+        if not (r.sense == 0 and r.constant == 0 and len(r) == 1)
+    }
+    return variaveis, objetivo, restricoes
+
+
+def modelos_equivalentes(a, b):
+    return _assinatura(a) == _assinatura(b)
+
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compara o construtor original e o indexado do modelo de escalonamento.")
+    parser.add_argument('--diretorio', default='.', help="Diretório com profissionais.csv, salas.csv e demandas.csv")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    profissionais, salas, demandas = me.carregar_dados(args.diretorio)
+
+    t_legado, modelo_legado = cronometrar(
+        lambda: construir_modelo_legado(profissionais, salas, demandas), args.repeticoes)
+    t_indexado, modelo_indexado = cronometrar(
+        lambda: me.construir_modelo(me.preparar_indices(profissionais, salas, demandas))[0], args.repeticoes)
+
+    print(f"Original: {modelo_legado.numVariables()} variáveis, {modelo_legado.numConstraints()} restrições")
+    print(f"Atual:    {modelo_indexado.numVariables()} variáveis, {modelo_indexado.numConstraints()} restrições")
+    print(f"Construtor original: {t_legado * 1000:.1f} ms")
+    print(f"Construtor indexado: {t_indexado * 1000:.1f} ms")
+    print(f"Aceleração: {t_legado / t_indexado:.1f}x")
+    print("Modelos equivalentes:", modelos_equivalentes(modelo_legado, modelo_indexado))
@@ -0,0 +1,191 @@
+import multiprocessing as mp
+import os
+import queue
+import re
+import signal
+import tempfile
+import time
+from dataclasses import dataclass, field, replace
+
+from pulp import PULP_CBC_CMD, LpProblem, LpStatus
+
+# Configuração da execução do solver (CBC via PuLP): número de threads, limite de
+# tempo, gap relativo e verbosidade, tanto por linha de comando quanto pela API.
+# O modo "corrida" executa várias configurações em processos paralelos e fica com
+# a primeira que atingir o gap alvo.
+
+
+@dataclass
+class ConfiguracaoSolver:
+    threads: int = None
+    limite_tempo: float = None
+    gap_relativo: float = None
+    mensagens: bool = False
+    opcoes: list = field(default_factory=list)  # opções extras repassadas ao CBC
+    nome: str = 'padrao'
+
+    def criar_solver(self, caminho_log=None, warm_start=False):
+        return PULP_CBC_CMD(msg=self.mensagens, threads=self.threads, timeLimit=self.limite_tempo,
+                            gapRel=self.gap_relativo, options=list(self.opcoes), logPath=caminho_log,
+                            warmStart=warm_start)
+
+
+@dataclass
+class ResultadoSolver:
+    status: str
+    objetivo: float
+    limitante: float
+    gap: float
+    tempo: float
+    configuracao: str
+    interrompido: bool  # parou por limite de tempo antes de provar a otimalidade
+
+
+def adicionar_argumentos(parser):
+    grupo = parser.add_argument_group('solver')
+    grupo.add_argument('--threads', type=int, help="Número de threads do CBC")
+    grupo.add_argument('--limite-tempo', type=float, help="Limite de tempo de parede, em segundos")
+    grupo.add_argument('--gap', type=float, help="Gap relativo de parada (ex.: 0.01 para 1%%)")
+    grupo.add_argument('--mensagens', action='store_true', help="Exibe o log do CBC")
+    grupo.add_argument('--corrida', type=int, default=0, metavar='N',
+                       help="Executa N configurações em paralelo e fica com a primeira a atingir o gap")
+    return parser
+
+
+def configuracao_de_argumentos(args):
+    return ConfiguracaoSolver(threads=args.threads, limite_tempo=args.limite_tempo,
+                              gap_relativo=args.gap, mensagens=args.mensagens)
+
+
+def configuracoes_corrida(base, n):
+    # Variações da configuração base: sementes diferentes e estratégias alternadas
+    # de pré-processamento e cortes, para diversificar a busca do CBC.
+    variacoes = [[], ['preprocess off'], ['cuts off'], ['strategy 2']]
+    return [replace(base, nome=f'corrida_{i}', threads=base.threads or 1,
+                    opcoes=list(base.opcoes) + [f'randomCbcSeed {i + 1}'] + variacoes[i % len(variacoes)])
+            for i in range(n)]
+
+
+def _ler_log(caminho):
+    # Extrai do log do CBC o resumo final: situação, se há solução viável e limitante.
+    # O gap do log não é usado: em problemas de maximização o CBC o imprime negativo.
+    with open(caminho, errors='replace') as f:
+        texto = f.read()
+    resultado = re.search(r'^Result - (.+)$', texto, re.M)
+    limitante = re.search(r'^(?:Lower|Upper) bound:\s+(\S+)', texto, re.M)
+    return (resultado.group(1).strip() if resultado else '',
+            'No feasible solution' not in texto,
+            float(limitante.group(1)) if limitante else None)
+
+
+def resolver(prob, config=None, warm_start=False):
+    # Resolve `prob` com a configuração dada e devolve o resumo da execução.
+    config = config or ConfiguracaoSolver()
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho_log = os.path.join(tmp, 'cbc.log')
+        inicio = time.perf_counter()
+        prob.solve(config.criar_solver(caminho_log, warm_start))
+        tempo = time.perf_counter() - inicio
+        situacao, viavel, limitante = _ler_log(caminho_log) if os.path.exists(caminho_log) else ('', True, None)
+        # Com logPath o PuLP manda a saída do CBC para o arquivo, e não para o terminal
+        if config.mensagens and os.path.exists(caminho_log):
+            with open(caminho_log, errors='replace') as f:
+                print(f.read(), end='')
+
+    # Sem solução viável o PuLP ainda carrega os valores da relaxação; não há incumbente.
+    objetivo = prob.objective.value() if viavel else None
+    interrompido = 'stopped' in situacao.lower()
+    gap = None
+    if not interrompido and objetivo is not None:
+        limitante, gap = objetivo, 0.0
+    elif limitante is not None and objetivo is not None:
+        # O limitante relatado pode vir no sentido interno do CBC (objetivo negado).
+        if prob.sense * (limitante - objetivo) > 1e-6 * max(1.0, abs(objetivo)):
+            limitante = -limitante
+        gap = abs(objetivo - limitante) / max(abs(objetivo), 1e-9)
+    return ResultadoSolver(LpStatus[prob.status], objetivo, limitante, gap, tempo, config.nome, interrompido)
+
+
+def _trabalhador_corrida(dados_modelo, config, fila):
+    # Cada processo da corrida fica em um grupo próprio, para que o CBC filho
+    # seja encerrado junto quando outra configuração vencer.
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    _, prob = LpProblem.from_dict(dados_modelo)
+    resultado = resolver(prob, config)
+    valores = {v.name: v.varValue for v in prob.variables()}
+    fila.put((resultado, prob.status, valores))
+
+
+def _encerrar(processo):
+    if processo.is_alive():
+        try:
+            os.killpg(processo.pid, signal.SIGTERM)
+        except (AttributeError, ProcessLookupError, PermissionError):
+            processo.terminate()
+    processo.join()
+
+
+def resolver_em_corrida(prob, configuracoes, gap_alvo=0.0):
+    # Resolve `prob` com várias configurações em paralelo. A primeira execução que
+    # provar a otimalidade ou atingir `gap_alvo` vence e as demais são encerradas.
+    # Se nenhuma atingir o alvo, fica a melhor solução incumbente encontrada.
+    # Os valores da solução vencedora são copiados para as variáveis de `prob`.
+    dados_modelo = prob.to_dict()
+    fila = mp.Queue()
+    processos = [mp.Process(target=_trabalhador_corrida, args=(dados_modelo, c, fila), daemon=True)
+                 for c in configuracoes]
+    for p in processos:
+        p.start()
+
+    melhor = None
+    pendentes = len(processos)
+    try:
+        while pendentes:
+            try:
+                resultado, status, valores = fila.get(timeout=0.5)
+            except queue.Empty:
+                if not any(p.is_alive() for p in processos) and fila.empty():
+                    break  # algum processo terminou sem devolver resultado
+                continue
+            pendentes -= 1
+            if resultado.objetivo is None:
+                continue
+            if melhor is None or prob.sense * (resultado.objetivo - melhor[0].objetivo) < 0:
+                melhor = (resultado, status, valores)
+            if not resultado.interrompido or (resultado.gap is not None and resultado.gap <= gap_alvo):
+                melhor = (resultado, status, valores)
+                break
+    finally:
+        for p in processos:
+            _encerrar(p)
+
+    if melhor is None:
+        return None
+    resultado, status, valores = melhor
+    prob.status = status
+    for v in prob.variables():
+        v.varValue = valores.get(v.name)
+    return resultado
+
+
+def resolver_com_argumentos(prob, args):
+    # Ponto de entrada usado pelos scripts: resolve normalmente ou em corrida,
+    # conforme as opções de linha de comando.
+    config = configuracao_de_argumentos(args)
+    if args.corrida:
+        return resolver_em_corrida(prob, configuracoes_corrida(config, args.corrida), config.gap_relativo or 0.0)
+    return resolver(prob, config)
+
+
+def imprimir_resumo(resultado):
+    if resultado is None:
+        print("Nenhuma configuração encontrou solução.")
+        return
+    # O PuLP informa "Optimal" também quando o CBC para no limite com uma incumbente
+    status = f"{resultado.status} (interrompido, otimalidade não provada)" if resultado.interrompido \
+        else resultado.status
+    print(f"Solver ({resultado.configuracao}): {status} em {resultado.tempo:.2f}s")
+    if resultado.interrompido:
+        print(f"  Parada antecipada - incumbente: {resultado.objetivo}, limitante: {resultado.limitante}, "
+              f"gap: {resultado.gap}")
@@ -0,0 +1,154 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import modelo_escalonamento as me
+from modelo_matricial import (MINIMIZAR, ModeloMatricial, Montador, carga_e_capacidade, montar_escalonamento,
+                              resolver_cbc, resolver_milp, tabelas_instancia)
+
+# Demanda estocástica por aproximação de média amostral (SAA) para o modelo de
+# escalonamento. A escala (atendimentos por profissional e linha de demanda) é a
+# decisão de primeiro estágio; a folga é o recurso de segundo estágio, uma por
+# cenário de demanda. Os cenários são gerados de uma vez em uma matriz
+# (cenários x linhas) e o modelo é montado em forma matricial, com os blocos de
+# demanda de todos os cenários criados por operações vetorizadas.
+#
+# Custo: -3·peso por atendimento + 0.1·max_carga (primeiro estágio) mais a média,
+# entre os cenários, de 2·peso por unidade de folga.
+
+
+def gerar_cenarios(quantidade, n, variacao=0.1, distribuicao='uniforme', semente=0):
+    # Matriz (n, linhas) de demandas. 'uniforme' perturba a previsão em ±`variacao`,
+    # como a solução aleatória; 'poisson' sorteia contagens com média na previsão.
+    rng = np.random.default_rng(semente)
+    quantidade = np.asarray(quantidade, dtype=float)
+    if distribuicao == 'poisson':
+        return rng.poisson(quantidade, (n, len(quantidade)))
+    fator = rng.uniform(1 - variacao, 1 + variacao, (n, len(quantidade)))
+    return np.maximum(0, np.rint(quantidade * fator)).astype(np.int64)
+
+
+def montar_saa(tab, cenarios, pesos=None, duracao=None):
+    pesos = me.pesos if pesos is None else pesos
+    duracao = me.duracao_atendimento if duracao is None else duracao
+    n_cenarios, n_linhas = cenarios.shape
+    peso = np.array([pesos[t] for t in tab['tipo']], dtype=float)
+
+    linha_x, prof_x = np.nonzero(tab['disp'][:, tab['slot']].T)
+    nx = len(linha_x)
+    n_folga = n_cenarios * n_linhas
+    col_max = nx + n_folga
+    n = col_max + 1
+
+    c = np.concatenate([-3 * peso[linha_x], np.tile(2 * peso, n_cenarios) / n_cenarios, [0.1]])
+    var_min = np.zeros(n)
+    var_max = np.concatenate([np.ones(nx), np.full(n_folga, np.inf), [np.inf]])
+    # A folga fica contínua: com atendimentos inteiros e demandas inteiras, ela é inteira no ótimo
+    inteira = np.concatenate([np.ones(nx, dtype=bool), np.zeros(n_folga + 1, dtype=bool)])
+
+    m = Montador()
+    # 1. Demanda de cada cenário: atendimentos (comuns) + folga do cenário >= demanda do cenário
+    r = m.familia('Demanda', n_folga, cenarios.ravel(), np.inf)
+    deslocamento = (np.arange(n_cenarios) * n_linhas)[:, None]
+    m.termos((r + deslocamento + linha_x).ravel(), np.tile(np.arange(nx), n_cenarios), 1)
+    m.termos(r + np.arange(n_folga), nx + np.arange(n_folga), 1)
+    carga_e_capacidade(m, tab, linha_x, prof_x, col_max, duracao)
+
+    A, linha_min, linha_max = m.matriz(n)
+    variaveis = {
+        'Atendimento': (0, nx, {'profissional': tab['ids'][prof_x], 'data': tab['data'][linha_x],
+                                'turno': tab['turno'][linha_x], 'tipo_atendimento': tab['tipo'][linha_x]}),
+        'Folga': (nx, nx + n_folga, {'cenario': np.repeat(np.arange(n_cenarios), n_linhas),
+                                     'data': np.tile(tab['data'], n_cenarios),
+                                     'turno': np.tile(tab['turno'], n_cenarios),
+                                     'tipo_atendimento': np.tile(tab['tipo'], n_cenarios)}),
+        'max_carga': (col_max, n, {}),
+    }
+    return ModeloMatricial("Escalonamento_SAA", MINIMIZAR, c, A, linha_min, linha_max,
+                           var_min, var_max, inteira, variaveis, m.familias)
+
+
+def atendidos_por_linha(tab, modelo, valores):
+    # Atendimentos por linha de demanda. Nos dois modelos (SAA e determinístico) as
+    # colunas de atendimento seguem a ordem de `np.nonzero` sobre (linha, profissional).
+    linha_x, _ = np.nonzero(tab['disp'][:, tab['slot']].T)
+    inicio, fim, _ = modelo.variaveis['Atendimento']
+    return np.bincount(linha_x, weights=np.rint(valores[inicio:fim]), minlength=len(tab['quantidade']))
+
+
+def avaliar(tab, atendidos, cenarios, pesos=None):
+    # Folga de cada cenário para uma escala fixa: max(0, demanda - atendidos), por linha.
+    pesos = me.pesos if pesos is None else pesos
+    peso = np.array([pesos[t] for t in tab['tipo']], dtype=float)
+    urgente = tab['tipo'] == 'urgência'
+    folga = np.maximum(0, cenarios - atendidos)
+    return pd.DataFrame({
+        'folga_total': folga.sum(axis=1),
+        'folga_urgencia': folga[:, urgente].sum(axis=1),
+        'penalidade_folga': (2 * peso * folga).sum(axis=1),
+    })
+
+
+def resumo_urgencia(avaliacao):
+    urgencia = avaliacao['folga_urgencia']
+    return {'esperada': urgencia.mean(), 'q95': urgencia.quantile(0.95), 'pior_caso': urgencia.max()}
+
+
+def _resolver(modelo, metodo, limite_tempo):
+    if metodo == 'cbc':
+        return resolver_cbc(modelo, limite_tempo=limite_tempo)
+    return resolver_milp(modelo, limite_tempo=limite_tempo)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Escalonamento com demanda estocástica (SAA).")
+    parser.add_argument('--diretorio', default='.')
+    parser.add_argument('--cenarios', type=int, default=100)
+    parser.add_argument('--avaliacao', type=int, default=1000,
+                        help="Cenários novos para avaliar as escalas fora da amostra")
+    parser.add_argument('--variacao', type=float, default=0.1, help="Variação relativa da demanda (uniforme)")
+    parser.add_argument('--distribuicao', choices=['uniforme', 'poisson'], default='uniforme')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--metodo', choices=['milp', 'cbc'], default='milp')
+    parser.add_argument('--limite-tempo', type=float)
+    args = parser.parse_args()
+
+    tab = tabelas_instancia(*me.carregar_dados(args.diretorio))
+    inicio = time.perf_counter()
+    cenarios = gerar_cenarios(tab['quantidade'], args.cenarios, args.variacao, args.distribuicao, args.semente)
+    modelo = montar_saa(tab, cenarios)
+    tempo_montagem = time.perf_counter() - inicio
+    print(f"SAA com {args.cenarios} cenários: {modelo.num_variaveis} variáveis, {modelo.num_restricoes} restrições "
+          f"(montagem em {tempo_montagem:.3f}s)")
+
+    inicio = time.perf_counter()
+    resultado = _resolver(modelo, args.metodo, args.limite_tempo)
+    print(f"Status: {resultado.status} ({time.perf_counter() - inicio:.2f}s)")
+    if resultado.valores is None:
+        print("Nenhuma solução viável encontrada.")
+    else:
+        print(f"Custo esperado: {resultado.objetivo:.2f}")
+        escalas = [('SAA', atendidos_por_linha(tab, modelo, resultado.valores))]
+
+        # Escala determinística (previsão pontual) para comparação
+        deterministico = montar_escalonamento(tab)
+        resultado_det = _resolver(deterministico, args.metodo, args.limite_tempo)
+        if resultado_det.valores is None:
+            print(f"Escala determinística sem solução viável ({resultado_det.status}); fica fora da comparação.")
+        else:
+            escalas.append(('determinística', atendidos_por_linha(tab, deterministico, resultado_det.valores)))
+
+        # Avaliação na amostra e fora dela (cenários novos, mesma distribuição)
+        fora = gerar_cenarios(tab['quantidade'], args.avaliacao, args.variacao, args.distribuicao, args.semente + 1)
+        linhas = []
+        for nome, atendidos in escalas:
+            for amostra, matriz in (('treino', cenarios), ('avaliação', fora)):
+                avaliacao = avaliar(tab, atendidos, matriz)
+                urgencia = resumo_urgencia(avaliacao)
+                linhas.append({'escala': nome, 'cenarios': amostra, 'urgencia_esperada': urgencia['esperada'],
+                               'urgencia_q95': urgencia['q95'], 'urgencia_pior_caso': urgencia['pior_caso'],
+                               'folga_media': avaliacao['folga_total'].mean()})
+        print("\nDemanda urgente não atendida por cenário:")
+        print(pd.DataFrame(linhas).to_string(index=False, float_format=lambda v: f"{v:.2f}"))
@@ -0,0 +1,89 @@
+import argparse
+import importlib.util
+import os
+
+import pandas as pd
+
+# Extração da solução em tabelas colunares. Os valores das variáveis são lidos uma
+# única vez: a agenda vira um DataFrame com uma linha por atendimento e a folga um
+# DataFrame por linha de demanda. Os relatórios (carga por profissional, ocupação
+# das salas, folga por tipo e composição do objetivo) são agregações dessas tabelas.
+
+CAMPOS_ESCALONAMENTO = ['profissional', 'data', 'turno', 'tipo_atendimento']
+CAMPOS_AGENDAMENTO = ['profissional', 'data', 'turno', 'sala', 'tipo_atendimento']
+CAMPOS_FOLGA = ['data', 'turno', 'tipo_atendimento']
+
+
+def tabela_agenda(x, campos):
+    # Atendimentos escolhidos (variáveis binárias com valor 1); as chaves de `x` viram colunas.
+    chaves = [chave for chave, var in x.items() if var.varValue is not None and var.varValue > 0.5]
+    return pd.DataFrame.from_records(chaves, columns=campos)
+
+
+def tabela_folga(folga):
+    chaves = list(folga)
+    tabela = pd.DataFrame.from_records(chaves, columns=CAMPOS_FOLGA)
+    tabela['folga'] = [round(folga[k].varValue or 0, 6) for k in chaves]
+    return tabela
+
+
+def carga_por_profissional(agenda, duracao, profissionais=None):
+    # Horas por profissional; `profissionais` inclui na tabela quem ficou sem atendimento.
+    carga = agenda.groupby('profissional').size() * duracao
+    if profissionais is not None:
+        carga = carga.reindex(profissionais, fill_value=0)
+    return carga.rename('horas')
+
+
+def ocupacao_salas(agenda, capacidade_sala, duracao):
+    # Ocupação (em horas) de cada sala usada por (data, turno), com a capacidade da sala.
+    ocupacao = (agenda.groupby(['data', 'turno', 'sala']).size() * duracao).rename('ocupacao').reset_index()
+    ocupacao['capacidade'] = ocupacao['sala'].map(capacidade_sala)
+    return ocupacao
+
+
+def folga_por_tipo(folgas):
+    return folgas.groupby('tipo_atendimento')['folga'].sum()
+
+
+def composicao_objetivo(agenda, folgas, coef_atendimento, coef_folga, outros=None):
+    # Parcelas do objetivo: `coef_atendimento` e `coef_folga` são coeficientes por tipo
+    # de atendimento; `outros` acrescenta termos já calculados (carga, desbalanceamento).
+    partes = {
+        'atendimentos': float(agenda['tipo_atendimento'].map(coef_atendimento).sum()),
+        'folga': float((folgas['folga'] * folgas['tipo_atendimento'].map(coef_folga)).sum()),
+    }
+    partes.update(outros or {})
+    composicao = pd.Series(partes)
+    composicao['total'] = composicao.sum()
+    return composicao
+
+
+def arquivo_saida(caminho):
+    # Tipo de `--saida` no argparse: o Parquet precisa do pyarrow (ou fastparquet), e a
+    # falta dele deve aparecer antes de resolver o modelo, não depois.
+    if os.path.splitext(caminho)[1].lower() == '.parquet' and \
+            not any(importlib.util.find_spec(m) for m in ('pyarrow', 'fastparquet')):
+        raise argparse.ArgumentTypeError(f"{caminho}: gravar Parquet requer o pacote pyarrow (pip install pyarrow)")
+    return caminho
+
+
+def salvar(tabela, caminho):
+    # CSV ou Parquet, conforme a extensão do arquivo.
+    if os.path.splitext(caminho)[1].lower() == '.parquet':
+        tabela.to_parquet(caminho, index=False)
+    else:
+        tabela.to_csv(caminho, index=False)
+
+
+def ler(caminho):
+    if os.path.splitext(caminho)[1].lower() == '.parquet':
+        return pd.read_parquet(caminho)
+    return pd.read_csv(caminho)
+
+
+def salvar_solucao(caminho, agenda, folgas):
+    # Grava a agenda em `caminho` e a folga ao lado, com o sufixo `_folga`.
+    base, extensao = os.path.splitext(caminho)
+    salvar(agenda, caminho)
+    salvar(folgas, f"{base}_folga{extensao}")
@@ -0,0 +1,87 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from instancia import dias, tipos, turnos
+
+# Gerador de instâncias sintéticas nos mesmos esquemas de `profissionais.csv`,
+# `salas.csv` e `demandas.csv`. A mesma semente sempre gera a mesma instância.
+
+# Fração média da capacidade de salas de um turno pedida por cada tipo de atendimento.
+# A ordem das chaves é a ordem em que os tipos são sorteados: mudá-la muda as instâncias.
+proporcao_demanda = {'triagem': 0.35, 'rotina': 0.3, 'urgência': 0.15}
+
+
+def gerar_instancia(n_profissionais=5, n_salas=3, n_semanas=1, semente=0, data_inicio='2024-06-10',
+                    carga_demanda=1.0):
+    # `data_inicio` deve ser uma segunda-feira. `carga_demanda` escala a demanda em
+    # relação à capacidade das salas (1.0 fica próximo da instância original).
+    rng = np.random.default_rng(semente)
+
+    def turnos_aleatorios(probabilidade):
+        escolhidos = [t for t in turnos if rng.random() < probabilidade]
+        return ','.join(escolhidos)
+
+    profissionais = pd.DataFrame({
+        'id_profissional': np.arange(1, n_profissionais + 1),
+        'nome': [f'Profissional {i}' for i in range(1, n_profissionais + 1)],
+        'especialidade': rng.choice(['Psicólogo', 'Estagiário', 'Assistente'], n_profissionais, p=[0.6, 0.25, 0.15]),
+        'carga_horaria_max': rng.integers(20, 33, n_profissionais),
+    })
+    for dia in dias:
+        probabilidade = 0.45 if dia == 'sab' else 0.7
+        profissionais[f'disponibilidade_{dia}'] = [turnos_aleatorios(probabilidade) for _ in range(n_profissionais)]
+
+    salas = pd.DataFrame({
+        'id_sala': np.arange(1, n_salas + 1),
+        'capacidade': rng.integers(2, 6, n_salas),
+        'dias_funcionamento': [','.join(dias if rng.random() < 0.6 else dias[:-1]) for _ in range(n_salas)],
+        'turnos_disponiveis': [','.join(turnos if rng.random() < 0.75 else turnos[:1]) for _ in range(n_salas)],
+    })
+
+    # Capacidade total por (dia, turno), usada como referência para a demanda
+    capacidade = {(dia, turno): sum(c for c, d, t in zip(salas['capacidade'], salas['dias_funcionamento'],
+                                                         salas['turnos_disponiveis'])
+                                    if dia in d.split(',') and turno in t.split(','))
+                  for dia in dias for turno in turnos}
+
+    linhas = []
+    inicio = pd.Timestamp(data_inicio)
+    for semana in range(n_semanas):
+        for i, dia in enumerate(dias):
+            data = (inicio + pd.Timedelta(days=7 * semana + i)).strftime('%Y-%m-%d')
+            for turno in turnos:
+                if capacidade[(dia, turno)] == 0:
+                    continue
+                for tipo in sorted(tipos, key=list(proporcao_demanda).index):
+                    media = carga_demanda * proporcao_demanda[tipo] * capacidade[(dia, turno)]
+                    linhas.append((data, dia, turno, tipo, max(1, int(rng.poisson(media)))))
+    demandas = pd.DataFrame(linhas, columns=['data', 'dia_semana', 'turno', 'tipo_atendimento', 'quantidade_prevista'])
+    return profissionais, salas, demandas
+
+
+def salvar_instancia(diretorio, profissionais, salas, demandas):
+    os.makedirs(diretorio, exist_ok=True)
+    profissionais.to_csv(os.path.join(diretorio, 'profissionais.csv'), index=False)
+    salas.to_csv(os.path.join(diretorio, 'salas.csv'), index=False)
+    demandas.to_csv(os.path.join(diretorio, 'demandas.csv'), index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gera uma instância sintética nos esquemas dos CSVs do projeto.")
+    parser.add_argument('--profissionais', type=int, default=50)
+    parser.add_argument('--salas', type=int, default=20)
+    parser.add_argument('--semanas', type=int, default=12)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--data-inicio', default='2024-06-10', help="Segunda-feira da primeira semana")
+    parser.add_argument('--carga-demanda', type=float, default=1.0)
+    parser.add_argument('--saida', required=True, help="Diretório onde os CSVs serão gravados")
+    args = parser.parse_args()
+
+    instancia = gerar_instancia(args.profissionais, args.salas, args.semanas, args.semente, args.data_inicio,
+                                args.carga_demanda)
+    salvar_instancia(args.saida, *instancia)
+    print(f"Instância gravada em {args.saida}: {len(instancia[0])} profissionais, {len(instancia[1])} salas, "
+          f"{len(instancia[2])} linhas de demanda")
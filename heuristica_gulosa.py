@@ -0,0 +1,219 @@
+import argparse
+import time
+
+import numpy as np
+
+import agendamento_psicologico as ap
+import modelo_escalonamento as me
+from configuracao_solver import adicionar_argumentos, configuracao_de_argumentos, imprimir_resumo, resolver
+
+# Heurística construtiva gulosa para os dois modelos. As demandas são preenchidas
+# em ordem de prioridade (`pesos`: urgência, triagem, rotina) e, dentro de cada
+# prioridade, em ordem cronológica. Cada atendimento vai para o profissional
+# disponível com mais horas restantes e, no agendamento, para uma sala aberta e
+# livre no turno. Horas e capacidades restantes ficam em arrays NumPy, e cada
+# linha de demanda é resolvida de uma vez (os k profissionais com mais horas).
+#
+# A escala gerada respeita as mesmas restrições dos modelos e pode ser usada como
+# solução inicial (MIP start) do CBC. Uma escala parcial pode ser passada em
+# `agenda_inicial` para ser completada (os atendimentos dela são mantidos).
+
+MODELOS = {'escalonamento': me, 'agendamento': ap}
+
+
+def _ordem_prioridade(chaves, pesos):
+    # chaves: (data, turno, tipo)
+    return sorted(range(len(chaves)),
+                  key=lambda i: (-pesos[chaves[i][2]], chaves[i][0], me.turnos.index(chaves[i][1])))
+
+
+def _disponibilidade(indices):
+    # Matriz profissionais x (dia, turno) e posição de cada (dia, turno) nas colunas.
+    coluna = {(dia, turno): j for j, (dia, turno) in enumerate((d, t) for d in me.dias for t in me.turnos)}
+    disp = np.zeros((len(indices['profissionais']), len(coluna)), dtype=bool)
+    for i, p in enumerate(indices['profissionais']):
+        for chave in indices['disponivel'][p]:
+            if chave in coluna:
+                disp[i, coluna[chave]] = True
+    return disp, coluna
+
+
+def _escolher(candidatos, restante, k):
+    # Os k candidatos com mais horas restantes (empate: menor posição, para ser determinístico).
+    posicoes = np.flatnonzero(candidatos)
+    return posicoes[np.argsort(-restante[posicoes], kind='stable')[:k]]
+
+
+def escalonamento_guloso(indices, agenda_inicial=(), carga_usada=None, excedente=False):
+    # Devolve a escala como lista de (profissional, data, turno, tipo), as chaves de
+    # `x` em `modelo_escalonamento.construir_modelo`. A restrição de demanda desse
+    # modelo é um mínimo (>=) e cada atendimento reduz o custo; com `excedente`, uma
+    # segunda passada usa a capacidade e as horas que sobraram, como faz o ótimo.
+    carga_usada = carga_usada or {}
+    ids = indices['profissionais']
+    posicao = {p: i for i, p in enumerate(ids)}
+    semanas = sorted(set(indices['semana_da_data'].values()))
+    posicao_semana = {s: j for j, s in enumerate(semanas)}
+    disp, coluna = _disponibilidade(indices)
+    duracao = me.duracao_atendimento
+
+    restante = np.array([[indices['carga_max'][p] - carga_usada.get((p, s), 0) for s in semanas] for p in ids],
+                        dtype=float)
+    capacidade = {(data, turno): indices['capacidade'][(dia, turno)]
+                  for data, dia in indices['dia_da_data'].items() for turno in me.turnos}
+
+    agenda = list(agenda_inicial)
+    atribuidos = {}  # (data, turno, tipo) -> profissionais já escalados
+    for p, data, turno, tipo in agenda:
+        atribuidos.setdefault((data, turno, tipo), set()).add(p)
+        restante[posicao[p], posicao_semana[indices['semana_da_data'][data]]] -= duracao
+        capacidade[(data, turno)] -= 1
+
+    linhas = indices['linhas']
+    chaves = [(data, turno, tipo) for data, _, turno, tipo, _ in linhas]
+    ordem = _ordem_prioridade(chaves, me.pesos)
+    for alem_da_demanda in ([False, True] if excedente else [False]):
+        for i in ordem:
+            data, dia, turno, tipo, quantidade = linhas[i]
+            ja = atribuidos.setdefault(chaves[i], set())
+            limite = len(ids) if alem_da_demanda else quantidade - len(ja)
+            k = min(limite, capacidade[(data, turno)])
+            if k <= 0:
+                continue
+            semana = posicao_semana[indices['semana_da_data'][data]]
+            candidatos = disp[:, coluna[(dia, turno)]] & (restante[:, semana] >= duracao)
+            for p in ja:
+                candidatos[posicao[p]] = False
+            escolhidos = _escolher(candidatos, restante[:, semana], k)
+            restante[escolhidos, semana] -= duracao
+            capacidade[(data, turno)] -= len(escolhidos)
+            ja.update(ids[j] for j in escolhidos)
+            agenda.extend((ids[j], data, turno, tipo) for j in escolhidos)
+    return agenda
+
+
+def agendamento_guloso(indices, agenda_inicial=()):
+    # Devolve a agenda como lista de (profissional, data, turno, sala, tipo), as chaves
+    # de `x` em `agendamento_psicologico.construir_modelo`.
+    ids = indices['profissionais']
+    posicao = {p: i for i, p in enumerate(ids)}
+    disp, coluna = _disponibilidade(indices)
+    duracao = ap.duracao_atendimento
+
+    restante = np.array([indices['carga_max'][p] for p in ids], dtype=float)
+    ocupado = {}     # (data, turno) -> array booleano dos profissionais já em atendimento (R1)
+    salas_usadas = {}  # (data, turno) -> salas já ocupadas (R2)
+
+    def turno_ocupado(d, t):
+        if (d, t) not in ocupado:
+            ocupado[(d, t)] = np.zeros(len(ids), dtype=bool)
+        return ocupado[(d, t)]
+
+    agenda = list(agenda_inicial)
+    atendidos = {}
+    for p, d, t, s, tipo in agenda:
+        restante[posicao[p]] -= duracao
+        turno_ocupado(d, t)[posicao[p]] = True
+        salas_usadas.setdefault((d, t), set()).add(s)
+        atendidos[(d, t, tipo)] = atendidos.get((d, t, tipo), 0) + 1
+
+    chaves = list(indices['demanda'])
+    for i in _ordem_prioridade(chaves, ap.pesos):
+        d, t, tipo = chaves[i]
+        dia = indices['dia_da_data'][d]
+        usadas = salas_usadas.setdefault((d, t), set())
+        livres = [s for s in indices['salas_abertas'][(dia, t)]
+                  if s not in usadas and indices['capacidade_sala'][s] >= duracao]
+        candidatos = disp[:, coluna[(dia, t)]] & ~turno_ocupado(d, t) & (restante >= duracao)
+        k = min(indices['demanda'][chaves[i]] - atendidos.get(chaves[i], 0), len(livres))
+        if k <= 0:
+            continue
+        escolhidos = _escolher(candidatos, restante, k)
+        restante[escolhidos] -= duracao
+        turno_ocupado(d, t)[escolhidos] = True
+        for j, s in zip(escolhidos, livres):
+            usadas.add(s)
+            agenda.append((ids[j], d, t, s, tipo))
+    return agenda
+
+
+# ----------------------------------------------------------------------
+# Solução inicial para os modelos PuLP
+# ----------------------------------------------------------------------
+
+def iniciar_escalonamento(indices, agenda, x, folga, max_carga, carga_usada=None):
+    # Preenche varValue de todas as variáveis do modelo de escalonamento a partir da escala.
+    carga_usada = carga_usada or {}
+    escolhidas = set(agenda)
+    for chave, var in x.items():
+        var.varValue = 1 if chave in escolhidas else 0
+    atendidos, carga = {}, dict(carga_usada)
+    for p, data, turno, tipo in agenda:
+        atendidos[(data, turno, tipo)] = atendidos.get((data, turno, tipo), 0) + 1
+        chave = (p, indices['semana_da_data'][data])
+        carga[chave] = carga.get(chave, 0) + me.duracao_atendimento
+    for data, _, turno, tipo, quantidade in indices['linhas']:
+        folga[(data, turno, tipo)].varValue = max(0, quantidade - atendidos.get((data, turno, tipo), 0))
+    max_carga.varValue = max(carga.values(), default=0)
+
+
+def iniciar_agendamento(indices, agenda, x, folga, desbalanceamento):
+    # Preenche varValue de todas as variáveis do modelo de agendamento a partir da agenda.
+    escolhidas = set(agenda)
+    for chave, var in x.items():
+        var.varValue = 1 if chave in escolhidas else 0
+    atendidos = {}
+    carga = {p: 0 for p in indices['profissionais']}
+    for p, d, t, s, tipo in agenda:
+        atendidos[(d, t, tipo)] = atendidos.get((d, t, tipo), 0) + 1
+        carga[p] += ap.duracao_atendimento
+    for chave, quantidade in indices['demanda'].items():
+        folga[chave].varValue = quantidade - atendidos.get(chave, 0)
+    media = sum(indices['carga_max'].values()) * ap.duracao_atendimento / len(carga)
+    for p, horas in carga.items():
+        desbalanceamento[p].varValue = abs(horas - media)
+
+
+def gerar(nome_modelo, indices):
+    # Escala gulosa no formato das chaves de `x` do modelo escolhido.
+    if nome_modelo == 'escalonamento':
+        return escalonamento_guloso(indices, excedente=True)
+    return agendamento_guloso(indices)
+
+
+def construir_com_inicio(nome_modelo, indices, agenda=None):
+    # Constrói o modelo e deixa a escala gulosa (ou `agenda`, se informada) como
+    # valores das variáveis, para resolver com warm_start=True. Devolve (modelo, agenda).
+    agenda = gerar(nome_modelo, indices) if agenda is None else agenda
+    if nome_modelo == 'escalonamento':
+        model, x, folga, max_carga = me.construir_modelo(indices)
+        iniciar_escalonamento(indices, agenda, x, folga, max_carga)
+    else:
+        model, x, folga, desbalanceamento = ap.construir_modelo(indices)
+        iniciar_agendamento(indices, agenda, x, folga, desbalanceamento)
+    return model, agenda
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Heurística gulosa por prioridade para os modelos do projeto.")
+    parser.add_argument('--modelo', choices=sorted(MODELOS), default='escalonamento')
+    parser.add_argument('--diretorio', default='.')
+    parser.add_argument('--mip-start', action='store_true',
+                        help="Resolve o modelo com o CBC partindo da escala gulosa")
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    script = MODELOS[args.modelo]
+    indices = script.preparar_indices(*script.carregar_dados(args.diretorio))
+    inicio = time.perf_counter()
+    agenda = gerar(args.modelo, indices)
+    tempo = time.perf_counter() - inicio
+
+    model, agenda = construir_com_inicio(args.modelo, indices, agenda)
+    print(f"Heurística gulosa: {len(agenda)} atendimentos em {1000 * tempo:.1f} ms")
+    print(f"Viável para o modelo {args.modelo}: {model.valid()}")
+    print(f"Objetivo da escala gulosa: {model.objective.value():.2f}")
+
+    if args.mip_start:
+        imprimir_resumo(resolver(model, configuracao_de_argumentos(args), warm_start=True))
+        print(f"Objetivo após o CBC: {model.objective.value():.2f}")
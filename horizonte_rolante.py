@@ -0,0 +1,112 @@
+import argparse
+import time
+
+import pandas as pd
+
+import modelo_escalonamento as me
+from configuracao_solver import ConfiguracaoSolver, adicionar_argumentos, configuracao_de_argumentos, resolver
+
+# Horizonte rolante para o modelo de escalonamento: em vez de um único MIP com
+# todas as semanas de `demandas.csv`, resolve janelas consecutivas de dias. Só o
+# início de cada janela (`passo` dias) é fixado; o restante serve de antecipação
+# e é resolvido de novo na janela seguinte. Entre janelas são repassadas as horas
+# já usadas por profissional em cada semana e a demanda urgente não atendida.
+
+
+def _janelas(datas, janela, passo):
+    for inicio in range(0, len(datas), passo):
+        yield datas[inicio:inicio + janela], datas[inicio:inicio + passo]
+
+
+def resolver_horizonte_rolante(profissionais, salas, demandas, janela=6, passo=None, config=None):
+    # Devolve (agenda, folgas, resumo, urgencia_pendente): agenda com os atendimentos
+    # fixados, folgas por linha de demanda fixada, o resumo de cada janela resolvida
+    # e a demanda urgente ainda não atendida ao fim do horizonte.
+    passo = passo or janela
+    if passo > janela:
+        raise ValueError("o passo não pode ser maior que a janela")
+    config = config or ConfiguracaoSolver()
+    datas = sorted(demandas['data'].unique())
+
+    carga_usada = {}  # (profissional, semana) -> horas já fixadas
+    urgencia_pendente = 0  # demanda urgente não atendida nas janelas anteriores
+    agenda, folgas, resumo = [], [], []
+
+    for datas_janela, datas_fixadas in _janelas(datas, janela, passo):
+        demandas_janela = demandas[demandas['data'].isin(datas_janela)].copy()
+        # Quantidade prevista de cada linha, sem a urgência repassada de janelas anteriores
+        previstas = {(d, t, k): q for d, t, k, q in zip(demandas_janela['data'], demandas_janela['turno'],
+                                                       demandas_janela['tipo_atendimento'],
+                                                       demandas_janela['quantidade_prevista'])}
+        # A urgência pendente entra na primeira demanda urgente dos dias fixados da janela
+        urgentes = demandas_janela.index[(demandas_janela['tipo_atendimento'] == 'urgência')
+                                         & demandas_janela['data'].isin(datas_fixadas)]
+        if urgencia_pendente and len(urgentes):
+            demandas_janela.loc[urgentes[0], 'quantidade_prevista'] += urgencia_pendente
+            urgencia_pendente = 0
+
+        inicio = time.perf_counter()
+        indices = me.preparar_indices(profissionais, salas, demandas_janela)
+        model, x, folga, _ = me.construir_modelo(indices, carga_usada)
+        resultado = resolver(model, config)
+
+        fixadas = set(datas_fixadas)
+        for (p, data, turno, tipo), var in x.items():
+            if data in fixadas and var.varValue and var.varValue > 0.5:
+                agenda.append({'profissional': p, 'data': data, 'turno': turno, 'tipo_atendimento': tipo})
+                chave = (p, indices['semana_da_data'][data])
+                carga_usada[chave] = carga_usada.get(chave, 0) + me.duracao_atendimento
+        for (data, turno, tipo), var in folga.items():
+            if data in fixadas:
+                quantidade = round(var.varValue or 0)
+                # Casos repassados contam só no dia de origem; os que seguem sem atendimento
+                # continuam em `urgencia_pendente`
+                folgas.append({'data': data, 'turno': turno, 'tipo_atendimento': tipo,
+                               'folga': min(quantidade, previstas[(data, turno, tipo)])})
+                if tipo == 'urgência':
+                    urgencia_pendente += quantidade
+
+        resumo.append({'inicio': datas_janela[0], 'fim': datas_janela[-1], 'dias_fixados': len(datas_fixadas),
+                       'variaveis': model.numVariables(), 'restricoes': model.numConstraints(),
+                       'status': resultado.status, 'tempo': time.perf_counter() - inicio})
+
+    agenda = pd.DataFrame(agenda, columns=['profissional', 'data', 'turno', 'tipo_atendimento'])
+    folgas = pd.DataFrame(folgas, columns=['data', 'turno', 'tipo_atendimento', 'folga'])
+    return agenda, folgas, pd.DataFrame(resumo), urgencia_pendente
+
+
+def custo_total(agenda, folgas):
+    # Objetivo do modelo de escalonamento avaliado sobre o horizonte inteiro,
+    # com o equilíbrio de carga medido na maior carga semanal.
+    beneficio = agenda['tipo_atendimento'].map(me.pesos).sum() * 3
+    penalidade = (folgas['tipo_atendimento'].map(me.pesos) * folgas['folga']).sum() * 2
+    if len(agenda):
+        semana = agenda['data'].map(me.semana_iso)
+        max_carga = agenda.groupby(['profissional', semana]).size().max() * me.duracao_atendimento
+    else:
+        max_carga = 0
+    return -beneficio + penalidade + 0.1 * max_carga
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Escalonamento em horizonte rolante.")
+    parser.add_argument('--diretorio', default='.')
+    parser.add_argument('--janela', type=int, default=6, help="Dias de demanda em cada janela")
+    parser.add_argument('--passo', type=int, help="Dias fixados por janela (padrão: a janela inteira)")
+    parser.add_argument('--saida', help="Grava a agenda fixada em CSV")
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    profissionais, salas, demandas = me.carregar_dados(args.diretorio)
+    agenda, folgas, resumo, urgencia_pendente = resolver_horizonte_rolante(
+        profissionais, salas, demandas, args.janela, args.passo, configuracao_de_argumentos(args))
+
+    print(resumo.to_string(index=False))
+    print(f"\nAtendimentos fixados: {len(agenda)}")
+    print("Demanda não atendida por tipo:")
+    print(folgas.groupby('tipo_atendimento')['folga'].sum().to_string())
+    print(f"Urgência não atendida ao fim do horizonte: {urgencia_pendente}")
+    print(f"Tempo total de resolução: {resumo['tempo'].sum():.2f}s")
+    print(f"Custo total: {custo_total(agenda, folgas):.1f}")
+    if args.saida:
+        agenda.to_csv(args.saida, index=False)
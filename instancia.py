@@ -0,0 +1,138 @@
+import cache_instancia
+from cache_instancia import dias, slot, tipos, turnos
+
+# Camada de dados comum aos scripts. `Instancia` representa profissionais, salas,
+# slots (dia, turno) e demandas sobre os arrays compilados de `cache_instancia`:
+# nada é lido até o primeiro acesso, e as consultas usadas nos laços dos modelos
+# (capacidade do turno, disponibilidade do profissional, salas abertas) são O(1)
+# sobre tabelas montadas uma única vez. Criada a partir de um diretório, a
+# instância vem do cache mapeado em memória e, enviada a um pool de processos,
+# só leva o caminho: cada processo reabre o mesmo arquivo, sem cópia.
+
+
+class Instancia:
+    __slots__ = ('diretorio', 'diretorio_cache', '_arrays', '_posicao', '_capacidade', '_abertas', '_linhas',
+                 '_demanda', '_dia_da_data')
+
+    def __init__(self, diretorio='.', diretorio_cache=None, arrays=None):
+        self.diretorio = diretorio
+        self.diretorio_cache = diretorio_cache
+        self._arrays = arrays
+        self._posicao = self._capacidade = self._abertas = None
+        self._linhas = self._demanda = self._dia_da_data = None
+
+    @classmethod
+    def de_dataframes(cls, profissionais, salas, demandas):
+        # Instância em memória a partir de DataFrames (CSVs já lidos ou filtrados).
+        return cls(diretorio=None, arrays=cache_instancia.compilar_dataframes(profissionais, salas, demandas))
+
+    def __getstate__(self):
+        # Vinda do cache, basta o caminho; em memória, os arrays seguem junto.
+        arrays = self._arrays if self.diretorio is None else None
+        return self.diretorio, self.diretorio_cache, arrays
+
+    def __setstate__(self, estado):
+        self.__init__(*estado)
+
+    def carregar(self):
+        # Força a leitura (ou compilação) do cache; devolve a própria instância.
+        if self._arrays is None:
+            self._arrays = cache_instancia.carregar(self.diretorio, self.diretorio_cache)
+        return self
+
+    @property
+    def arrays(self):
+        return self.carregar()._arrays
+
+    # ------------------------------------------------------------------
+    # Profissionais
+    # ------------------------------------------------------------------
+
+    @property
+    def profissionais(self):
+        return self.arrays['ids_profissional'].tolist()
+
+    @property
+    def carga_max(self):
+        return dict(zip(self.profissionais, self.arrays['carga_max'].tolist()))
+
+    @property
+    def nomes(self):
+        return self.arrays['nome'].tolist()
+
+    def _indice(self, p):
+        if self._posicao is None:
+            self._posicao = {p: i for i, p in enumerate(self.profissionais)}
+        return self._posicao[p]
+
+    def disponivel(self, p, dia, turno):
+        return bool(int(self.arrays['disponibilidade'][self._indice(p)]) >> slot(dia, turno) & 1)
+
+    def turnos_disponiveis(self, p):
+        # Conjunto de (dia, turno) em que o profissional `p` atende.
+        bits = int(self.arrays['disponibilidade'][self._indice(p)])
+        return {(dia, turno) for dia in dias for turno in turnos if bits >> slot(dia, turno) & 1}
+
+    def matriz_disponibilidade(self):
+        # Matriz booleana (profissionais x slots), na ordem de `slot(dia, turno)`.
+        return cache_instancia.disponibilidade_matriz(self.arrays['disponibilidade'])
+
+    # ------------------------------------------------------------------
+    # Salas
+    # ------------------------------------------------------------------
+
+    @property
+    def salas(self):
+        return self.arrays['ids_sala'].tolist()
+
+    @property
+    def capacidade_sala(self):
+        return dict(zip(self.salas, self.arrays['capacidade_sala'].tolist()))
+
+    def capacidade(self, dia, turno):
+        # Capacidade somada das salas abertas no (dia, turno).
+        if self._capacidade is None:
+            self._capacidade = self.arrays['capacidade_slot'].sum(axis=0).tolist()
+        return self._capacidade[slot(dia, turno)]
+
+    def salas_abertas(self, dia, turno):
+        if self._abertas is None:
+            salas = self.salas
+            aberta = self.arrays['capacidade_slot'] > 0
+            self._abertas = [[salas[k] for k in aberta[:, j].nonzero()[0]] for j in range(aberta.shape[1])]
+        return self._abertas[slot(dia, turno)]
+
+    # ------------------------------------------------------------------
+    # Demandas
+    # ------------------------------------------------------------------
+
+    @property
+    def datas(self):
+        return self.arrays['datas'].tolist()
+
+    @property
+    def dia_da_data(self):
+        # Dia da semana de cada data, na ordem em que as datas aparecem na demanda.
+        if self._dia_da_data is None:
+            self._dia_da_data = {data: dias[i] for data, i in zip(self.datas, self.arrays['dia_da_data'].tolist())}
+        return self._dia_da_data
+
+    @property
+    def linhas(self):
+        # Linhas de demanda (data, dia_semana, turno, tipo, quantidade), na ordem do CSV.
+        if self._linhas is None:
+            datas = self.datas
+            dia = self.arrays['dia_da_data'].tolist()
+            self._linhas = [(datas[d], dias[dia[d]], turnos[t], tipos[k], q)
+                            for d, t, k, q in self.arrays['linhas'].tolist()]
+        return self._linhas
+
+    @property
+    def demanda(self):
+        # Quantidade prevista por (data, turno, tipo).
+        if self._demanda is None:
+            self._demanda = {(data, turno, tipo): q for data, _, turno, tipo, q in self.linhas}
+        return self._demanda
+
+    def demanda_total(self):
+        return int(self.arrays['linhas'][:, 3].sum())
@@ -0,0 +1,134 @@
+import contextlib
+import cProfile
+import json
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Instrumentação das fases dos scripts: cronômetros nomeados, memória alocada por
+# fase (tracemalloc), contagem de restrições e variáveis por família e, se pedido,
+# um dump do cProfile. Desligada, a instrumentação é um objeto nulo cujas fases
+# são um `nullcontext` compartilhado, sem custo perceptível.
+
+
+def _rss_mb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB no Linux
+
+
+def familia(nome):
+    # Família de uma restrição ou variável: o prefixo do nome até o primeiro '_'
+    # (por exemplo 'R1', 'Demanda', 'CapacidadeSalas', 'Atendimento').
+    return nome.split('_', 1)[0]
+
+
+class Perfilador:
+
+    ativo = True
+
+    def __init__(self, memoria=True, caminho_cprofile=None):
+        self.fases = []
+        self.contagens = {'restricoes': {}, 'variaveis': {}}
+        self.memoria = memoria
+        self.caminho_cprofile = caminho_cprofile
+        self.inicio = time.perf_counter()
+        # Pico de cada fase aberta anterior ao último reset_peak (feito por uma fase interna)
+        self._picos = []
+        if memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.perfil_cprofile = cProfile.Profile() if caminho_cprofile else None
+        if self.perfil_cprofile:
+            self.perfil_cprofile.enable()
+
+    @contextlib.contextmanager
+    def fase(self, nome):
+        if self.memoria:
+            # O reset apaga o pico da fase externa; ele fica guardado e volta no fim dela.
+            if self._picos:
+                self._picos[-1] = max(self._picos[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            antes, _ = tracemalloc.get_traced_memory()
+            self._picos.append(antes)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            registro = {'fase': nome, 'tempo': time.perf_counter() - inicio}
+            if self.memoria:
+                atual, pico = tracemalloc.get_traced_memory()
+                pico = max(pico, self._picos.pop())
+                registro['memoria_alocada_mb'] = (atual - antes) / 2 ** 20
+                registro['pico_memoria_mb'] = (pico - antes) / 2 ** 20
+            registro['rss_mb'] = _rss_mb()
+            self.fases.append(registro)
+
+    def contar(self, tipo, nome_familia, quantidade):
+        contagem = self.contagens[tipo]
+        contagem[nome_familia] = contagem.get(nome_familia, 0) + quantidade
+
+    def contar_modelo(self, prob):
+        # Número de restrições e variáveis de cada família de um LpProblem.
+        for nome in prob.constraints:
+            self.contar('restricoes', familia(nome), 1)
+        for var in prob.variables():
+            self.contar('variaveis', familia(var.name), 1)
+
+    def relatorio(self):
+        return {
+            'tempo_total': time.perf_counter() - self.inicio,
+            'fases': self.fases,
+            'contagens': self.contagens,
+            'pico_rss_mb': _rss_mb(),
+        }
+
+    def salvar(self, caminho):
+        if self.perfil_cprofile:
+            self.perfil_cprofile.disable()
+            self.perfil_cprofile.dump_stats(self.caminho_cprofile)
+        with open(caminho, 'w') as f:
+            json.dump(self.relatorio(), f, indent=2, ensure_ascii=False)
+
+
+class _PerfiladorNulo:
+
+    ativo = False
+    _fase = contextlib.nullcontext()
+
+    def fase(self, nome):
+        return self._fase
+
+    def contar(self, tipo, nome_familia, quantidade):
+        pass
+
+    def contar_modelo(self, prob):
+        pass
+
+    def salvar(self, caminho):
+        pass
+
+
+PERFILADOR_NULO = _PerfiladorNulo()
+
+
+def adicionar_argumentos(parser):
+    grupo = parser.add_argument_group('instrumentação')
+    grupo.add_argument('--perfil', metavar='ARQUIVO.json',
+                       help="Grava tempos, memória e contagens por fase em JSON")
+    grupo.add_argument('--cprofile', metavar='ARQUIVO.prof', help="Grava também um dump do cProfile")
+    return parser
+
+
+def perfilador_de_argumentos(args):
+    if not args.perfil and not args.cprofile:
+        return PERFILADOR_NULO
+    return Perfilador(caminho_cprofile=args.cprofile)
+
+
+def finalizar(perfil, args):
+    if perfil.ativo:
+        perfil.salvar(args.perfil or 'perfil.json')
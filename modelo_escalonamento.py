@@ -1,121 +1,229 @@
+import argparse
+import os
+
 import pandas as pd
 from pulp import *
 
-# Carregar os dados
-profissionais = pd.read_csv('profissionais.csv')
-salas = pd.read_csv('salas.csv')
-demandas = pd.read_csv('demandas.csv')
-
-dias = ['seg', 'ter', 'qua', 'qui', 'sex', 'sab']
-turnos = ['manhã', 'tarde']
+import extracao
+import instrumentacao
+import presolve
+from configuracao_solver import adicionar_argumentos, imprimir_resumo, resolver_com_argumentos
+from instancia import Instancia, dias, turnos
+from instrumentacao import PERFILADOR_NULO
 
 duracao_atendimento = 1  # em horas. Ajuste para 0.5 se cada atendimento durar 30 minutos
 
 # Pesos de prioridade para tipos de atendimento
 pesos = {'urgência': 3, 'triagem': 2, 'rotina': 1}
 
-# Pré-processamento das disponibilidades
-for dia in dias:
-    col = f'disponibilidade_{dia}'
-    profissionais[col] = profissionais[col].fillna('').apply(lambda x: [t.strip() for t in str(x).split(',') if t.strip()])
-
-# Variáveis de decisão: x[(profissional, data, turno, tipo_atendimento)]
-x = LpVariable.dicts(
-    "Atendimento",
-    ((p, row['data'], row['turno'], row['tipo_atendimento'])
-     for p in profissionais['id_profissional']
-     for _, row in demandas.iterrows()),
-    cat='Binary'
-)
-
-# Variáveis de folga: demanda não atendida por atendimento
-folga = LpVariable.dicts(
-    "Folga",
-    ((row['data'], row['turno'], row['tipo_atendimento'])
-     for _, row in demandas.iterrows()),
-    lowBound=0, cat='Integer'
-)
-
-# Variável auxiliar para o máximo de carga de trabalho
-max_carga = LpVariable('max_carga', lowBound=0)
-
-# Modelo
-model = LpProblem("Escalonamento_Cuidar_Bem", LpMinimize)
-
-# Função objetivo: minimizar tempo de espera ponderado, folgas e equilibrar carga de trabalho
-model += (
-    -3 * lpSum(x[(p, row['data'], row['turno'], row['tipo_atendimento'])] * pesos[row['tipo_atendimento']]
-           for p in profissionais['id_profissional']
-           for _, row in demandas.iterrows()) # Agora este termo é um 'benefício' (negativo na minimização)
-    + 2 * lpSum(folga[(row['data'], row['turno'], row['tipo_atendimento'])] * pesos[row['tipo_atendimento']]
-          for _, row in demandas.iterrows())  # penalidade alta para demanda não atendida
-    + 0.1 * max_carga  # Peso para equilíbrio de carga
-)
-
-# 1. Atender toda a demanda prevista (permitindo folga)
-for _, row in demandas.iterrows():
-    model += (
-        lpSum(x[(p, row['data'], row['turno'], row['tipo_atendimento'])]
-              for p in profissionais['id_profissional']) + folga[(row['data'], row['turno'], row['tipo_atendimento'])] >= row['quantidade_prevista'],
-        f"Demanda_{row['data']}_{row['turno']}_{row['tipo_atendimento']}"
-    )
-
-# 2. Respeitar disponibilidade dos profissionais
-for _, prof in profissionais.iterrows():
-    for _, row in demandas.iterrows():
-        dia_semana = row['dia_semana']
-        turno = row['turno']
-        if turno not in prof[f'disponibilidade_{dia_semana}']:
-            model += (
-                x[(prof['id_profissional'], row['data'], turno, row['tipo_atendimento'])] == 0,
-                f"Disponibilidade_{prof['id_profissional']}_{row['data']}_{turno}_{row['tipo_atendimento']}"
-            )
-
-# 3. Respeitar carga horária máxima semanal (ajustável pela duração do atendimento)
-for _, prof in profissionais.iterrows():
-    carga_prof = lpSum(x[(prof['id_profissional'], row['data'], row['turno'], row['tipo_atendimento'])] * duracao_atendimento
-                      for _, row in demandas.iterrows())
-    model += (carga_prof <= prof['carga_horaria_max'], f"CargaHoraria_{prof['id_profissional']}")
-    # Equilíbrio de carga: cada carga <= max_carga
-    model += (carga_prof <= max_carga, f"EquilibrioCarga_{prof['id_profissional']}")
-
-# 4. Capacidade das salas por turno (somando todos os tipos de atendimento)
-for data in demandas['data'].unique():
-    for turno in turnos:
-        dia = demandas[demandas['data'] == data]['dia_semana'].iloc[0]
-        capacidade_total = salas[salas['dias_funcionamento'].str.contains(dia) & salas['turnos_disponiveis'].str.contains(turno)]['capacidade'].sum()
-        model += (
-            lpSum(x[(p, data, turno, tipo)]
-                  for p in profissionais['id_profissional']
-                  for tipo in demandas[(demandas['data'] == data) & (demandas['turno'] == turno)]['tipo_atendimento'].unique()) <= capacidade_total,
-            f"CapacidadeSalas_{data}_{turno}"
-        )
-
-# Diagnóstico rápido de capacidade e carga horária
-for _, row in demandas.iterrows():
-    dia = row['dia_semana']
-    turno = row['turno']
-    capacidade_total = salas[salas['dias_funcionamento'].str.contains(dia) & salas['turnos_disponiveis'].str.contains(turno)]['capacidade'].sum()
-    print(f"{row['data']} {turno}: Demanda={row['quantidade_prevista']} Capacidade={capacidade_total}")
-
-total_carga = profissionais['carga_horaria_max'].sum()
-total_demanda = demandas['quantidade_prevista'].sum()
-print(f"Carga horária total disponível: {total_carga}")
-print(f"Demanda total prevista: {total_demanda}")
-
-# Resolver
-model.solve()
-
-# Resultados
-print("\nAlocação de atendimentos por profissional:")
-for v in model.variables():
-    if v.name.startswith('Atendimento') and v.varValue > 0:
-        print(v.name, '=', v.varValue)
-
-print("\nDemandas não atendidas (folga):")
-for v in model.variables():
-    if v.name.startswith('Folga') and v.varValue > 0:
-        print(v.name, '=', v.varValue)
-
-print("\nStatus:", LpStatus[model.status])
-print("Custo total:", value(model.objective)) 
\ No newline at end of file
+
+def carregar_dados(diretorio='.'):
+    # Carregar os dados
+    profissionais = pd.read_csv(os.path.join(diretorio, 'profissionais.csv'))
+    salas = pd.read_csv(os.path.join(diretorio, 'salas.csv'))
+    demandas = pd.read_csv(os.path.join(diretorio, 'demandas.csv'))
+
+    # Pré-processamento das disponibilidades
+    for dia in dias:
+        col = f'disponibilidade_{dia}'
+        profissionais[col] = profissionais[col].fillna('').apply(lambda x: [t.strip() for t in str(x).split(',') if t.strip()])
+    return profissionais, salas, demandas
+
+
+def semana_iso(data):
+    ano, semana, _ = pd.Timestamp(data).isocalendar()
+    return f"{ano}-S{semana:02d}"
+
+
+def preparar_indices(profissionais, salas, demandas):
+    # Índices a partir de DataFrames (CSVs lidos por `carregar_dados` ou uma janela
+    # da demanda); a conversão é a mesma de `indices_da_instancia`.
+    return indices_da_instancia(Instancia.de_dataframes(profissionais, salas, demandas))
+
+
+def indices_da_instancia(instancia):
+    # Índices calculados uma única vez, para que a construção do modelo não
+    # precise voltar aos DataFrames (iterrows, máscaras booleanas, str.contains).
+    ids = instancia.profissionais
+
+    # Conjunto de (dia, turno) em que cada profissional está disponível
+    disponivel = {p: instancia.turnos_disponiveis(p) for p in ids}
+
+    # Capacidade total das salas por (dia, turno), somando as salas abertas
+    capacidade = {(dia, turno): instancia.capacidade(dia, turno) for dia in dias for turno in turnos}
+
+    # Linhas de demanda como tuplas (data, dia_semana, turno, tipo, quantidade)
+    linhas = instancia.linhas
+
+    # Dia da semana de cada data (primeira ocorrência) e linhas por (data, turno)
+    dia_da_data = instancia.dia_da_data
+    linhas_por_turno = {}
+    for i, (data, _, turno, _, _) in enumerate(linhas):
+        linhas_por_turno.setdefault((data, turno), []).append(i)
+
+    # Semana (ISO) de cada data: a carga horária máxima é semanal
+    semana_da_data = {data: semana_iso(data) for data in dia_da_data}
+
+    # Profissionais disponíveis para cada linha de demanda. Só esses pares
+    # (profissional, linha) recebem variável de decisão.
+    profissionais_por_linha = [[p for p in ids if (dia, turno) in disponivel[p]]
+                               for _, dia, turno, _, _ in linhas]
+
+    return {
+        'profissionais': ids,
+        'carga_max': instancia.carga_max,
+        'disponivel': disponivel,
+        'capacidade': capacidade,
+        'linhas': linhas,
+        'dia_da_data': dia_da_data,
+        'linhas_por_turno': linhas_por_turno,
+        'profissionais_por_linha': profissionais_por_linha,
+        'semana_da_data': semana_da_data,
+    }
+
+
+def funcao_objetivo(x, folga, max_carga, pesos_tipo=None, coef_atendimento=3, coef_folga=2, coef_carga=0.1):
+    # Minimizar tempo de espera ponderado, folgas e equilibrar carga de trabalho.
+    # O atendimento entra como 'benefício' (negativo na minimização) e a folga com penalidade alta.
+    pesos_tipo = pesos_tipo or pesos
+    termos = [(var, -coef_atendimento * pesos_tipo[chave[3]]) for chave, var in x.items()]
+    termos += [(var, coef_folga * pesos_tipo[chave[2]]) for chave, var in folga.items()]
+    termos.append((max_carga, coef_carga))  # Peso para equilíbrio de carga
+    return LpAffineExpression(termos)
+
+
+def construir_modelo(indices, carga_usada=None, perfil=PERFILADOR_NULO, **coeficientes):
+    # `carga_usada[(p, semana)]` são horas já comprometidas fora do modelo (por exemplo,
+    # dias já fixados pelo horizonte rolante); descontam do limite semanal e entram
+    # no equilíbrio de carga. `perfil` cronometra cada família de restrições.
+    # `coeficientes` (pesos_tipo, coef_atendimento, coef_folga, coef_carga) substituem
+    # os pesos padrão da função objetivo.
+    carga_usada = carga_usada or {}
+    ids = indices['profissionais']
+    linhas = indices['linhas']
+    chaves = [(data, turno, tipo) for data, _, turno, tipo, _ in linhas]
+    por_linha = indices['profissionais_por_linha']
+
+    with perfil.fase('variaveis'):
+        # Variáveis de decisão: x[(profissional, data, turno, tipo_atendimento)], criadas
+        # apenas quando o profissional está disponível no dia e turno da demanda.
+        x = LpVariable.dicts("Atendimento", [(p,) + k for k, ps in zip(chaves, por_linha) for p in ps], cat='Binary')
+
+        # Variáveis de folga: demanda não atendida por atendimento
+        folga = LpVariable.dicts("Folga", chaves, lowBound=0, cat='Integer')
+
+        # Variável auxiliar para o máximo de carga de trabalho
+        max_carga = LpVariable('max_carga', lowBound=0)
+
+    # Modelo
+    model = LpProblem("Escalonamento_Cuidar_Bem", LpMinimize)
+
+    # Função objetivo: minimizar tempo de espera ponderado, folgas e equilibrar carga de trabalho.
+    with perfil.fase('objetivo'):
+        model.setObjective(funcao_objetivo(x, folga, max_carga, **coeficientes))
+
+    # 1. Atender toda a demanda prevista (permitindo folga)
+    with perfil.fase('restricoes_Demanda'):
+        for k, ps, (data, _, turno, tipo, quantidade) in zip(chaves, por_linha, linhas):
+            expr = LpAffineExpression([(x[(p,) + k], 1) for p in ps] + [(folga[k], 1)])
+            model.addConstraint(LpConstraint(expr, LpConstraintGE, f"Demanda_{data}_{turno}_{tipo}", quantidade))
+
+    # 2. A disponibilidade dos profissionais já está garantida pela criação esparsa
+    # das variáveis: pares indisponíveis simplesmente não existem no modelo.
+
+    # 3. Respeitar carga horária máxima semanal (ajustável pela duração do atendimento).
+    # Com mais de uma semana na demanda, há uma restrição por profissional e semana.
+    with perfil.fase('restricoes_CargaHoraria_EquilibrioCarga'):
+        semana_da_data = indices['semana_da_data']
+        semanas = sorted(set(semana_da_data.values()))
+        carga = {(p, sem): [] for p in ids for sem in semanas}
+        for k, ps in zip(chaves, por_linha):
+            sem = semana_da_data[k[0]]
+            for p in ps:
+                carga[(p, sem)].append((x[(p,) + k], duracao_atendimento))
+        for p in ids:
+            for sem in semanas:
+                sufixo = f"{p}" if len(semanas) == 1 else f"{p}_{sem}"
+                usada = carga_usada.get((p, sem), 0)
+                model.addConstraint(LpConstraint(LpAffineExpression(carga[(p, sem)]), LpConstraintLE,
+                                                 f"CargaHoraria_{sufixo}", indices['carga_max'][p] - usada))
+                # Equilíbrio de carga: cada carga <= max_carga
+                model.addConstraint(LpConstraint(LpAffineExpression(carga[(p, sem)] + [(max_carga, -1)]),
+                                                 LpConstraintLE, f"EquilibrioCarga_{sufixo}", -usada))
+
+    # 4. Capacidade das salas por turno (somando todos os tipos de atendimento)
+    with perfil.fase('restricoes_CapacidadeSalas'):
+        for data, dia in indices['dia_da_data'].items():
+            for turno in turnos:
+                expr = LpAffineExpression([(x[(p,) + chaves[i]], 1)
+                                           for i in indices['linhas_por_turno'].get((data, turno), [])
+                                           for p in por_linha[i]])
+                model.addConstraint(LpConstraint(expr, LpConstraintLE, f"CapacidadeSalas_{data}_{turno}",
+                                                 indices['capacidade'][(dia, turno)]))
+
+    perfil.contar_modelo(model)
+
+    return model, x, folga, max_carga
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Modelo de escalonamento do centro comunitário Cuidar Bem.")
+    parser.add_argument('--lp', metavar='ARQUIVO.lp', help="Grava o modelo no formato .lp")
+    parser.add_argument('--saida', metavar='ARQUIVO', type=extracao.arquivo_saida,
+                        help="Grava a agenda (e a folga) em .csv ou .parquet")
+    adicionar_argumentos(parser)
+    presolve.adicionar_argumentos(parser)
+    instrumentacao.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    perfil = instrumentacao.perfilador_de_argumentos(args)
+
+    # Instância lida do cache compilado (recompilado quando os CSVs mudam)
+    with perfil.fase('carga_dados'):
+        instancia = Instancia('.').carregar()
+    with perfil.fase('indices'):
+        indices = indices_da_instancia(instancia)
+    with perfil.fase('construcao'):
+        model, x, folga, max_carga = construir_modelo(indices, perfil=perfil)
+    if args.lp:
+        with perfil.fase('escrita_lp'):
+            model.writeLP(args.lp)
+
+    # Diagnóstico rápido de capacidade e carga horária
+    for data, dia, turno, _, quantidade in indices['linhas']:
+        print(f"{data} {turno}: Demanda={quantidade} Capacidade={indices['capacidade'][(dia, turno)]}")
+
+    total_carga = sum(indices['carga_max'].values())
+    total_demanda = instancia.demanda_total()
+    print(f"Carga horária total disponível: {total_carga}")
+    print(f"Demanda total prevista: {total_demanda}")
+
+    # Resolver (threads, limite de tempo, gap e corrida conforme a linha de comando)
+    with perfil.fase('resolucao'):
+        imprimir_resumo(presolve.resolver_com_presolve(model, args, resolver_com_argumentos, perfil))
+
+    # Resultados: valores das variáveis lidos uma única vez para tabelas
+    with perfil.fase('extracao'):
+        agenda = extracao.tabela_agenda(x, extracao.CAMPOS_ESCALONAMENTO)
+        folgas = extracao.tabela_folga(folga)
+        if args.saida:
+            extracao.salvar_solucao(args.saida, agenda, folgas)
+
+        print("\nAlocação de atendimentos por profissional:")
+        print(agenda.sort_values(['profissional', 'data', 'turno']).to_string(index=False))
+
+        print("\nCarga horária por profissional:")
+        print(extracao.carga_por_profissional(agenda, duracao_atendimento, indices['profissionais']).to_string())
+
+        print("\nDemandas não atendidas (folga):")
+        print(folgas[folgas['folga'] > 0].to_string(index=False))
+
+        print("\nComposição do custo:")
+        composicao = extracao.composicao_objetivo(agenda, folgas, {t: -3 * w for t, w in pesos.items()},
+                                                  {t: 2 * w for t, w in pesos.items()},
+                                                  {'max_carga': 0.1 * (max_carga.varValue or 0)})
+        print(composicao.to_string())
+
+        print("\nStatus:", LpStatus[model.status])
+        print("Custo total:", value(model.objective))
+
+    instrumentacao.finalizar(perfil, args)
@@ -0,0 +1,400 @@
+import argparse
+import os
+import subprocess
+import tempfile
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from pulp import PULP_CBC_CMD, PulpSolverError
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import coo_matrix
+
+import agendamento_psicologico as ap
+import modelo_escalonamento as me
+from instancia import Instancia
+
+# Montagem dos modelos em forma matricial: objetivo, limites e matriz de restrições
+# em arrays NumPy/SciPy (CSR), sem passar por `lpSum`/`LpAffineExpression`.
+# O modelo pode ser resolvido pelo `scipy.optimize.milp` (HiGHS, em processo) ou
+# gravado como MPS e entregue ao CBC. A formulação em PuLP dos scripts continua
+# disponível como referência para conferir o objetivo.
+
+dias = me.dias
+turnos = me.turnos
+
+MINIMIZAR = 1
+MAXIMIZAR = -1
+
+
+@dataclass
+class ModeloMatricial:
+    nome: str
+    sentido: int
+    c: np.ndarray
+    A: object  # scipy.sparse.csr_matrix
+    linha_min: np.ndarray
+    linha_max: np.ndarray
+    var_min: np.ndarray
+    var_max: np.ndarray
+    inteira: np.ndarray
+    # Famílias de variáveis: nome -> (início, fim, tabela com as colunas da chave)
+    variaveis: dict = field(default_factory=dict)
+    # Famílias de restrições: nome -> (início, fim)
+    restricoes: dict = field(default_factory=dict)
+
+    @property
+    def num_variaveis(self):
+        return self.A.shape[1]
+
+    @property
+    def num_restricoes(self):
+        return self.A.shape[0]
+
+
+@dataclass
+class ResultadoMatricial:
+    status: str
+    objetivo: float
+    valores: np.ndarray
+
+
+class Montador:
+    # Acumula blocos de restrições em formato COO e monta a matriz CSR no final.
+    # Usado também por outros modelos matriciais (demanda_estocastica).
+
+    def __init__(self):
+        self.linhas, self.colunas, self.coefs = [], [], []
+        self.linha_min, self.linha_max = [], []
+        self.familias = {}
+        self.n = 0
+
+    def familia(self, nome, n_linhas, minimo, maximo):
+        inicio = self.n
+        self.n += n_linhas
+        self.linha_min.append(np.broadcast_to(np.asarray(minimo, dtype=float), (n_linhas,)))
+        self.linha_max.append(np.broadcast_to(np.asarray(maximo, dtype=float), (n_linhas,)))
+        self.familias[nome] = (inicio, self.n)
+        return inicio
+
+    def termos(self, linhas, colunas, coefs):
+        linhas = np.asarray(linhas, dtype=np.int64)
+        self.linhas.append(linhas)
+        self.colunas.append(np.asarray(colunas, dtype=np.int64))
+        self.coefs.append(np.broadcast_to(np.asarray(coefs, dtype=float), linhas.shape))
+
+    def matriz(self, n_variaveis):
+        A = coo_matrix((np.concatenate(self.coefs), (np.concatenate(self.linhas), np.concatenate(self.colunas))),
+                       shape=(self.n, n_variaveis)).tocsr()
+        A.sum_duplicates()
+        return A, np.concatenate(self.linha_min), np.concatenate(self.linha_max)
+
+
+def tabelas_instancia(profissionais, salas, demandas):
+    # Converte os DataFrames (já pré-processados por `carregar_dados`) em arrays
+    # indexados por profissional, sala e slot (dia, turno), a partir de `Instancia`.
+    instancia = Instancia.de_dataframes(profissionais, salas, demandas)
+    arrays = instancia.arrays
+    linhas = arrays['linhas']
+    return {
+        'ids': arrays['ids_profissional'],
+        'carga_max': arrays['carga_max'].astype(float),
+        'disp': instancia.matriz_disponibilidade(),
+        'ids_sala': arrays['ids_sala'],
+        'capacidade_sala': arrays['capacidade_sala'].astype(float),
+        'aberta': arrays['capacidade_slot'] > 0,
+        'data': np.array([data for data, _, _, _, _ in instancia.linhas], dtype=object),
+        'turno': np.array([turno for _, _, turno, _, _ in instancia.linhas], dtype=object),
+        'tipo': np.array([tipo for _, _, _, tipo, _ in instancia.linhas], dtype=object),
+        'quantidade': linhas[:, 3].astype(float),
+        'slot': (arrays['dia_da_data'][linhas[:, 0]].astype(np.int64) * len(turnos) + linhas[:, 1]),
+    }
+
+
+def carga_e_capacidade(m, tab, linha_x, prof_x, col_max, duracao):
+    # Restrições 3 e 4 do escalonamento, que só envolvem os atendimentos (colunas 0..nx-1);
+    # compartilhadas com o modelo de demanda estocástica.
+    nx = len(linha_x)
+    n_prof = len(tab['ids'])
+    # 3. Carga horária máxima semanal e equilíbrio de carga, por (profissional, semana)
+    semana, unicas = pd.factorize(pd.Series(tab['data']).map(me.semana_iso))
+    n_grupos = n_prof * len(unicas)
+    grupo_carga = prof_x * len(unicas) + semana[linha_x]
+    r = m.familia('CargaHoraria', n_grupos, -np.inf, np.repeat(tab['carga_max'], len(unicas)))
+    m.termos(r + grupo_carga, np.arange(nx), duracao)
+    r = m.familia('EquilibrioCarga', n_grupos, -np.inf, 0)
+    m.termos(r + grupo_carga, np.arange(nx), duracao)
+    m.termos(r + np.arange(n_grupos), np.full(n_grupos, col_max), -1)
+    # 4. Capacidade das salas por (data, turno)
+    grupo, unicos = pd.factorize(pd.MultiIndex.from_arrays([tab['data'], tab['turno']]))
+    cap_slot = (tab['capacidade_sala'][:, None] * tab['aberta']).sum(axis=0)
+    cap_grupo = np.zeros(len(unicos))
+    cap_grupo[grupo] = cap_slot[tab['slot']]
+    r = m.familia('CapacidadeSalas', len(cap_grupo), -np.inf, cap_grupo)
+    m.termos(r + grupo[linha_x], np.arange(nx), 1)
+
+
+def montar_escalonamento(tab, pesos=None, duracao=None):
+    # Mesma formulação de `modelo_escalonamento.construir_modelo`.
+    pesos = me.pesos if pesos is None else pesos
+    duracao = me.duracao_atendimento if duracao is None else duracao
+    n_linhas, n_prof = len(tab['quantidade']), len(tab['ids'])
+    peso = np.array([pesos[t] for t in tab['tipo']], dtype=float)
+
+    # Atendimento: apenas pares (linha de demanda, profissional) disponíveis
+    linha_x, prof_x = np.nonzero(tab['disp'][:, tab['slot']].T)
+    nx = len(linha_x)
+    col_folga = nx + np.arange(n_linhas)
+    col_max = nx + n_linhas
+    n = col_max + 1
+
+    c = np.concatenate([-3 * peso[linha_x], 2 * peso, [0.1]])
+    var_min = np.zeros(n)
+    var_max = np.concatenate([np.ones(nx), np.full(n_linhas, np.inf), [np.inf]])
+    inteira = np.concatenate([np.ones(nx + n_linhas, dtype=bool), [False]])
+
+    m = Montador()
+    # 1. Demanda: soma dos atendimentos + folga >= quantidade prevista
+    r = m.familia('Demanda', n_linhas, tab['quantidade'], np.inf)
+    m.termos(r + linha_x, np.arange(nx), 1)
+    m.termos(r + np.arange(n_linhas), col_folga, 1)
+    carga_e_capacidade(m, tab, linha_x, prof_x, col_max, duracao)
+
+    A, linha_min, linha_max = m.matriz(n)
+    variaveis = {
+        'Atendimento': (0, nx, {'profissional': tab['ids'][prof_x], 'data': tab['data'][linha_x],
+                                'turno': tab['turno'][linha_x], 'tipo_atendimento': tab['tipo'][linha_x]}),
+        'Folga': (nx, nx + n_linhas, {'data': tab['data'], 'turno': tab['turno'], 'tipo_atendimento': tab['tipo']}),
+        'max_carga': (col_max, n, {}),
+    }
+    return ModeloMatricial("Escalonamento_Cuidar_Bem", MINIMIZAR, c, A, linha_min, linha_max,
+                           var_min, var_max, inteira, variaveis, m.familias)
+
+
+def montar_agendamento(tab, pesos=None, duracao=None):
+    # Mesma formulação de `agendamento_psicologico.construir_modelo`.
+    pesos = ap.pesos if pesos is None else pesos
+    duracao = ap.duracao_atendimento if duracao is None else duracao
+    n_prof = len(tab['ids'])
+
+    # Uma linha por (data, turno, tipo); linhas repetidas somam na mesma demanda.
+    chave = pd.DataFrame({'data': tab['data'], 'turno': tab['turno'], 'tipo': tab['tipo']})
+    codigo_k, unicos_k = pd.factorize(pd.MultiIndex.from_frame(chave))
+    n_k = len(unicos_k)
+    quantidade = np.zeros(n_k)
+    quantidade[codigo_k] = tab['quantidade']
+    slot_k = np.zeros(n_k, dtype=np.int64)
+    slot_k[codigo_k] = tab['slot']
+    data_k = np.asarray(unicos_k.get_level_values(0))
+    turno_k = np.asarray(unicos_k.get_level_values(1))
+    tipo_k = np.asarray(unicos_k.get_level_values(2))
+    peso_k = np.array([pesos[t] for t in tipo_k], dtype=float)
+    # Índice de (data, turno) de cada demanda, usado por R1, R2 e R4
+    codigo_dt, unicos_dt = pd.factorize(pd.MultiIndex.from_arrays([data_k, turno_k]))
+    n_dt = len(unicos_dt)
+
+    # x: (demanda, profissional, sala) com profissional disponível e sala aberta
+    viavel = tab['disp'][:, slot_k].T[:, :, None] & tab['aberta'][:, slot_k].T[:, None, :]
+    k_x, p_x, s_x = np.nonzero(viavel)
+    nx = len(k_x)
+    col_folga = nx + np.arange(n_k)
+    col_desb = nx + n_k + np.arange(n_prof)
+    n = nx + n_k + n_prof
+
+    c = np.concatenate([peso_k[k_x] * duracao, -peso_k, np.full(n_prof, -0.1)])
+    var_min = np.zeros(n)
+    var_max = np.concatenate([np.ones(nx), np.full(n_k + n_prof, np.inf)])
+    inteira = np.concatenate([np.ones(nx, dtype=bool), np.zeros(n_k + n_prof, dtype=bool)])
+
+    m = Montador()
+    cols = np.arange(nx)
+    # R1: no máximo um atendimento por profissional em cada (data, turno)
+    _, g1 = np.unique(p_x * n_dt + codigo_dt[k_x], return_inverse=True)
+    r = m.familia('R1', g1.max() + 1 if nx else 0, -np.inf, 1)
+    m.termos(r + g1, cols, 1)
+    # R2 e R4: exclusividade e capacidade de cada sala em cada (data, turno)
+    u2, g2 = np.unique(s_x * n_dt + codigo_dt[k_x], return_inverse=True)
+    r = m.familia('R2', len(u2), -np.inf, 1)
+    m.termos(r + g2, cols, 1)
+    r = m.familia('R4', len(u2), -np.inf, tab['capacidade_sala'][u2 // max(n_dt, 1)])
+    m.termos(r + g2, cols, duracao)
+    # R3: atendimentos + folga == demanda prevista
+    r = m.familia('R3', n_k, quantidade, quantidade)
+    m.termos(r + k_x, cols, 1)
+    m.termos(r + np.arange(n_k), col_folga, 1)
+    # R5: carga horária máxima e desbalanceamento em relação à média
+    media = tab['carga_max'].sum() * duracao / n_prof
+    r = m.familia('R5_Carga_Horaria_Max', n_prof, -np.inf, tab['carga_max'])
+    m.termos(r + p_x, cols, duracao)
+    r = m.familia('R5_Desbalanceamento_Positivo', n_prof, -np.inf, media)
+    m.termos(r + p_x, cols, duracao)
+    m.termos(r + np.arange(n_prof), col_desb, -1)
+    r = m.familia('R5_Desbalanceamento_Negativo', n_prof, -np.inf, -media)
+    m.termos(r + p_x, cols, -duracao)
+    m.termos(r + np.arange(n_prof), col_desb, -1)
+
+    A, linha_min, linha_max = m.matriz(n)
+    variaveis = {
+        'x': (0, nx, {'profissional': tab['ids'][p_x], 'data': data_k[k_x], 'turno': turno_k[k_x],
+                      'sala': tab['ids_sala'][s_x], 'tipo_atendimento': tipo_k[k_x]}),
+        'folga': (nx, nx + n_k, {'data': data_k, 'turno': turno_k, 'tipo_atendimento': tipo_k}),
+        'desbalanceamento': (nx + n_k, n, {'profissional': tab['ids']}),
+    }
+    return ModeloMatricial("Agendamento_Psicologico", MAXIMIZAR, c, A, linha_min, linha_max,
+                           var_min, var_max, inteira, variaveis, m.familias)
+
+
+def resolver_milp(modelo, limite_tempo=None, mensagens=False):
+    # Resolve em processo com `scipy.optimize.milp` (HiGHS).
+    opcoes = {'disp': mensagens}
+    if limite_tempo is not None:
+        opcoes['time_limit'] = limite_tempo
+    res = milp(modelo.sentido * modelo.c,
+               constraints=LinearConstraint(modelo.A, modelo.linha_min, modelo.linha_max),
+               integrality=modelo.inteira.astype(np.uint8),
+               bounds=Bounds(modelo.var_min, modelo.var_max),
+               options=opcoes)
+    if res.x is None:
+        return ResultadoMatricial(res.message, None, None)
+    status = 'Optimal' if res.status == 0 else res.message
+    return ResultadoMatricial(status, float(modelo.c @ res.x), res.x)
+
+
+def _numero(v):
+    return f"{v:.12g}"
+
+
+def escrever_mps(modelo, caminho):
+    # Grava o modelo em formato MPS, linha a linha, percorrendo a matriz por colunas.
+    # O MPS é sempre de minimização; para maximizar o objetivo é negado.
+    A = modelo.A.tocsc()
+    c = modelo.sentido * modelo.c
+    lo, hi = modelo.linha_min, modelo.linha_max
+    with open(caminho, 'w') as f:
+        f.write(f"NAME {modelo.nome}\nROWS\n N OBJ\n")
+        for i in range(modelo.num_restricoes):
+            if lo[i] == hi[i]:
+                tipo = 'E'
+            elif np.isfinite(hi[i]):
+                tipo = 'L'
+            else:
+                tipo = 'G'
+            f.write(f" {tipo} R{i}\n")
+        f.write("COLUMNS\n")
+        em_inteiras = False
+        for j in range(modelo.num_variaveis):
+            if modelo.inteira[j] != em_inteiras:
+                f.write("    MARKER 'MARKER' 'INTORG'\n" if modelo.inteira[j] else "    MARKER 'MARKER' 'INTEND'\n")
+                em_inteiras = bool(modelo.inteira[j])
+            if c[j] != 0:
+                f.write(f"    C{j} OBJ {_numero(c[j])}\n")
+            inicio, fim = A.indptr[j], A.indptr[j + 1]
+            for i, v in zip(A.indices[inicio:fim], A.data[inicio:fim]):
+                f.write(f"    C{j} R{i} {_numero(v)}\n")
+            if inicio == fim and c[j] == 0:
+                f.write(f"    C{j} OBJ 0\n")
+        if em_inteiras:
+            f.write("    MARKER 'MARKER' 'INTEND'\n")
+        f.write("RHS\n")
+        for i in range(modelo.num_restricoes):
+            rhs = hi[i] if np.isfinite(hi[i]) else lo[i]
+            if rhs != 0:
+                f.write(f"    RHS R{i} {_numero(rhs)}\n")
+        # Restrições com os dois lados finitos: linha L com intervalo até o limite inferior
+        com_intervalo = np.nonzero(np.isfinite(lo) & np.isfinite(hi) & (lo != hi))[0]
+        if len(com_intervalo):
+            f.write("RANGES\n")
+            for i in com_intervalo:
+                f.write(f"    RNG R{i} {_numero(hi[i] - lo[i])}\n")
+        f.write("BOUNDS\n")
+        for j in range(modelo.num_variaveis):
+            vmin, vmax = modelo.var_min[j], modelo.var_max[j]
+            if modelo.inteira[j] and vmin == 0 and vmax == 1:
+                f.write(f" BV BND C{j}\n")
+                continue
+            if vmin != 0:
+                f.write(f" LO BND C{j} {_numero(vmin)}\n" if np.isfinite(vmin) else f" MI BND C{j}\n")
+            f.write(f" UP BND C{j} {_numero(vmax)}\n" if np.isfinite(vmax) else f" PL BND C{j}\n")
+        f.write("ENDATA\n")
+
+
+def resolver_cbc(modelo, caminho_mps=None, limite_tempo=None, mensagens=False):
+    # Grava o MPS e chama o executável do CBC distribuído com o PuLP.
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho_mps = caminho_mps or os.path.join(tmp, 'modelo.mps')
+        caminho_sol = os.path.join(tmp, 'modelo.sol')
+        escrever_mps(modelo, caminho_mps)
+        comando = [PULP_CBC_CMD().path, caminho_mps]
+        if limite_tempo is not None:
+            comando += ['-sec', str(limite_tempo)]
+        comando += ['-timeMode', 'elapsed', '-branch', '-printingOptions', 'all', '-solution', caminho_sol]
+        subprocess.run(comando, check=True, stdout=None if mensagens else subprocess.DEVNULL)
+
+        if not os.path.exists(caminho_sol):
+            raise PulpSolverError(f"CBC não gerou solução para {caminho_mps}")
+        valores = np.zeros(modelo.num_variaveis)
+        with open(caminho_sol) as f:
+            cabecalho = f.readline()
+            status = cabecalho.split(' - ')[0].strip()
+            # Sem solução inteira o arquivo ainda traz valores (da relaxação ou lixo)
+            if status.startswith(('Infeasible', 'Integer infeasible', 'Unbounded')) \
+                    or 'no integer solution' in cabecalho:
+                return ResultadoMatricial(status, None, None)
+            for linha in f:
+                partes = linha.split()
+                if partes and partes[0] == '**':
+                    partes = partes[1:]
+                if len(partes) >= 3 and partes[1].startswith('C'):
+                    valores[int(partes[1][1:])] = float(partes[2])
+    status = 'Optimal' if status.startswith('Optimal') else status
+    return ResultadoMatricial(status, float(modelo.c @ valores), valores)
+
+
+def extrair(modelo, valores, familia, apenas_positivos=True):
+    # Devolve uma tabela (DataFrame) com as chaves e os valores de uma família de variáveis.
+    inicio, fim, colunas = modelo.variaveis[familia]
+    tabela = pd.DataFrame(dict(colunas, valor=valores[inicio:fim]))
+    if apenas_positivos:
+        tabela = tabela[tabela['valor'] > 1e-6]
+    return tabela.reset_index(drop=True)
+
+
+def objetivo_pulp(nome_modelo, profissionais, salas, demandas):
+    # Modo de referência: constrói e resolve a formulação em PuLP do script correspondente.
+    script = me if nome_modelo == 'escalonamento' else ap
+    prob = script.construir_modelo(script.preparar_indices(profissionais, salas, demandas))[0]
+    prob.solve(PULP_CBC_CMD(msg=False))
+    return prob.objective.value()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Monta e resolve os modelos em forma matricial (CSR).")
+    parser.add_argument('--modelo', choices=['escalonamento', 'agendamento'], default='escalonamento')
+    parser.add_argument('--metodo', choices=['milp', 'cbc', 'pulp'], default='milp',
+                        help="milp: scipy/HiGHS em processo; cbc: arquivo MPS para o CBC; pulp: formulação de referência")
+    parser.add_argument('--diretorio', default='.')
+    parser.add_argument('--mps', help="Caminho para manter o arquivo MPS gravado (método cbc)")
+    parser.add_argument('--conferir', action='store_true', help="Compara o objetivo com a formulação em PuLP")
+    args = parser.parse_args()
+
+    script = me if args.modelo == 'escalonamento' else ap
+    profissionais, salas, demandas = script.carregar_dados(args.diretorio)
+
+    if args.metodo == 'pulp':
+        print("Objetivo (PuLP):", objetivo_pulp(args.modelo, profissionais, salas, demandas))
+    else:
+        tab = tabelas_instancia(profissionais, salas, demandas)
+        modelo = montar_escalonamento(tab) if args.modelo == 'escalonamento' else montar_agendamento(tab)
+        print(f"Modelo {modelo.nome}: {modelo.num_variaveis} variáveis, {modelo.num_restricoes} restrições, "
+              f"{modelo.A.nnz} não nulos")
+        resultado = resolver_milp(modelo) if args.metodo == 'milp' else resolver_cbc(modelo, args.mps)
+        print("Status:", resultado.status)
+        if resultado.valores is None:
+            print("Nenhuma solução viável encontrada.")
+        else:
+            print("Objetivo:", resultado.objetivo)
+            familia = 'Atendimento' if args.modelo == 'escalonamento' else 'x'
+            print(extrair(modelo, resultado.valores, familia).to_string(index=False))
+            if args.conferir:
+                referencia = objetivo_pulp(args.modelo, profissionais, salas, demandas)
+                print(f"Objetivo (PuLP): {referencia}  Diferença: {abs(referencia - resultado.objetivo):.6g}")
@@ -0,0 +1,164 @@
+import argparse
+import concurrent.futures
+import time
+
+import numpy as np
+import pandas as pd
+
+import modelo_escalonamento as me
+
+# Motor de Monte Carlo para a linha de base aleatória (`solucao_aleatoria.py`).
+# Em vez de uma única escala sorteada, milhares de replicações são simuladas ao
+# mesmo tempo sobre arrays NumPy (uma linha por replicação) e os blocos de
+# replicações são distribuídos por um pool de processos.
+#
+# Cada replicação segue as mesmas regras do script original: pesos, capacidades,
+# quantidades e penalidades perturbados, linhas de demanda em ordem aleatória e,
+# para cada atendimento, profissionais tentados em ordem aleatória com 10% de
+# chance de rejeição cada. Com k profissionais viáveis (disponíveis e com horas
+# restantes), isso equivale a não alocar com probabilidade 0.1**k e, caso
+# contrário, escolher um deles de forma uniforme — é assim que o sorteio é feito aqui.
+
+duracao_atendimento = 1  # em horas
+pesos_base = {'urgência': 3, 'triagem': 2, 'rotina': 1}
+chance_rejeicao = 0.1
+
+metricas = ['custo_aleatorio', 'atendimentos', 'demanda_atendida_ponderada', 'folga_total', 'max_carga']
+
+
+def montar_tabelas(profissionais, salas, demandas):
+    # Arrays da instância usados pela simulação: disponibilidade (linhas de demanda x
+    # profissionais), carga máxima, capacidade por (data, turno) e dados das linhas.
+    indices = me.preparar_indices(profissionais, salas, demandas)
+    ids = indices['profissionais']
+    tipos = list(pesos_base)
+    turnos_data = [(data, turno) for data in indices['dia_da_data'] for turno in me.turnos]
+    posicao_turno = {chave: i for i, chave in enumerate(turnos_data)}
+    linhas = indices['linhas']
+    return {
+        'ids': np.array(ids),
+        'carga_max': np.array([indices['carga_max'][p] for p in ids], dtype=float),
+        'capacidade': np.array([indices['capacidade'][(indices['dia_da_data'][d], t)] for d, t in turnos_data]),
+        'disponivel': np.array([[(dia, turno) in indices['disponivel'][p] for p in ids]
+                                for _, dia, turno, _, _ in linhas], dtype=bool),
+        'turno_da_linha': np.array([posicao_turno[(data, turno)] for data, _, turno, _, _ in linhas]),
+        'tipo_da_linha': np.array([tipos.index(tipo) for _, _, _, tipo, _ in linhas]),
+        'quantidade': np.array([q for *_, q in linhas], dtype=float),
+        'pesos': np.array([pesos_base[t] for t in tipos], dtype=float),
+    }
+
+
+def simular(tabelas, n, rng):
+    # Simula `n` replicações independentes e devolve um DataFrame com as métricas de cada uma.
+    disponivel = tabelas['disponivel']
+    carga_max = tabelas['carga_max']
+    turno_da_linha = tabelas['turno_da_linha']
+    tipo_da_linha = tabelas['tipo_da_linha']
+    n_linhas, n_prof = disponivel.shape
+    todas = np.arange(n)
+
+    pesos = tabelas['pesos'] * rng.uniform(0.8, 1.2, (n, len(tabelas['pesos'])))
+    capacidade = (tabelas['capacidade'] * rng.uniform(0.9, 1.1, (n, len(tabelas['capacidade'])))).astype(int)
+    ordem = np.argsort(rng.random((n, n_linhas)), axis=1)
+    quantidade = np.maximum(1, (tabelas['quantidade'] * rng.uniform(0.9, 1.1, (n, n_linhas))).astype(int))
+    penalidade_folga = rng.uniform(1.8, 2.2, n)
+    penalidade_carga = rng.uniform(0.08, 0.12, n)
+
+    carga = np.zeros((n, n_prof))
+    alocados = np.zeros((n, n_linhas), dtype=int)
+    for passo in range(n_linhas):
+        linha = ordem[:, passo]
+        turno = turno_da_linha[linha]
+        alvo = quantidade[todas, linha]
+        disponiveis = disponivel[linha]
+        ativos = np.ones(n, dtype=bool)
+        for unidade in range(alvo.max()):
+            # Uma replicação sai da linha quando completa a quantidade ou quando um
+            # atendimento não é alocado (o `break` do script original).
+            ativos &= alvo > unidade
+            viaveis = disponiveis & (carga + duracao_atendimento <= carga_max) & ativos[:, None]
+            k = viaveis.sum(axis=1)
+            ativos &= (capacidade[todas, turno] > 0) & (k > 0) & (rng.random(n) >= chance_rejeicao ** k)
+            if not ativos.any():
+                break
+            escolhido = np.argmax(np.where(viaveis, rng.random((n, n_prof)), -1.0), axis=1)
+            r = todas[ativos]
+            carga[r, escolhido[ativos]] += duracao_atendimento
+            capacidade[r, turno[ativos]] -= 1
+            alocados[r, linha[ativos]] += 1
+
+    peso_linha = pesos[:, tipo_da_linha]
+    folga = quantidade - alocados
+    atendida = (alocados * peso_linha).sum(axis=1)
+    max_carga = carga.max(axis=1)
+    custo = -atendida + penalidade_folga * (folga * peso_linha).sum(axis=1) + penalidade_carga * max_carga
+    return pd.DataFrame({
+        'custo_aleatorio': custo,
+        'atendimentos': alocados.sum(axis=1),
+        'demanda_atendida_ponderada': atendida,
+        'folga_total': folga.sum(axis=1),
+        'max_carga': max_carga,
+    })
+
+
+def _simular_bloco(argumentos):
+    tabelas, n, semente = argumentos
+    return simular(tabelas, n, np.random.default_rng(semente))
+
+
+def executar(tabelas, replicacoes, semente=0, processos=None, tamanho_bloco=1000):
+    # Divide as replicações em blocos com sementes independentes (SeedSequence.spawn).
+    # O resultado depende só de `semente` e `tamanho_bloco`, não do número de processos.
+    blocos = [min(tamanho_bloco, replicacoes - i) for i in range(0, replicacoes, tamanho_bloco)]
+    sementes = np.random.SeedSequence(semente).spawn(len(blocos))
+    tarefas = [(tabelas, n, s) for n, s in zip(blocos, sementes)]
+    if processos == 1:
+        partes = list(map(_simular_bloco, tarefas))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processos) as executor:
+            partes = list(executor.map(_simular_bloco, tarefas))
+    return pd.concat(partes, ignore_index=True)
+
+
+def resumir(resultados, nivel=0.95):
+    # Média, desvio, quantis e intervalo de confiança (aproximação normal) da média de cada métrica.
+    z = {0.9: 1.645, 0.95: 1.96, 0.99: 2.576}[nivel]
+    linhas = {}
+    for m in metricas:
+        valores = resultados[m].to_numpy(dtype=float)
+        media = valores.mean()
+        erro = valores.std(ddof=1) / np.sqrt(len(valores)) if len(valores) > 1 else 0.0
+        q05, q25, q50, q75, q95 = np.quantile(valores, [0.05, 0.25, 0.5, 0.75, 0.95])
+        linhas[m] = {'media': media, 'desvio': valores.std(ddof=1) if len(valores) > 1 else 0.0,
+                     'q05': q05, 'q25': q25, 'mediana': q50, 'q75': q75, 'q95': q95,
+                     'ic_inferior': media - z * erro, 'ic_superior': media + z * erro}
+    return pd.DataFrame(linhas).T
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Monte Carlo da solução aleatória de referência.")
+    parser.add_argument('--diretorio', default='.')
+    parser.add_argument('--replicacoes', type=int, default=10000)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--processos', type=int, default=None, help="Processos do pool (padrão: todos os núcleos)")
+    parser.add_argument('--bloco', type=int, default=1000, help="Replicações por tarefa do pool")
+    parser.add_argument('--saida', help="CSV com as métricas de cada replicação")
+    parser.add_argument('--comparar', action='store_true',
+                        help="Resolve o modelo de escalonamento e posiciona seu custo na distribuição")
+    args = parser.parse_args()
+
+    tabelas = montar_tabelas(*me.carregar_dados(args.diretorio))
+    inicio = time.perf_counter()
+    resultados = executar(tabelas, args.replicacoes, args.semente, args.processos, args.bloco)
+    print(f"{len(resultados)} replicações em {time.perf_counter() - inicio:.2f}s\n")
+    print(resumir(resultados).to_string(float_format=lambda v: f"{v:.2f}"))
+    if args.saida:
+        resultados.to_csv(args.saida, index=False)
+
+    if args.comparar:
+        from configuracao_solver import resolver
+        model = me.construir_modelo(me.preparar_indices(*me.carregar_dados(args.diretorio)))[0]
+        objetivo = resolver(model).objetivo
+        fracao = (resultados['custo_aleatorio'] <= objetivo).mean()
+        print(f"\nCusto do modelo otimizado: {objetivo:.2f}")
+        print(f"Replicações aleatórias com custo menor ou igual: {100 * fracao:.2f}%")
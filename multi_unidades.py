@@ -0,0 +1,416 @@
+import argparse
+import concurrent.futures
+import heapq
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from pulp import LpAffineExpression, LpConstraint, LpConstraintGE, LpConstraintLE, LpMinimize, LpProblem, LpVariable
+
+import extracao
+import gerador_instancias
+import modelo_escalonamento as me
+from configuracao_solver import adicionar_argumentos, imprimir_resumo, resolver_com_argumentos
+from instancia import Instancia
+
+# Escalonamento de uma rede de unidades Cuidar Bem que compartilham profissionais.
+# Cada unidade tem suas salas e sua demanda; o cadastro de profissionais é único e
+# a carga horária semanal de cada profissional é somada entre as unidades.
+#
+# Estrutura do diretório da rede:
+#   profissionais.csv               cadastro comum
+#   vinculos.csv (opcional)         id_profissional, unidade — quem pode atender onde
+#   <unidade>/salas.csv, <unidade>/demandas.csv
+#
+# O modelo é o do `modelo_escalonamento.py` com índice de unidade. Ele é resolvido
+# por relaxação lagrangiana das restrições que acoplam as unidades: a carga horária
+# semanal (multiplicadores λ por profissional e semana) e o equilíbrio de carga
+# (multiplicadores μ, com soma até 0.1, o peso de max_carga). Relaxadas, as
+# unidades viram subproblemas independentes, resolvidos em paralelo. Em cada um, o
+# profissional custa o preço π = λ + μ por hora e, em cada (data, turno), só a
+# capacidade das salas limita a escala. O ganho marginal de um atendimento na linha
+# de demanda é 5·peso − π enquanto há demanda (atendimento + folga evitada) e
+# 3·peso − π depois. Com os profissionais em ordem de preço, esses ganhos não crescem
+# dentro da linha, então escolher os maiores ganhos positivos até a capacidade do
+# turno é ótimo. Os subproblemas são resolvidos exatamente, e o valor da relaxação
+# é um limitante inferior válido. Os multiplicadores seguem o subgradiente, com o
+# passo de Polyak. A cada iteração, a escala dos subproblemas é reparada (cortes
+# onde a carga semanal estoura e preenchimento guloso com as horas que sobraram)
+# para dar um limitante superior viável.
+
+duracao = me.duracao_atendimento
+_estado = {}
+
+
+# =============================================================================
+# Dados da rede
+# =============================================================================
+
+def carregar_rede(diretorio):
+    profissionais = pd.read_csv(os.path.join(diretorio, 'profissionais.csv'))
+    unidades = sorted(nome for nome in os.listdir(diretorio)
+                      if os.path.exists(os.path.join(diretorio, nome, 'demandas.csv')))
+    if not unidades:
+        raise ValueError(f"nenhuma unidade (subdiretório com salas.csv e demandas.csv) em {diretorio}")
+    caminho_vinculos = os.path.join(diretorio, 'vinculos.csv')
+    vinculos = pd.read_csv(caminho_vinculos) if os.path.exists(caminho_vinculos) else None
+    instancias = {u: Instancia.de_dataframes(profissionais, pd.read_csv(os.path.join(diretorio, u, 'salas.csv')),
+                                             pd.read_csv(os.path.join(diretorio, u, 'demandas.csv')))
+                  for u in unidades}
+    return instancias, vinculos
+
+
+def tabelas_rede(instancias, vinculos=None):
+    # Arrays de cada unidade: linhas de demanda, pares (linha, profissional) viáveis,
+    # grupo (data, turno) de cada linha com a capacidade do grupo e a semana global.
+    indices = {u: me.indices_da_instancia(inst) for u, inst in instancias.items()}
+    primeira = next(iter(indices.values()))
+    ids = primeira['profissionais']
+    semanas = sorted({s for ind in indices.values() for s in ind['semana_da_data'].values()})
+    posicao = {p: i for i, p in enumerate(ids)}
+    tabelas = {}
+    for u, ind in indices.items():
+        permitidos = set(ids) if vinculos is None else \
+            set(vinculos.loc[vinculos['unidade'] == u, 'id_profissional'].tolist())
+        linhas = ind['linhas']
+        grupos = {}
+        grupo = np.array([grupos.setdefault((data, turno), len(grupos)) for data, _, turno, _, _ in linhas],
+                         dtype=np.int64)
+        pares = [(i, posicao[p]) for i, ps in enumerate(ind['profissionais_por_linha']) for p in ps if p in permitidos]
+        linha_x, prof_x = (np.array(v, dtype=np.int64) for v in zip(*pares)) if pares else (np.zeros(0, np.int64),) * 2
+        tabelas[u] = {
+            'linhas': linhas,
+            'peso': np.array([me.pesos[tipo] for _, _, _, tipo, _ in linhas], dtype=float),
+            'quantidade': np.array([q for *_, q in linhas], dtype=np.int64),
+            'semana': np.array([semanas.index(ind['semana_da_data'][data]) for data, *_ in linhas], dtype=np.int64),
+            'grupo': grupo,
+            'capacidade': np.array([ind['capacidade'][(ind['dia_da_data'][data], turno)] for data, turno in grupos],
+                                   dtype=np.int64),
+            'linha_x': linha_x,
+            'prof_x': prof_x,
+        }
+    carga_max = np.array([primeira['carga_max'][p] for p in ids], dtype=float)
+    return tabelas, ids, semanas, carga_max
+
+
+# =============================================================================
+# Subproblema de uma unidade
+# =============================================================================
+
+def _posicao_no_grupo(chave_ordenada):
+    # Posição de cada elemento dentro do seu bloco (chaves já ordenadas).
+    n = len(chave_ordenada)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    inicio = np.flatnonzero(np.r_[True, chave_ordenada[1:] != chave_ordenada[:-1]])
+    return np.arange(n) - np.repeat(inicio, np.diff(np.r_[inicio, n]))
+
+
+def resolver_subproblema(tab, preco):
+    # Escala ótima da unidade com o preço por hora `preco[p, semana]`. Devolve o custo
+    # do subproblema (sem o termo −λ·carga_max), os pares escolhidos e a carga (P x W).
+    semana_x = tab['semana'][tab['linha_x']]
+    custo_hora = preco[tab['prof_x'], semana_x] * duracao
+    ordem = np.lexsort((custo_hora, tab['linha_x']))
+    linha = tab['linha_x'][ordem]
+    posicao = _posicao_no_grupo(linha)
+    peso = tab['peso'][linha]
+    ganho = 3 * peso + 2 * peso * (posicao < tab['quantidade'][linha]) - custo_hora[ordem]
+
+    grupo = tab['grupo'][linha]
+    ordem_grupo = np.lexsort((posicao, -ganho, grupo))
+    escolhido = np.zeros(len(ordem), dtype=bool)
+    escolhido[ordem_grupo] = (_posicao_no_grupo(grupo[ordem_grupo]) < tab['capacidade'][grupo[ordem_grupo]]) & \
+        (ganho[ordem_grupo] > 0)
+
+    pares = ordem[escolhido]
+    custo = 2 * (tab['peso'] * tab['quantidade']).sum() - ganho[escolhido].sum()
+    carga = np.zeros(preco.shape)
+    np.add.at(carga, (tab['prof_x'][pares], semana_x[pares]), duracao)
+    return custo, pares, carga
+
+
+def _inicializar(tabelas):
+    _estado['tabelas'] = tabelas
+
+
+def _subproblema(unidade, preco):
+    return resolver_subproblema(_estado['tabelas'][unidade], preco)
+
+
+# =============================================================================
+# Limitante superior: reparo da escala dos subproblemas
+# =============================================================================
+
+def custo_escala(tabelas, escala, carga):
+    # Objetivo do escalonamento em rede: atendimentos, folga e 0.1·max_carga.
+    total = 0.1 * carga.max(initial=0)
+    for u, tab in tabelas.items():
+        atendidos = np.bincount(tab['linha_x'][escala[u]], minlength=len(tab['linhas']))
+        total += (-3 * tab['peso'] * atendidos).sum()
+        total += (2 * tab['peso'] * np.maximum(0, tab['quantidade'] - atendidos)).sum()
+    return total
+
+
+def _ganho_real(tab, pares):
+    # Ganho de cada atendimento escolhido no objetivo original: 5·peso enquanto cobre a
+    # demanda da linha, 3·peso além dela.
+    linha = tab['linha_x'][pares]
+    ordem = np.argsort(linha, kind='stable')
+    linha_ordenada = linha[ordem]
+    ganho = np.empty(len(pares))
+    ganho[ordem] = tab['peso'][linha_ordenada] * \
+        (3 + 2 * (_posicao_no_grupo(linha_ordenada) < tab['quantidade'][linha_ordenada]))
+    return ganho
+
+
+def reparar(tabelas, escolhas, carga_max, preco):
+    # Remove os atendimentos que estouram a carga semanal (os de menor ganho primeiro)
+    # e completa a escala com as horas e a capacidade que sobraram.
+    unidades = list(tabelas)
+    escolhas = {u: np.sort(escolhas[u]) for u in unidades}
+    n_prof = len(carga_max)
+    n_semanas = 1 + max(int(t['semana'].max(initial=0)) for t in tabelas.values())
+    u_par = np.concatenate([np.full(len(escolhas[u]), k) for k, u in enumerate(unidades)])
+    par = np.concatenate([escolhas[u] for u in unidades]).astype(np.int64)
+    prof = np.concatenate([tabelas[u]['prof_x'][escolhas[u]] for u in unidades]).astype(np.int64)
+    semana = np.concatenate([tabelas[u]['semana'][tabelas[u]['linha_x'][escolhas[u]]] for u in unidades])
+    ganho = np.concatenate([_ganho_real(tabelas[u], escolhas[u]) for u in unidades])
+
+    chave = prof * n_semanas + semana
+    carga = np.bincount(chave, minlength=n_prof * n_semanas) * duracao
+    excesso = np.ceil(np.maximum(0, carga - np.repeat(carga_max, n_semanas)) / duracao).astype(np.int64)
+    ordem = np.lexsort((ganho, chave))
+    manter = np.ones(len(par), dtype=bool)
+    manter[ordem] = _posicao_no_grupo(chave[ordem]) >= excesso[chave[ordem]]
+
+    escala = {u: np.sort(par[manter & (u_par == k)]) for k, u in enumerate(unidades)}
+    limite = np.repeat(carga_max, n_semanas).reshape(n_prof, n_semanas)
+    restante = limite - \
+        (np.bincount(chave[manter], minlength=n_prof * n_semanas) * duracao).reshape(n_prof, n_semanas)
+
+    # Preenchimento: pares livres de todas as unidades em ordem de ganho reduzido (ganho
+    # real menos o preço lagrangiano das horas do profissional), enquanto houver sala e
+    # horas. O ganho real cai de 5·peso para 3·peso quando a demanda da linha é coberta.
+    escolhido, atendidos, livre, candidatos = {}, {}, {}, []
+    for k, u in enumerate(unidades):
+        tab = tabelas[u]
+        escolhido[u] = np.zeros(len(tab['linha_x']), dtype=bool)
+        escolhido[u][escala[u]] = True
+        atendidos[u] = np.bincount(tab['linha_x'][escala[u]], minlength=len(tab['linhas'])).tolist()
+        livre[u] = (tab['capacidade'] - np.bincount(tab['grupo'][tab['linha_x'][escala[u]]],
+                                                    minlength=len(tab['capacidade']))).tolist()
+        semana_x = tab['semana'][tab['linha_x']]
+        aberto = ~escolhido[u] & (np.array(livre[u])[tab['grupo'][tab['linha_x']]] > 0) & \
+            (restante[tab['prof_x'], semana_x] >= duracao)
+        pares = np.flatnonzero(aberto)
+        candidatos.append(pd.DataFrame({
+            'unidade': k, 'par': pares, 'linha': tab['linha_x'][pares], 'prof': tab['prof_x'][pares],
+            'semana': semana_x[pares], 'grupo': tab['grupo'][tab['linha_x'][pares]],
+            'peso': tab['peso'][tab['linha_x'][pares]], 'preco': preco[tab['prof_x'][pares], semana_x[pares]]}))
+    candidatos = pd.concat(candidatos, ignore_index=True)
+    restante = restante.tolist()
+    quantidade = {u: tabelas[u]['quantidade'].tolist() for u in unidades}
+
+    fila = [(-5 * w + c * duracao, -3 * w + c * duracao, k, par, i, j, s, g) for k, par, i, j, s, g, w, c in
+            zip(*(candidatos[coluna].tolist() for coluna in ('unidade', 'par', 'linha', 'prof', 'semana', 'grupo',
+                                                              'peso', 'preco')))]
+    heapq.heapify(fila)
+    while fila:
+        prioridade, alem, k, par, i, j, s, g = heapq.heappop(fila)
+        u = unidades[k]
+        if escolhido[u][par] or livre[u][g] <= 0 or restante[j][s] < duracao:
+            continue
+        if atendidos[u][i] >= quantidade[u][i] and prioridade < alem:
+            # a demanda da linha já foi coberta: o par volta à fila com o ganho menor
+            heapq.heappush(fila, (alem, alem, k, par, i, j, s, g))
+            continue
+        escolhido[u][par] = True
+        livre[u][g] -= 1
+        restante[j][s] -= duracao
+        atendidos[u][i] += 1
+    escala = {u: np.flatnonzero(escolhido[u]) for u in unidades}
+    return escala, custo_escala(tabelas, escala, limite - np.array(restante))
+
+
+# =============================================================================
+# Relaxação lagrangiana
+# =============================================================================
+
+def _projetar(mu, total):
+    # Projeção em {mu >= 0, soma(mu) <= total}.
+    mu = np.maximum(mu, 0)
+    if mu.sum() <= total:
+        return mu
+    v = np.sort(mu.ravel())[::-1]
+    acumulado = np.cumsum(v) - total
+    k = np.flatnonzero(v - acumulado / np.arange(1, len(v) + 1) > 0)[-1]
+    return np.maximum(mu - acumulado[k] / (k + 1), 0)
+
+
+def relaxacao_lagrangiana(tabelas, carga_max, n_semanas, processos=None, max_iteracoes=200, gap_alvo=1e-3,
+                          paciencia=10, limite_tempo=None):
+    # Devolve o melhor limitante inferior, a melhor escala viável com seu custo e o histórico.
+    unidades = list(tabelas)
+    capacidade_semanal = np.repeat(carga_max[:, None], n_semanas, axis=1)
+    lam = np.zeros((len(carga_max), n_semanas))
+    mu = np.zeros_like(lam)
+    theta = 2.0
+    inferior, superior, melhor_escala = -np.inf, np.inf, None
+    sem_melhora = 0
+    historico = []
+    inicio = time.perf_counter()
+    processos = processos or min(len(unidades), os.cpu_count() or 1)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processos, initializer=_inicializar,
+                                                initargs=(tabelas,)) as executor:
+        for iteracao in range(max_iteracoes):
+            preco = lam + mu
+            resultados = list(executor.map(_subproblema, unidades, [preco] * len(unidades)))
+            carga = sum(r[2] for r in resultados)
+            valor = sum(r[0] for r in resultados) - (lam * capacidade_semanal).sum()
+            if valor > inferior + 1e-9:
+                inferior, sem_melhora = valor, 0
+            else:
+                sem_melhora += 1
+                if sem_melhora >= paciencia:
+                    theta, sem_melhora = theta / 2, 0
+
+            escala, custo = reparar(tabelas, {u: r[1] for u, r in zip(unidades, resultados)}, carga_max, preco)
+            if custo < superior:
+                superior, melhor_escala = custo, escala
+            gap = (superior - inferior) / max(abs(superior), 1e-9)
+            historico.append({'iteracao': iteracao, 'lagrangiano': valor, 'inferior': inferior,
+                              'superior': superior, 'gap': gap, 'passo': theta})
+            if gap <= gap_alvo or (limite_tempo and time.perf_counter() - inicio > limite_tempo):
+                break
+
+            # Subgradiente: carga - capacidade para λ; carga para μ (max_carga = 0 na relaxação)
+            g_lam = carga - capacidade_semanal
+            g_lam[(lam <= 0) & (g_lam < 0)] = 0
+            norma = (g_lam ** 2).sum() + (carga ** 2).sum()
+            if norma == 0:
+                break
+            passo = theta * (superior - valor) / norma
+            lam = np.maximum(0, lam + passo * g_lam)
+            mu = _projetar(mu + passo * carga, 0.1)
+    return inferior, superior, melhor_escala, pd.DataFrame(historico)
+
+
+def tabela_escala(tabelas, escala, ids):
+    partes = []
+    for u, tab in tabelas.items():
+        pares = escala[u]
+        linhas = [tab['linhas'][i] for i in tab['linha_x'][pares]]
+        partes.append(pd.DataFrame({
+            'unidade': u,
+            'profissional': [ids[j] for j in tab['prof_x'][pares]],
+            'data': [l[0] for l in linhas], 'turno': [l[2] for l in linhas],
+            'tipo_atendimento': [l[3] for l in linhas]}))
+    return pd.concat(partes, ignore_index=True)
+
+
+# =============================================================================
+# Modelo monolítico (referência para redes pequenas)
+# =============================================================================
+
+def modelo_monolitico(tabelas, ids, carga_max):
+    model = LpProblem("Escalonamento_Rede", LpMinimize)
+    max_carga = LpVariable('max_carga', lowBound=0)
+    termos = [(max_carga, 0.1)]
+    carga = {}
+    for u, tab in tabelas.items():
+        x = [LpVariable(f"Atendimento_{u}_{k}", cat='Binary') for k in range(len(tab['linha_x']))]
+        folga = [LpVariable(f"Folga_{u}_{i}", lowBound=0, cat='Integer') for i in range(len(tab['linhas']))]
+        por_linha = [[] for _ in tab['linhas']]
+        por_grupo = [[] for _ in tab['capacidade']]
+        for k, (i, j) in enumerate(zip(tab['linha_x'], tab['prof_x'])):
+            termos.append((x[k], -3 * tab['peso'][i]))
+            por_linha[i].append((x[k], 1))
+            por_grupo[tab['grupo'][i]].append((x[k], 1))
+            carga.setdefault((j, tab['semana'][i]), []).append((x[k], duracao))
+        for i in range(len(tab['linhas'])):
+            termos.append((folga[i], 2 * tab['peso'][i]))
+            model.addConstraint(LpConstraint(LpAffineExpression(por_linha[i] + [(folga[i], 1)]), LpConstraintGE,
+                                             f"Demanda_{u}_{i}", int(tab['quantidade'][i])))
+        for g, expr in enumerate(por_grupo):
+            model.addConstraint(LpConstraint(LpAffineExpression(expr), LpConstraintLE, f"CapacidadeSalas_{u}_{g}",
+                                             int(tab['capacidade'][g])))
+    for (j, s), expr in carga.items():
+        model.addConstraint(LpConstraint(LpAffineExpression(expr), LpConstraintLE, f"CargaHoraria_{ids[j]}_{s}",
+                                         carga_max[j]))
+        model.addConstraint(LpConstraint(LpAffineExpression(expr + [(max_carga, -1)]), LpConstraintLE,
+                                         f"EquilibrioCarga_{ids[j]}_{s}", 0))
+    model.setObjective(LpAffineExpression(termos))
+    return model
+
+
+# =============================================================================
+# Rede sintética
+# =============================================================================
+
+def gerar_rede(diretorio, n_unidades=3, n_profissionais=30, n_salas=6, n_semanas=1, semente=0, compartilhados=0.3):
+    # Cada unidade é uma instância do gerador com semente própria; o cadastro de
+    # profissionais é o da primeira. Cada profissional tem uma unidade de origem e uma
+    # fração `compartilhados` atende em todas.
+    rng = np.random.default_rng(semente)
+    unidades = [f'unidade_{k + 1}' for k in range(n_unidades)]
+    profissionais = gerador_instancias.gerar_instancia(n_profissionais, 1, 1, semente)[0]
+    for k, u in enumerate(unidades):
+        _, salas, demandas = gerador_instancias.gerar_instancia(n_profissionais // n_unidades + 1, n_salas,
+                                                                n_semanas, semente + k)
+        os.makedirs(os.path.join(diretorio, u), exist_ok=True)
+        salas.to_csv(os.path.join(diretorio, u, 'salas.csv'), index=False)
+        demandas.to_csv(os.path.join(diretorio, u, 'demandas.csv'), index=False)
+    profissionais.to_csv(os.path.join(diretorio, 'profissionais.csv'), index=False)
+    origem = rng.integers(0, n_unidades, len(profissionais))
+    todas = rng.random(len(profissionais)) < compartilhados
+    vinculos = [(p, u) for p, o, t in zip(profissionais['id_profissional'], origem, todas)
+                for k, u in enumerate(unidades) if t or k == o]
+    pd.DataFrame(vinculos, columns=['id_profissional', 'unidade']).to_csv(os.path.join(diretorio, 'vinculos.csv'),
+                                                                         index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Escalonamento de várias unidades por relaxação lagrangiana.")
+    parser.add_argument('--diretorio', default='rede')
+    parser.add_argument('--gerar', type=int, metavar='UNIDADES', help="Gera uma rede sintética no diretório")
+    parser.add_argument('--profissionais', type=int, default=30, help="Com --gerar: tamanho do cadastro")
+    parser.add_argument('--salas', type=int, default=6, help="Com --gerar: salas por unidade")
+    parser.add_argument('--semanas', type=int, default=1, help="Com --gerar")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--iteracoes', type=int, default=200)
+    parser.add_argument('--gap-alvo', type=float, default=1e-3)
+    parser.add_argument('--processos', type=int)
+    parser.add_argument('--monolitico', action='store_true', help="Resolve também o modelo único com o CBC")
+    parser.add_argument('--saida', metavar='ARQUIVO', type=extracao.arquivo_saida,
+                        help="Grava a escala em .csv ou .parquet")
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    if args.gerar:
+        gerar_rede(args.diretorio, args.gerar, args.profissionais, args.salas, args.semanas, args.semente)
+    tabelas, ids, semanas, carga_max = tabelas_rede(*carregar_rede(args.diretorio))
+    print(f"Rede com {len(tabelas)} unidades, {len(ids)} profissionais, {len(semanas)} semana(s), "
+          f"{sum(len(t['linha_x']) for t in tabelas.values())} pares profissional x demanda")
+
+    inicio = time.perf_counter()
+    inferior, superior, escala, historico = relaxacao_lagrangiana(
+        tabelas, carga_max, len(semanas), args.processos, args.iteracoes, args.gap_alvo, limite_tempo=args.limite_tempo)
+    print(f"Relaxação lagrangiana: {len(historico)} iterações em {time.perf_counter() - inicio:.2f}s")
+    print(f"  Limitante inferior: {inferior:.2f}")
+    print(f"  Melhor escala viável: {superior:.2f}")
+    print(f"  Gap: {100 * (superior - inferior) / max(abs(superior), 1e-9):.2f}%")
+
+    agenda = tabela_escala(tabelas, escala, ids)
+    print("\nAtendimentos por unidade:")
+    print(agenda.groupby('unidade').size().to_string())
+    if args.saida:
+        extracao.salvar(agenda, args.saida)
+
+    if args.monolitico:
+        print("\nModelo monolítico:")
+        resultado = resolver_com_argumentos(modelo_monolitico(tabelas, ids, carga_max), args)
+        imprimir_resumo(resultado)
+        if resultado is not None:
+            print(f"  Objetivo: {resultado.objetivo:.2f}")
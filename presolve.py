@@ -0,0 +1,314 @@
+import math
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+from pulp import (LpAffineExpression, LpConstraint, LpConstraintEQ, LpConstraintGE, LpConstraintLE, LpProblem, LpStatus,
+                  LpStatusInfeasible)
+
+from configuracao_solver import ResultadoSolver
+from instrumentacao import PERFILADOR_NULO, familia
+
+# Pré-processamento (presolve) de um LpProblem antes de entregá-lo ao CBC, com a
+# volta (postsolve) da solução para o modelo original. As reduções são exatas (o
+# ótimo não muda) e repetidas até não haver mais o que reduzir:
+#   - linhas vazias já satisfeitas são removidas;
+#   - linhas com uma só variável viram limites da variável;
+#   - linhas redundantes pelos limites das variáveis (atividade máxima abaixo do lado
+#     direito) são removidas;
+#   - linhas paralelas (mesmos coeficientes, a menos de escala) ficam só na mais
+#     apertada; no agendamento, a R4 com duração 1 é paralela à R2;
+#   - limites das variáveis são apertados pelas linhas (arredondados nas inteiras);
+#   - variáveis fixadas (limite inferior igual ao superior) saem do modelo, e as que
+#     não aparecem em nenhuma linha são fixadas no limite que o objetivo prefere.
+# O modelo reduzido usa as mesmas variáveis do original. `restaurar` devolve os
+# limites originais, preenche os valores das variáveis removidas e copia o status.
+
+TOLERANCIA = 1e-9
+
+
+@dataclass
+class Reducao:
+    problema: LpProblem                                     # modelo reduzido, entregue ao solver
+    fixadas: dict = field(default_factory=dict)             # nome da variável -> valor
+    limites_originais: dict = field(default_factory=dict)   # nome -> (lowBound, upBound)
+    operacoes: dict = field(default_factory=dict)           # contagem por tipo de redução
+    tamanho: pd.DataFrame = None                            # linhas e colunas por família, antes e depois
+    passadas: int = 0
+
+
+def _limite(valor, padrao):
+    return padrao if valor is None else float(valor)
+
+
+def _contar(operacoes, tipo, quantidade=1):
+    operacoes[tipo] = operacoes.get(tipo, 0) + quantidade
+
+
+def _atividade(coef, inf, sup):
+    # Atividade mínima e máxima da linha, quantos termos infinitos entram em cada uma e
+    # a maior variação |a|·(sup - inf) de um termo.
+    minimo = maximo = amplitude = 0.0
+    inf_min = inf_max = 0
+    for nome, a in coef.items():
+        baixo, alto = (inf[nome], sup[nome]) if a > 0 else (sup[nome], inf[nome])
+        if math.isinf(baixo):
+            inf_min += 1
+        else:
+            minimo += a * baixo
+        if math.isinf(alto):
+            inf_max += 1
+        else:
+            maximo += a * alto
+        amplitude = max(amplitude, a * (alto - baixo))
+    return minimo, inf_min, maximo, inf_max, amplitude
+
+
+def _tamanho(linhas, variaveis):
+    contagem = {}
+    for nome in linhas:
+        contagem.setdefault(('restricoes', familia(nome)), 0)
+        contagem[('restricoes', familia(nome))] += 1
+    for nome in variaveis:
+        contagem.setdefault(('variaveis', familia(nome)), 0)
+        contagem[('variaveis', familia(nome))] += 1
+    return contagem
+
+
+def reduzir(prob, max_passadas=20):
+    variaveis = {v.name: v for v in prob.variables()}
+    inteira = {n: v.cat == 'Integer' for n, v in variaveis.items()}
+    inf = {n: _limite(v.lowBound, -math.inf) for n, v in variaveis.items()}
+    sup = {n: _limite(v.upBound, math.inf) for n, v in variaveis.items()}
+    # Objetivo sempre no sentido de minimização
+    custo = {n: 0.0 for n in variaveis}
+    for v, c in prob.objective.items():
+        custo[v.name] += prob.sense * c
+    constante = prob.objective.constant
+
+    # Linhas na forma baixo <= soma(a·x) <= alto
+    linhas, coluna = {}, {n: set() for n in variaveis}
+    for nome, restricao in prob.constraints.items():
+        coef = {v.name: a for v, a in restricao.items() if a != 0}
+        rhs = -restricao.constant
+        baixo = rhs if restricao.sense in (LpConstraintGE, LpConstraintEQ) else -math.inf
+        alto = rhs if restricao.sense in (LpConstraintLE, LpConstraintEQ) else math.inf
+        linhas[nome] = [coef, baixo, alto]
+        for n in coef:
+            coluna[n].add(nome)
+    antes = _tamanho(linhas, variaveis)
+    operacoes, fixadas = {}, {}
+
+    def apertar(n, novo_inf=-math.inf, novo_sup=math.inf):
+        if inteira[n]:
+            novo_inf = novo_inf if math.isinf(novo_inf) else math.ceil(novo_inf - 1e-6)
+            novo_sup = novo_sup if math.isinf(novo_sup) else math.floor(novo_sup + 1e-6)
+        mudou = False
+        if novo_inf > inf[n] + 1e-6 * max(1.0, abs(inf[n]) if not math.isinf(inf[n]) else 1.0):
+            inf[n], mudou = novo_inf, True
+        if novo_sup < sup[n] - 1e-6 * max(1.0, abs(sup[n]) if not math.isinf(sup[n]) else 1.0):
+            sup[n], mudou = novo_sup, True
+        if inf[n] > sup[n] + 1e-6:
+            raise ValueError(f"presolve: limites inviáveis para {n} ({inf[n]} > {sup[n]})")
+        sup[n] = max(sup[n], inf[n])
+        return mudou
+
+    # Limites fracionários das inteiras já vêm arredondados
+    for n in variaveis:
+        if inteira[n]:
+            apertar(n, inf[n], sup[n])
+
+    def remover_linha(nome):
+        for n in linhas.pop(nome)[0]:
+            coluna[n].discard(nome)
+
+    passada = 0
+    for passada in range(1, max_passadas + 1):
+        mudou = False
+
+        # Variáveis fixadas saem do modelo
+        for n in [n for n in coluna if sup[n] - inf[n] <= TOLERANCIA]:
+            valor = inf[n]
+            for nome in coluna.pop(n):
+                linha = linhas[nome]
+                a = linha[0].pop(n)
+                linha[1] -= a * valor
+                linha[2] -= a * valor
+            constante += prob.sense * custo[n] * valor
+            fixadas[n] = valor
+            _contar(operacoes, 'variaveis_fixadas')
+            mudou = True
+
+        for nome in list(linhas):
+            coef, baixo, alto = linhas[nome]
+            if not coef:
+                if baixo - TOLERANCIA <= 0 <= alto + TOLERANCIA:
+                    remover_linha(nome)
+                    _contar(operacoes, 'linhas_vazias')
+                    mudou = True
+                continue
+            if len(coef) == 1:
+                (n, a), = coef.items()
+                if a > 0:
+                    apertar(n, baixo / a, alto / a)
+                else:
+                    apertar(n, alto / a, baixo / a)
+                remover_linha(nome)
+                _contar(operacoes, 'singletons_para_limites')
+                mudou = True
+                continue
+
+            minimo, inf_min, maximo, inf_max, amplitude = _atividade(coef, inf, sup)
+            if not inf_max and maximo <= alto + TOLERANCIA:
+                alto = linhas[nome][2] = math.inf
+            if not inf_min and minimo >= baixo - TOLERANCIA:
+                baixo = linhas[nome][1] = -math.inf
+            if math.isinf(baixo) and math.isinf(alto):
+                remover_linha(nome)
+                _contar(operacoes, 'linhas_redundantes')
+                mudou = True
+                continue
+
+            # Limites implicados pela linha para cada variável. Só há o que apertar se a
+            # atividade é finita e algum termo pode variar mais que a folga da linha.
+            aperta_sup = not math.isinf(alto) and not inf_min and amplitude > alto - minimo + TOLERANCIA
+            aperta_inf = not math.isinf(baixo) and not inf_max and amplitude > maximo - baixo + TOLERANCIA
+            if not (aperta_sup or aperta_inf):
+                continue
+            for n, a in coef.items():
+                baixo_n, alto_n = (inf[n], sup[n]) if a > 0 else (sup[n], inf[n])
+                novo_inf, novo_sup = -math.inf, math.inf
+                if aperta_sup:
+                    limite = (alto - minimo + a * baixo_n) / a
+                    novo_sup, novo_inf = (limite, novo_inf) if a > 0 else (novo_sup, limite)
+                if aperta_inf:
+                    limite = (baixo - maximo + a * alto_n) / a
+                    if a > 0:
+                        novo_inf = max(novo_inf, limite)
+                    else:
+                        novo_sup = min(novo_sup, limite)
+                # a atividade da linha não é recalculada: com os limites antigos ela só
+                # dá limites mais folgados, e a próxima passada aproveita os novos
+                if apertar(n, novo_inf, novo_sup):
+                    _contar(operacoes, 'limites_apertados')
+                    mudou = True
+
+        # Linhas paralelas: coeficientes normalizados pelo da primeira variável
+        grupos = {}
+        for nome, (coef, baixo, alto) in linhas.items():
+            if not coef:
+                continue
+            ordem = sorted(coef)
+            escala = coef[ordem[0]]
+            chave = tuple((n, round(coef[n] / escala, 12)) for n in ordem)
+            baixo, alto = (baixo / escala, alto / escala) if escala > 0 else (alto / escala, baixo / escala)
+            tipo = 'EQ' if baixo == alto else ('LE' if math.isinf(baixo) else 'GE' if math.isinf(alto) else nome)
+            grupos.setdefault((chave, tipo), []).append((nome, escala, baixo, alto))
+        for membros in grupos.values():
+            if len(membros) < 2:
+                continue
+            baixo = max(m[2] for m in membros)
+            alto = min(m[3] for m in membros)
+            nome, escala = membros[0][:2]
+            # fica a primeira linha do grupo, com o intervalo mais apertado
+            linhas[nome][1], linhas[nome][2] = (baixo * escala, alto * escala) if escala > 0 else \
+                (alto * escala, baixo * escala)
+            for outro, *_ in membros[1:]:
+                remover_linha(outro)
+            _contar(operacoes, 'linhas_paralelas', len(membros) - 1)
+            mudou = True
+
+        # Variáveis fora de todas as linhas ficam no limite preferido pelo objetivo
+        for n in [n for n, linhas_n in coluna.items() if not linhas_n]:
+            valor = inf[n] if custo[n] > 0 else sup[n] if custo[n] < 0 else \
+                (inf[n] if not math.isinf(inf[n]) else sup[n] if not math.isinf(sup[n]) else 0.0)
+            if math.isinf(valor):
+                continue  # ilimitado: fica para o solver relatar
+            inf[n] = sup[n] = valor
+            mudou = True
+
+        if not mudou:
+            break
+
+    reduzido = LpProblem(prob.name, prob.sense)
+    objetivo = LpAffineExpression([(variaveis[n], prob.sense * custo[n]) for n in coluna if custo[n]],
+                                  constant=constante)
+    objetivo.name = prob.objective.name
+    reduzido.setObjective(objetivo)
+    for nome, (coef, baixo, alto) in linhas.items():
+        expr = LpAffineExpression([(variaveis[n], a) for n, a in coef.items()])
+        if baixo == alto:
+            reduzido.addConstraint(LpConstraint(expr, LpConstraintEQ, nome, baixo))
+        elif math.isinf(baixo):
+            reduzido.addConstraint(LpConstraint(expr, LpConstraintLE, nome, alto))
+        elif math.isinf(alto):
+            reduzido.addConstraint(LpConstraint(expr, LpConstraintGE, nome, baixo))
+        else:
+            reduzido.addConstraint(LpConstraint(expr, LpConstraintGE, nome, baixo))
+            reduzido.addConstraint(LpConstraint(expr, LpConstraintLE, f"{nome}_sup", alto))
+
+    # Limites apertados ficam nas variáveis do modelo reduzido até `restaurar`
+    limites_originais = {}
+    for n in coluna:
+        v = variaveis[n]
+        novo_inf = None if math.isinf(inf[n]) else inf[n]
+        novo_sup = None if math.isinf(sup[n]) else sup[n]
+        if (novo_inf, novo_sup) != (v.lowBound, v.upBound):
+            limites_originais[n] = (v.lowBound, v.upBound)
+            v.lowBound, v.upBound = novo_inf, novo_sup
+
+    depois = _tamanho(reduzido.constraints, [v.name for v in reduzido.variables()])
+    tamanho = pd.DataFrame([(tipo, fam, antes.get((tipo, fam), 0), depois.get((tipo, fam), 0))
+                            for tipo, fam in dict.fromkeys(list(antes) + list(depois))],
+                           columns=['tipo', 'familia', 'antes', 'depois'])
+    return Reducao(reduzido, fixadas, limites_originais, operacoes, tamanho, passada)
+
+
+def restaurar(prob, reducao):
+    # Volta ao modelo original: limites de antes do presolve, valores das variáveis
+    # removidas e o status da resolução do modelo reduzido.
+    variaveis = {v.name: v for v in prob.variables()}
+    for n, (baixo, alto) in reducao.limites_originais.items():
+        variaveis[n].lowBound, variaveis[n].upBound = baixo, alto
+    for n, valor in reducao.fixadas.items():
+        variaveis[n].varValue = valor
+    prob.assignStatus(reducao.problema.status, reducao.problema.sol_status)
+
+
+def imprimir_relatorio(reducao):
+    tamanho = reducao.tamanho
+    print(f"Presolve ({reducao.passadas} passadas):")
+    for tipo, rotulo in (('restricoes', 'Restrições'), ('variaveis', 'Variáveis')):
+        parte = tamanho[tamanho['tipo'] == tipo]
+        print(f"  {rotulo}: {parte['antes'].sum()} -> {parte['depois'].sum()}")
+        for _, _, fam, antes, depois in parte.itertuples():
+            print(f"    {fam}: {antes} -> {depois}")
+    if reducao.operacoes:
+        print("  Reduções: " + ", ".join(f"{tipo}={n}" for tipo, n in reducao.operacoes.items()))
+
+
+def adicionar_argumentos(parser):
+    parser.add_argument('--presolve', action='store_true',
+                        help="Reduz o modelo (linhas redundantes, variáveis fixadas, limites) antes do solver")
+    return parser
+
+
+def resolver_com_presolve(prob, args, resolver, perfil=PERFILADOR_NULO):
+    # Resolve `prob` com `resolver(modelo, args)`, passando antes pelo presolve se
+    # pedido na linha de comando. Os valores e o status voltam para `prob`.
+    if not args.presolve:
+        return resolver(prob, args)
+    inicio = time.perf_counter()
+    with perfil.fase('presolve'):
+        try:
+            reducao = reduzir(prob)
+        except ValueError as erro:
+            # Limites que se cruzam: o modelo é inviável, como o CBC relataria.
+            print(erro)
+            prob.assignStatus(LpStatusInfeasible)
+            return ResultadoSolver(LpStatus[prob.status], None, None, None, time.perf_counter() - inicio,
+                                   'presolve', False)
+    imprimir_relatorio(reducao)
+    resultado = resolver(reducao.problema, args)
+    restaurar(prob, reducao)
+    return resultado
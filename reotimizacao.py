@@ -0,0 +1,272 @@
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from pulp import LpAffineExpression, LpConstraint, LpConstraintGE, LpConstraintLE, LpVariable
+
+import modelo_escalonamento as me
+from configuracao_solver import ConfiguracaoSolver, adicionar_argumentos, configuracao_de_argumentos, resolver
+from instancia import Instancia, slot
+
+# Reotimização incremental do modelo de escalonamento. O modelo construído fica em
+# memória e recebe alterações pontuais (demanda, ausência de profissional, sala
+# fechada): apenas as restrições e limites afetados são modificados, e a nova
+# resolução parte da escala anterior (warm start), já reparada para ser viável.
+
+
+def _nome(texto):
+    # Mesmo ajuste que o PuLP aplica aos nomes de restrições e variáveis.
+    return re.sub(r'[\-+\[\] >/]', '_', texto)
+
+
+class PlanejadorIncremental:
+
+    def __init__(self, profissionais, salas, demandas, config=None):
+        self.config = config or ConfiguracaoSolver()
+        self.instancia = Instancia.de_dataframes(profissionais, salas, demandas)
+        self.indices = me.indices_da_instancia(self.instancia)
+        self.model, self.x, self.folga, self.max_carga = me.construir_modelo(self.indices)
+        self.resultado = None
+
+        # Capacidade de cada sala por slot (dia, turno), da instância, e as salas fechadas
+        # pelas alterações, para recalcular a capacidade do turno
+        self.salas = self.instancia.salas
+        self.posicao_sala = {s: k for k, s in enumerate(self.salas)}
+        self.sala_fechada = np.zeros(self.instancia.arrays['capacidade_slot'].shape, dtype=bool)
+        self.ausencias = set()  # (profissional, dia, turno) retirados de indices['disponivel']
+
+        # Referências diretas às variáveis e restrições que as alterações modificam
+        self.x_por_turno = {}  # (profissional, dia, turno) -> variáveis x
+        for (p, data, turno, tipo), var in self.x.items():
+            self.x_por_turno.setdefault((p, self.indices['dia_da_data'][data], turno), []).append(var)
+        restricoes = self.model.constraints
+        self.restricao_demanda = {k: restricoes[_nome(f"Demanda_{k[0]}_{k[1]}_{k[2]}")] for k in self.folga}
+        # (profissional, semana) -> (CargaHoraria, EquilibrioCarga), com os nomes dados por
+        # construir_modelo para as semanas da construção; semanas novas sempre levam sufixo.
+        semanas = sorted(set(self.indices['semana_da_data'].values()))
+        self.restricoes_carga = {}
+        for p in self.indices['profissionais']:
+            for sem in semanas:
+                sufixo = f"{p}" if len(semanas) == 1 else f"{p}_{sem}"
+                self.restricoes_carga[(p, sem)] = (restricoes[_nome(f"CargaHoraria_{sufixo}")],
+                                                   restricoes[_nome(f"EquilibrioCarga_{sufixo}")])
+
+    @classmethod
+    def do_diretorio(cls, diretorio='.', config=None):
+        return cls(*me.carregar_dados(diretorio), config=config)
+
+    # ------------------------------------------------------------------
+    # Alterações
+    # ------------------------------------------------------------------
+
+    def alterar_demanda(self, data, turno, tipo, quantidade, dia_semana=None):
+        # Muda a quantidade prevista de uma demanda. Uma demanda nova (data, turno, tipo)
+        # ganha sua folga, as variáveis dos profissionais disponíveis e entra nas
+        # restrições de carga e capacidade já existentes.
+        chave = (data, turno, tipo)
+        if chave in self.restricao_demanda:
+            self.restricao_demanda[chave].constant = -quantidade
+            return
+        dia = dia_semana or self.indices['dia_da_data'].get(data) or me.dias[pd.Timestamp(data).dayofweek]
+        self._adicionar_demanda(data, dia, turno, tipo, quantidade)
+
+    def remover_disponibilidade(self, profissional, dia, turno):
+        # O profissional deixa de atender em (dia, turno): as variáveis ficam limitadas a zero
+        # e o turno sai de `disponivel`, para que demandas novas não criem variáveis para ele.
+        if (dia, turno) in self.indices['disponivel'][profissional]:
+            self.indices['disponivel'][profissional].discard((dia, turno))
+            self.ausencias.add((profissional, dia, turno))
+        for var in self.x_por_turno.get((profissional, dia, turno), []):
+            var.upBound = 0
+
+    def restaurar_disponibilidade(self, profissional, dia, turno):
+        # Desfaz apenas o que `remover_disponibilidade` retirou.
+        if (profissional, dia, turno) not in self.ausencias:
+            return
+        self.ausencias.discard((profissional, dia, turno))
+        self.indices['disponivel'][profissional].add((dia, turno))
+        for var in self.x_por_turno.get((profissional, dia, turno), []):
+            var.upBound = 1
+        # Demandas criadas durante a ausência ainda não têm variável para o profissional
+        for chave in self.restricao_demanda:
+            if chave[1] == turno and self.indices['dia_da_data'][chave[0]] == dia \
+                    and (profissional,) + chave not in self.x:
+                self._adicionar_atendimento(profissional, chave)
+
+    def fechar_sala(self, sala, dia, turno):
+        self.sala_fechada[self.posicao_sala[sala], slot(dia, turno)] = True
+        self._atualizar_capacidade(dia, turno)
+
+    def reabrir_sala(self, sala, dia, turno):
+        self.sala_fechada[self.posicao_sala[sala], slot(dia, turno)] = False
+        self._atualizar_capacidade(dia, turno)
+
+    # ------------------------------------------------------------------
+    # Resolução
+    # ------------------------------------------------------------------
+
+    def resolver(self):
+        warm_start = self.resultado is not None
+        if warm_start:
+            self._reparar_solucao()
+        self.resultado = resolver(self.model, self.config, warm_start=warm_start)
+        return self.resultado
+
+    def agenda(self):
+        return [chave for chave, var in self.x.items() if var.varValue and var.varValue > 0.5]
+
+    # ------------------------------------------------------------------
+    # Auxiliares
+    # ------------------------------------------------------------------
+
+    def capacidade(self, dia, turno, sala_fechada=None):
+        # Capacidade das salas abertas no (dia, turno), sem as marcadas em `sala_fechada`
+        # (salas x slots; por padrão, as fechadas no modelo).
+        sala_fechada = self.sala_fechada if sala_fechada is None else sala_fechada
+        j = slot(dia, turno)
+        return int(self.instancia.arrays['capacidade_slot'][~sala_fechada[:, j], j].sum())
+
+    def _restricao_capacidade(self, data, turno):
+        nome = _nome(f"CapacidadeSalas_{data}_{turno}")
+        if nome not in self.model.constraints:
+            dia = self.indices['dia_da_data'][data]
+            self.model.addConstraint(LpConstraint(LpAffineExpression(), LpConstraintLE, nome,
+                                                  self.capacidade(dia, turno)))
+        return self.model.constraints[nome]
+
+    def _atualizar_capacidade(self, dia, turno):
+        capacidade = self.capacidade(dia, turno)
+        for data, dia_data in self.indices['dia_da_data'].items():
+            if dia_data == dia:
+                self._restricao_capacidade(data, turno).constant = -capacidade
+
+    def _restricoes_carga(self, p, semana):
+        if (p, semana) not in self.restricoes_carga:
+            carga = LpConstraint(LpAffineExpression(), LpConstraintLE, _nome(f"CargaHoraria_{p}_{semana}"),
+                                 self.indices['carga_max'][p])
+            equilibrio = LpConstraint(LpAffineExpression([(self.max_carga, -1)]), LpConstraintLE,
+                                      _nome(f"EquilibrioCarga_{p}_{semana}"), 0)
+            self.model.addConstraint(carga)
+            self.model.addConstraint(equilibrio)
+            self.restricoes_carga[(p, semana)] = (carga, equilibrio)
+        return self.restricoes_carga[(p, semana)]
+
+    def _adicionar_demanda(self, data, dia, turno, tipo, quantidade):
+        indices = self.indices
+        if data not in indices['dia_da_data']:
+            indices['dia_da_data'][data] = dia
+            indices['semana_da_data'][data] = me.semana_iso(data)
+        chave = (data, turno, tipo)
+        folga = LpVariable(f"Folga_{chave}", lowBound=0, cat='Integer')
+        self.folga[chave] = folga
+        self.model.objective[folga] = 2 * me.pesos[tipo]
+        demanda = LpConstraint(LpAffineExpression([(folga, 1)]), LpConstraintGE,
+                               f"Demanda_{data}_{turno}_{tipo}", quantidade)
+        self.model.addConstraint(demanda)
+        self.restricao_demanda[chave] = demanda
+
+        for p in indices['profissionais']:
+            if (dia, turno) in indices['disponivel'][p]:
+                self._adicionar_atendimento(p, chave)
+
+    def _adicionar_atendimento(self, p, chave):
+        # Variável x[p, data, turno, tipo] de uma demanda já no modelo, nas restrições de
+        # demanda, capacidade do turno e carga semanal.
+        data, turno, tipo = chave
+        var = LpVariable(f"Atendimento_{(p,) + chave}", cat='Binary')
+        self.x[(p,) + chave] = var
+        self.x_por_turno.setdefault((p, self.indices['dia_da_data'][data], turno), []).append(var)
+        self.model.objective[var] = -3 * me.pesos[tipo]
+        self.restricao_demanda[chave][var] = 1
+        self._restricao_capacidade(data, turno)[var] = 1
+        for restricao in self._restricoes_carga(p, self.indices['semana_da_data'][data]):
+            restricao[var] = me.duracao_atendimento
+
+    def _reparar_solucao(self):
+        # Ajusta a escala anterior às alterações para que sirva de ponto de partida:
+        # zera atendimentos que perderam disponibilidade, remove os que excedem a nova
+        # capacidade (os de menor peso primeiro) e recalcula folgas e carga máxima.
+        for var in self.x.values():
+            if var.varValue is None or (var.upBound is not None and var.upBound < var.varValue):
+                var.varValue = 0
+        for nome, restricao in self.model.constraints.items():
+            if not nome.startswith('CapacidadeSalas_'):
+                continue
+            ativos = sorted((v for v in restricao if v.varValue and v.varValue > 0.5),
+                            key=lambda v: self.model.objective.get(v, 0), reverse=True)
+            for var in ativos[:max(0, len(ativos) - int(-restricao.constant))]:
+                var.varValue = 0
+        for chave, folga in self.folga.items():
+            restricao = self.restricao_demanda[chave]
+            atendidos = sum(v.varValue or 0 for v in restricao if v is not folga)
+            folga.varValue = max(0, -restricao.constant - atendidos)
+        cargas = [sum((v.varValue or 0) * c for v, c in r.items() if v is not self.max_carga) + r.constant
+                  for nome, r in self.model.constraints.items() if nome.startswith('EquilibrioCarga_')]
+        self.max_carga.varValue = max(cargas, default=0)
+
+
+def planejador_reconstruido(profissionais, salas, demandas, ausencias=(), demandas_alteradas=(), salas_fechadas=(),
+                            config=None):
+    # Referência para conferir a reotimização: um modelo novo, construído com as ausências
+    # e demandas já aplicadas aos dados; as salas fechadas entram antes da primeira resolução.
+    profissionais = profissionais.copy()
+    for p, dia, turno in ausencias:
+        coluna = f'disponibilidade_{dia}'
+        profissionais[coluna] = [[t for t in lista if not (i == p and t == turno)]
+                                 for i, lista in zip(profissionais['id_profissional'], profissionais[coluna])]
+    demandas = demandas.copy()
+    for data, turno, tipo, quantidade in demandas_alteradas:
+        linha = (demandas['data'] == data) & (demandas['turno'] == turno) & (demandas['tipo_atendimento'] == tipo)
+        if linha.any():
+            demandas.loc[linha, 'quantidade_prevista'] = quantidade
+        else:
+            dia = me.dias[pd.Timestamp(data).dayofweek]
+            demandas.loc[len(demandas)] = {'data': data, 'dia_semana': dia, 'turno': turno,
+                                           'tipo_atendimento': tipo, 'quantidade_prevista': quantidade}
+    planejador = PlanejadorIncremental(profissionais, salas, demandas, config=config)
+    for sala, dia, turno in salas_fechadas:
+        planejador.fechar_sala(sala, dia, turno)
+    return planejador
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Demonstra a reotimização incremental do modelo de escalonamento.")
+    parser.add_argument('--diretorio', default='.')
+    parser.add_argument('--ausencia', nargs=3, action='append', default=[], metavar=('PROFISSIONAL', 'DIA', 'TURNO'),
+                        help="Remove a disponibilidade de um profissional em um dia da semana e turno")
+    parser.add_argument('--demanda', nargs=4, action='append', default=[], metavar=('DATA', 'TURNO', 'TIPO', 'QTD'),
+                        help="Define a quantidade prevista de uma demanda")
+    parser.add_argument('--fechar-sala', nargs=3, action='append', default=[], metavar=('SALA', 'DIA', 'TURNO'))
+    parser.add_argument('--conferir', action='store_true',
+                        help="Compara com o modelo reconstruído do zero com as mesmas alterações")
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+    config = configuracao_de_argumentos(args)
+
+    ausencias = [(int(p), dia, turno) for p, dia, turno in args.ausencia]
+    demandas_alteradas = [(data, turno, tipo, int(quantidade)) for data, turno, tipo, quantidade in args.demanda]
+    salas_fechadas = [(int(sala), dia, turno) for sala, dia, turno in args.fechar_sala]
+
+    inicio = time.perf_counter()
+    planejador = PlanejadorIncremental.do_diretorio(args.diretorio, config)
+    resultado = planejador.resolver()
+    print(f"Construção e resolução inicial: {time.perf_counter() - inicio:.3f}s, objetivo {resultado.objetivo}")
+
+    inicio = time.perf_counter()
+    for p, dia, turno in ausencias:
+        planejador.remover_disponibilidade(p, dia, turno)
+    for data, turno, tipo, quantidade in demandas_alteradas:
+        planejador.alterar_demanda(data, turno, tipo, quantidade)
+    for sala, dia, turno in salas_fechadas:
+        planejador.fechar_sala(sala, dia, turno)
+    resultado = planejador.resolver()
+    print(f"Replanejamento incremental: {time.perf_counter() - inicio:.3f}s, objetivo {resultado.objetivo}")
+    print(f"Atendimentos na nova escala: {len(planejador.agenda())}")
+
+    if args.conferir:
+        referencia = planejador_reconstruido(*me.carregar_dados(args.diretorio), ausencias, demandas_alteradas,
+                                             salas_fechadas, config).resolver()
+        print(f"Modelo reconstruído: objetivo {referencia.objetivo}  "
+              f"Diferença: {abs(referencia.objetivo - resultado.objetivo):.6g}")
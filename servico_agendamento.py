@@ -0,0 +1,419 @@
+import argparse
+import asyncio
+import concurrent.futures
+import copy
+import json
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+import heuristica_gulosa
+import instancia
+import modelo_escalonamento as me
+from configuracao_solver import adicionar_argumentos, configuracao_de_argumentos, resolver
+from reotimizacao import PlanejadorIncremental
+
+# Serviço local (asyncio) para a recepção registrar alterações do dia — urgências
+# sem agendamento, ausências de profissionais, salas fechadas — sem rodar um script
+# por alteração. A instância, o modelo de escalonamento (`PlanejadorIncremental`) e
+# a escala atual ficam em memória. As alterações recebidas entram em uma fila e são
+# agrupadas em pequenos lotes (janela de alguns milissegundos); cada lote é
+# respondido com a escala reparada pela heurística gulosa, dentro do orçamento de
+# latência. Em segundo plano, o CBC reotimiza o modelo completo partindo da escala
+# atual e, se encontrar uma escala melhor, ela passa a valer.
+#
+# Protocolo HTTP/1.1 com JSON, em uma porta TCP ou em um socket Unix:
+#   GET  /agenda      escala atual (versão, origem, custo e atendimentos)
+#   GET  /estado      versão, fila, reotimização em andamento e latências
+#   POST /alteracoes  uma alteração ou lista de alterações; responde com os
+#                     atendimentos dos turnos afetados depois do lote aplicado
+#
+# Alterações (campo "tipo"):
+#   demanda       data, turno, tipo_atendimento, quantidade
+#   ausencia      profissional, dia, turno (retorno: desfaz a ausência)
+#   fechar_sala   sala, dia, turno (reabrir_sala: desfaz)
+
+CAMPOS = {
+    'demanda': ('data', 'turno', 'tipo_atendimento', 'quantidade'),
+    'ausencia': ('profissional', 'dia', 'turno'),
+    'retorno': ('profissional', 'dia', 'turno'),
+    'fechar_sala': ('sala', 'dia', 'turno'),
+    'reabrir_sala': ('sala', 'dia', 'turno'),
+}
+
+MENSAGENS_HTTP = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                  500: 'Internal Server Error'}
+
+
+def validar(alteracao):
+    # Confere os campos e normaliza os tipos; erros viram resposta 400.
+    if not isinstance(alteracao, dict) or alteracao.get('tipo') not in CAMPOS:
+        raise ValueError(f"alteração inválida: {alteracao!r} (tipos: {', '.join(CAMPOS)})")
+    faltando = [c for c in CAMPOS[alteracao['tipo']] if c not in alteracao]
+    if faltando:
+        raise ValueError(f"campos ausentes em '{alteracao['tipo']}': {', '.join(faltando)}")
+    alteracao = dict(alteracao)
+    if alteracao['turno'] not in me.turnos:
+        raise ValueError(f"turno desconhecido: {alteracao['turno']}")
+    if alteracao['tipo'] == 'demanda':
+        if alteracao['tipo_atendimento'] not in me.pesos:
+            raise ValueError(f"tipo de atendimento desconhecido: {alteracao['tipo_atendimento']}")
+        if pd.Timestamp(alteracao['data']).dayofweek >= len(me.dias):
+            raise ValueError(f"a unidade não funciona em {alteracao['data']}")
+        alteracao['quantidade'] = int(alteracao['quantidade'])
+    else:
+        if alteracao['dia'] not in me.dias:
+            raise ValueError(f"dia desconhecido: {alteracao['dia']}")
+        chave = 'profissional' if 'profissional' in CAMPOS[alteracao['tipo']] else 'sala'
+        alteracao[chave] = int(alteracao[chave])
+    return alteracao
+
+
+def custo(indices, agenda):
+    # Objetivo do modelo de escalonamento para uma escala (folga inteira, max_carga
+    # igual à maior carga semanal).
+    atendidos, carga = {}, {}
+    beneficio = 0
+    for p, data, turno, tipo in agenda:
+        atendidos[(data, turno, tipo)] = atendidos.get((data, turno, tipo), 0) + 1
+        chave = (p, indices['semana_da_data'][data])
+        carga[chave] = carga.get(chave, 0) + me.duracao_atendimento
+        beneficio -= 3 * me.pesos[tipo]
+    folga = sum(2 * me.pesos[tipo] * max(0, quantidade - atendidos.get((data, turno, tipo), 0))
+                for data, _, turno, tipo, quantidade in indices['linhas'])
+    return beneficio + folga + 0.1 * max(carga.values(), default=0)
+
+
+def viavel(indices, agenda):
+    # Confere uma escala contra os índices atuais: disponibilidade dos profissionais,
+    # capacidade das salas no turno e carga horária semanal.
+    dia_da_data = indices['dia_da_data']
+    por_turno, carga = {}, {}
+    for p, data, turno, _ in agenda:
+        if (dia_da_data[data], turno) not in indices['disponivel'][p]:
+            return False
+        por_turno[(data, turno)] = por_turno.get((data, turno), 0) + 1
+        chave = (p, me.semana_iso(data))
+        carga[chave] = carga.get(chave, 0) + me.duracao_atendimento
+    return all(n <= indices['capacidade'][(dia_da_data[data], turno)] for (data, turno), n in por_turno.items()) \
+        and all(horas <= indices['carga_max'][p] for (p, _), horas in carga.items())
+
+
+def reparar(indices, agenda):
+    # Reparo rápido: descarta os atendimentos que deixaram de ser viáveis (profissional
+    # ausente, capacidade do turno reduzida — os de menor peso saem primeiro) e
+    # completa a escala com a heurística gulosa a partir do que sobrou.
+    dia_da_data = indices['dia_da_data']
+    validos = [a for a in agenda if (dia_da_data[a[1]], a[2]) in indices['disponivel'][a[0]]]
+    por_turno = {}
+    for a in sorted(validos, key=lambda a: -me.pesos[a[3]]):
+        por_turno.setdefault((a[1], a[2]), []).append(a)
+    mantidos = []
+    for (data, turno), lista in por_turno.items():
+        mantidos.extend(lista[:max(0, int(indices['capacidade'][(dia_da_data[data], turno)]))])
+    return heuristica_gulosa.escalonamento_guloso(indices, mantidos, excedente=True)
+
+
+class Servico:
+
+    def __init__(self, planejador, janela=0.02, orcamento=0.2, max_lote=256):
+        self.planejador = planejador
+        self.janela = janela        # espera máxima para juntar alterações em um lote (s)
+        self.orcamento = orcamento  # latência alvo de cada resposta (s)
+        self.max_lote = max_lote
+
+        # Cópia dos índices usada pelo reparo; o modelo só recebe as alterações
+        # quando não há reotimização em andamento.
+        self.indices = copy.deepcopy(planejador.indices)
+        self.disponivel_original = copy.deepcopy(planejador.indices['disponivel'])
+        self.linha_de = {(data, turno, tipo): i for i, (data, _, turno, tipo, _) in enumerate(self.indices['linhas'])}
+        # Salas fechadas no reparo (salas x slots), sobre a capacidade da instância
+        self.sala_fechada = np.zeros_like(planejador.sala_fechada)
+        self.pendentes_modelo = []
+
+        self.agenda = []
+        self.custo = None
+        self.versao = 0
+        self.origem = None
+        self.fila = None
+        self.reotimizacao = None
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.latencias = []
+        self.lotes = 0
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    async def iniciar(self):
+        self.fila = asyncio.Queue()
+        self._adotar(reparar(self.indices, []), 'gulosa')
+        self.tarefa_lotes = asyncio.create_task(self._processar_lotes())
+        self._agendar_reotimizacao()
+
+    async def submeter(self, alteracoes):
+        # Enfileira as alterações e espera a resposta do lote em que forem aplicadas.
+        alteracoes = [validar(a) for a in alteracoes]
+        for alteracao in alteracoes:
+            if alteracao.get('profissional', self.indices['profissionais'][0]) not in self.indices['disponivel']:
+                raise ValueError(f"profissional desconhecido: {alteracao['profissional']}")
+            if 'sala' in alteracao and alteracao['sala'] not in self.planejador.posicao_sala:
+                raise ValueError(f"sala desconhecida: {alteracao['sala']}")
+        futuro = asyncio.get_running_loop().create_future()
+        await self.fila.put((alteracoes, futuro, time.perf_counter()))
+        return await futuro
+
+    async def _processar_lotes(self):
+        while True:
+            pedidos = [await self.fila.get()]
+            # Junta o que chegar durante a janela, sem estourar o orçamento do mais antigo
+            limite = min(pedidos[0][2] + self.janela, pedidos[0][2] + self.orcamento / 2)
+            while len(pedidos) < self.max_lote:
+                espera = limite - time.perf_counter()
+                if espera <= 0:
+                    break
+                try:
+                    pedidos.append(await asyncio.wait_for(self.fila.get(), espera))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                self._aplicar_lote(pedidos)
+            except Exception as erro:
+                for _, futuro, _ in pedidos:
+                    if not futuro.done():
+                        futuro.set_exception(RuntimeError(f"falha ao aplicar o lote: {erro!r}"))
+
+    def _aplicar_lote(self, pedidos):
+        afetados = set()
+        for alteracoes, _, _ in pedidos:
+            for alteracao in alteracoes:
+                afetados |= self._aplicar_no_reparo(alteracao)
+                self.pendentes_modelo.append(alteracao)
+        self._adotar(reparar(self.indices, self.agenda), 'reparo')
+        self.lotes += 1
+        agora = time.perf_counter()
+        for alteracoes, futuro, chegada in pedidos:
+            turnos_pedido = set().union(*(self._turnos_afetados(a) for a in alteracoes))
+            self.latencias.append(agora - chegada)
+            if not futuro.done():
+                futuro.set_result({
+                    **self._resumo(),
+                    'lote': sum(len(a) for a, _, _ in pedidos),
+                    'latencia_ms': round(1000 * (agora - chegada), 2),
+                    'dentro_do_orcamento': agora - chegada <= self.orcamento,
+                    'atendimentos': self._atendimentos(turnos_pedido),
+                })
+        del self.latencias[:-1000]
+        self._agendar_reotimizacao()
+
+    # ------------------------------------------------------------------
+    # Alterações: índices do reparo e modelo do planejador
+    # ------------------------------------------------------------------
+
+    def _turnos_afetados(self, alteracao):
+        if alteracao['tipo'] == 'demanda':
+            return {(alteracao['data'], alteracao['turno'])}
+        return {(data, alteracao['turno']) for data, dia in self.indices['dia_da_data'].items()
+                if dia == alteracao['dia']}
+
+    def _aplicar_no_reparo(self, alteracao):
+        indices = self.indices
+        tipo = alteracao['tipo']
+        if tipo == 'demanda':
+            data, turno, tipo_atendimento = alteracao['data'], alteracao['turno'], alteracao['tipo_atendimento']
+            chave = (data, turno, tipo_atendimento)
+            if chave in self.linha_de:
+                i = self.linha_de[chave]
+                indices['linhas'][i] = indices['linhas'][i][:4] + (alteracao['quantidade'],)
+            else:
+                dia = indices['dia_da_data'].setdefault(data, me.dias[pd.Timestamp(data).dayofweek])
+                indices['semana_da_data'].setdefault(data, me.semana_iso(data))
+                self.linha_de[chave] = len(indices['linhas'])
+                indices['linhas_por_turno'].setdefault((data, turno), []).append(len(indices['linhas']))
+                indices['linhas'].append((data, dia, turno, tipo_atendimento, alteracao['quantidade']))
+                indices['profissionais_por_linha'].append(
+                    [p for p in indices['profissionais'] if (dia, turno) in indices['disponivel'][p]])
+        elif tipo in ('ausencia', 'retorno'):
+            p, slot = alteracao['profissional'], (alteracao['dia'], alteracao['turno'])
+            if tipo == 'ausencia':
+                indices['disponivel'][p].discard(slot)
+            elif slot in self.disponivel_original[p]:
+                indices['disponivel'][p].add(slot)
+            indices['profissionais_por_linha'] = [
+                [q for q in indices['profissionais'] if (dia, turno) in indices['disponivel'][q]]
+                for _, dia, turno, _, _ in indices['linhas']]
+        else:
+            slot = (alteracao['dia'], alteracao['turno'])
+            self.sala_fechada[self.planejador.posicao_sala[alteracao['sala']], instancia.slot(*slot)] = \
+                tipo == 'fechar_sala'
+            indices['capacidade'][slot] = self.planejador.capacidade(*slot, self.sala_fechada)
+        return self._turnos_afetados(alteracao)
+
+    def _aplicar_no_modelo(self, alteracao):
+        planejador = self.planejador
+        tipo = alteracao['tipo']
+        if tipo == 'demanda':
+            planejador.alterar_demanda(alteracao['data'], alteracao['turno'], alteracao['tipo_atendimento'],
+                                       alteracao['quantidade'])
+        elif tipo == 'ausencia':
+            planejador.remover_disponibilidade(alteracao['profissional'], alteracao['dia'], alteracao['turno'])
+        elif tipo == 'retorno':
+            planejador.restaurar_disponibilidade(alteracao['profissional'], alteracao['dia'], alteracao['turno'])
+        elif tipo == 'fechar_sala':
+            planejador.fechar_sala(alteracao['sala'], alteracao['dia'], alteracao['turno'])
+        else:
+            planejador.reabrir_sala(alteracao['sala'], alteracao['dia'], alteracao['turno'])
+
+    # ------------------------------------------------------------------
+    # Reotimização em segundo plano
+    # ------------------------------------------------------------------
+
+    def _agendar_reotimizacao(self):
+        if self.reotimizacao is None or self.reotimizacao.done():
+            self.reotimizacao = asyncio.create_task(self._reotimizar())
+
+    async def _reotimizar(self):
+        # Aplica ao modelo as alterações acumuladas, parte da escala atual e resolve
+        # em uma thread (o CBC roda em um processo separado). Alterações que chegarem
+        # durante a resolução ficam para a próxima rodada; a escala encontrada é
+        # reparada para elas antes de ser comparada com a atual.
+        primeira = self.origem == 'gulosa'
+        while self.pendentes_modelo or primeira:
+            primeira = False
+            alteracoes, self.pendentes_modelo = self.pendentes_modelo, []
+            for alteracao in alteracoes:
+                self._aplicar_no_modelo(alteracao)
+            p = self.planejador
+            heuristica_gulosa.iniciar_escalonamento(self.indices, self.agenda, p.x, p.folga, p.max_carga)
+            p.resultado = await asyncio.get_running_loop().run_in_executor(
+                self.executor, resolver, p.model, p.config, True)
+            if p.resultado.objetivo is None:
+                continue
+            agenda = p.agenda()
+            if self.pendentes_modelo or not viavel(self.indices, agenda):
+                agenda = reparar(self.indices, agenda)
+            # Só entra no ar uma escala viável para o estado atual e melhor que a vigente
+            if viavel(self.indices, agenda) and custo(self.indices, agenda) < self.custo - 1e-6:
+                self._adotar(agenda, 'reotimizacao')
+
+    # ------------------------------------------------------------------
+    # Estado e respostas
+    # ------------------------------------------------------------------
+
+    def _adotar(self, agenda, origem):
+        self.agenda = agenda
+        self.custo = custo(self.indices, agenda)
+        self.origem = origem
+        self.versao += 1
+
+    def _resumo(self):
+        return {'versao': self.versao, 'origem': self.origem, 'custo': round(self.custo, 4),
+                'total_atendimentos': len(self.agenda)}
+
+    def _atendimentos(self, turnos=None):
+        return [{'profissional': p, 'data': data, 'turno': turno, 'tipo_atendimento': tipo}
+                for p, data, turno, tipo in sorted(self.agenda, key=lambda a: (a[1], me.turnos.index(a[2]), a[0]))
+                if turnos is None or (data, turno) in turnos]
+
+    def estado(self):
+        latencias = pd.Series(self.latencias, dtype=float) * 1000
+        return {
+            **self._resumo(),
+            'fila': self.fila.qsize(),
+            'alteracoes_fora_do_modelo': len(self.pendentes_modelo),
+            'reotimizando': self.reotimizacao is not None and not self.reotimizacao.done(),
+            'lotes': self.lotes,
+            'latencia_ms': {'p50': latencias.median(), 'p95': latencias.quantile(0.95), 'max': latencias.max()}
+            if len(latencias) else None,
+        }
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    async def _rotear(self, metodo, caminho, corpo):
+        rota = urlsplit(caminho).path.rstrip('/')
+        if rota == '/agenda' and metodo == 'GET':
+            return 200, {**self._resumo(), 'atendimentos': self._atendimentos()}
+        if rota == '/estado' and metodo == 'GET':
+            return 200, self.estado()
+        if rota == '/alteracoes' and metodo == 'POST':
+            alteracoes = json.loads(corpo or b'null')
+            return 200, await self.submeter(alteracoes if isinstance(alteracoes, list) else [alteracoes])
+        if rota in ('/agenda', '/estado', '/alteracoes'):
+            return 405, {'erro': f"método {metodo} não suportado em {rota}"}
+        return 404, {'erro': f"rota desconhecida: {rota}"}
+
+    async def atender(self, reader, writer):
+        try:
+            metodo, caminho, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+            cabecalhos = {}
+            while True:
+                linha = await reader.readline()
+                if linha in (b'\r\n', b'\n', b''):
+                    break
+                nome, _, valor = linha.decode('latin-1').partition(':')
+                cabecalhos[nome.strip().lower()] = valor.strip()
+            corpo = await reader.readexactly(int(cabecalhos.get('content-length', 0)))
+            status, resposta = await self._rotear(metodo, caminho, corpo)
+        except (ValueError, KeyError, TypeError) as erro:  # inclui JSON inválido
+            status, resposta = 400, {'erro': str(erro)}
+        except RuntimeError as erro:
+            status, resposta = 500, {'erro': str(erro)}
+        except asyncio.IncompleteReadError:
+            writer.close()
+            return
+        dados = json.dumps(resposta, ensure_ascii=False, default=float).encode()
+        writer.write(f"HTTP/1.1 {status} {MENSAGENS_HTTP[status]}\r\n"
+                     f"Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(dados)}\r\nConnection: close\r\n\r\n".encode() + dados)
+        await writer.drain()
+        writer.close()
+
+
+def carregar_planejador(diretorio='.', semana=None, config=None):
+    # Planejador da semana pedida (ISO, ex.: 2024-S24) ou de toda a demanda do arquivo.
+    profissionais, salas, demandas = me.carregar_dados(diretorio)
+    if semana:
+        demandas = demandas[demandas['data'].map(me.semana_iso) == semana].reset_index(drop=True)
+        if demandas.empty:
+            raise ValueError(f"nenhuma demanda na semana {semana}")
+    return PlanejadorIncremental(profissionais, salas, demandas, config=config)
+
+
+async def executar(servico, host, porta, socket_unix=None):
+    await servico.iniciar()
+    if socket_unix:
+        servidor = await asyncio.start_unix_server(servico.atender, path=socket_unix)
+        endereco = socket_unix
+    else:
+        servidor = await asyncio.start_server(servico.atender, host, porta)
+        endereco = f"http://{host}:{porta}"
+    print(f"Serviço de agendamento em {endereco} — escala inicial (gulosa): "
+          f"{len(servico.agenda)} atendimentos, custo {servico.custo:.2f}")
+    async with servidor:
+        await servidor.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serviço local de agendamento com alterações em micro-lotes.")
+    parser.add_argument('--diretorio', default='.')
+    parser.add_argument('--semana', help="Semana ISO a manter em memória (ex.: 2024-S24); padrão: toda a demanda")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8080)
+    parser.add_argument('--socket', help="Atende em um socket Unix em vez da porta TCP")
+    parser.add_argument('--janela-ms', type=float, default=20, help="Janela para agrupar alterações em um lote")
+    parser.add_argument('--orcamento-ms', type=float, default=200, help="Latência alvo de cada resposta")
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    config = configuracao_de_argumentos(args)
+    config.limite_tempo = config.limite_tempo or 30  # a reotimização não pode segurar as alterações indefinidamente
+    servico = Servico(carregar_planejador(args.diretorio, args.semana, config),
+                      janela=args.janela_ms / 1000, orcamento=args.orcamento_ms / 1000)
+    try:
+        asyncio.run(executar(servico, args.host, args.porta, args.socket))
+    except KeyboardInterrupt:
+        pass
@@ -1,13 +1,9 @@
-import pandas as pd
 import random
 
-# Carregar os dados
-profissionais = pd.read_csv('profissionais.csv')
-salas = pd.read_csv('salas.csv')
-demandas = pd.read_csv('demandas.csv')
+from instancia import Instancia, turnos
 
-dias = ['seg', 'ter', 'qua', 'qui', 'sex', 'sab']
-turnos = ['manhã', 'tarde']
+# Carregar os dados (instância compilada, lida do cache)
+instancia = Instancia('.')
 
 duracao_atendimento = 1  # em horas
 
@@ -15,24 +11,18 @@ duracao_atendimento = 1  # em horas
 pesos_base = {'urgência': 3, 'triagem': 2, 'rotina': 1}
 pesos = {k: v * random.uniform(0.8, 1.2) for k, v in pesos_base.items()}
 
-# Pré-processamento das disponibilidades
-for dia in dias:
-    col = f'disponibilidade_{dia}'
-    profissionais[col] = profissionais[col].fillna('').apply(lambda x: [t.strip() for t in str(x).split(',') if t.strip()])
-
 # Inicializar estruturas para a alocação aleatória
 alocacao_aleatoria = []
 folga_aleatoria = {}
-carga_trabalho_profissionais = {p_id: 0 for p_id in profissionais['id_profissional']}
+carga_maxima = instancia.carga_max
+carga_trabalho_profissionais = {p_id: 0 for p_id in instancia.profissionais}
 
 # Função para inicializar a capacidade das salas por dia/turno
 def inicializar_capacidade_salas():
     cap_salas = {}
-    for data in demandas['data'].unique():
+    for data, dia_semana in instancia.dia_da_data.items():
         for turno in turnos:
-            dia_semana = demandas[demandas['data'] == data]['dia_semana'].iloc[0]
-            capacidade_total = salas[salas['dias_funcionamento'].str.contains(dia_semana) & 
-                                   salas['turnos_disponiveis'].str.contains(turno)]['capacidade'].sum()
+            capacidade_total = instancia.capacidade(dia_semana, turno)
             # Adiciona aleatoriedade na capacidade
             capacidade_total = int(capacidade_total * random.uniform(0.9, 1.1))
             cap_salas[(data, turno)] = {'total': capacidade_total, 'ocupada': 0}
@@ -40,17 +30,12 @@ def inicializar_capacidade_salas():
 
 capacidade_salas_info = inicializar_capacidade_salas()
 
-# Converter demandas para lista e embaralhar completamente
-demandas_lista = demandas.to_dict('records')
+# Copiar as linhas de demanda e embaralhar completamente
+demandas_lista = list(instancia.linhas)
 random.shuffle(demandas_lista)
 
 # Implementação da alocação verdadeiramente aleatória
-for demanda_row in demandas_lista:
-    data_demanda = demanda_row['data']
-    turno_demanda = demanda_row['turno']
-    tipo_atendimento_demanda = demanda_row['tipo_atendimento']
-    quantidade_prevista = demanda_row['quantidade_prevista']
-    dia_semana_demanda = demanda_row['dia_semana']
+for data_demanda, dia_semana_demanda, turno_demanda, tipo_atendimento_demanda, quantidade_prevista in demandas_lista:
 
     # Adiciona aleatoriedade na quantidade prevista
     quantidade_prevista = int(quantidade_prevista * random.uniform(0.9, 1.1))
@@ -60,10 +45,9 @@ for demanda_row in demandas_lista:
     
     # Lista de profissionais elegíveis para esta demanda
     profissionais_elegiveis = []
-    for _, prof in profissionais.iterrows():
-        prof_id = prof['id_profissional']
-        if turno_demanda in prof[f'disponibilidade_{dia_semana_demanda}'] and \
-           carga_trabalho_profissionais[prof_id] + duracao_atendimento <= prof['carga_horaria_max']:
+    for prof_id in instancia.profissionais:
+        if instancia.disponivel(prof_id, dia_semana_demanda, turno_demanda) and \
+           carga_trabalho_profissionais[prof_id] + duracao_atendimento <= carga_maxima[prof_id]:
             profissionais_elegiveis.append(prof_id)
     
     # Embaralhar a lista de profissionais elegíveis
@@ -85,7 +69,7 @@ for demanda_row in demandas_lista:
                 continue
                 
             if capacidade_atual < capacidade_maxima:
-                if carga_trabalho_profissionais[prof_id] + duracao_atendimento <= profissionais[profissionais['id_profissional'] == prof_id]['carga_horaria_max'].iloc[0]:
+                if carga_trabalho_profissionais[prof_id] + duracao_atendimento <= carga_maxima[prof_id]:
                     # Alocar atendimento
                     alocacao_aleatoria.append({
                         'profissional': prof_id,
@@ -0,0 +1,421 @@
+import argparse
+import math
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+from pulp import LpAffineExpression, LpBinary, LpConstraint, LpConstraintEQ, LpConstraintGE, LpConstraintLE, \
+    LpContinuous, LpInteger, LpMaximize, LpProblem, LpStatus, LpVariable
+
+import agendamento_psicologico as ap
+import extracao
+from configuracao_solver import adicionar_argumentos, configuracao_de_argumentos, imprimir_resumo, resolver
+from instancia import Instancia
+from instrumentacao import PERFILADOR_NULO
+
+# Agendamento dentro do turno: cada tipo de atendimento tem sua duração em minutos
+# e o turno é dividido em slots de `granularidade` minutos. Indexar as variáveis
+# do agendamento por slot de início multiplica cada família pelo número de slots.
+# Aqui o tempo é agregado, com uma regra de modelagem: em cada turno, o profissional
+# fica em uma única sala (não troca de sala no meio do turno) e faz uma sequência de
+# atendimentos. n[p, d, t, tipo] conta os atendimentos, z[p, d, t, s] escolhe a sala
+# e w[p, d, t, s] é o tempo (em slots) que ele ocupa nela. A soma dos tempos em cada
+# sala cabe no turno e na capacidade da sala. Qualquer solução vira uma agenda sem
+# sobreposição, com os profissionais de cada sala em sequência e os atendimentos de
+# cada um em sequência. O modelo não cresce com o número de slots.
+# A formulação indexada por slot (`construir_modelo_ingenuo`) aplica a mesma regra e
+# tem o mesmo ótimo; sem a regra (`sala_unica=False`), trocar de sala no turno pode
+# atender mais, e a diferença mede o custo da regra.
+# O objetivo é o do agendamento por turno (benefício por hora, folga e
+# desbalanceamento de carga). Com atendimentos de 60 minutos em turnos de 60, os
+# dois modelos coincidem.
+
+DURACOES = {'urgência': 50, 'triagem': 30, 'rotina': 50}  # minutos
+INICIO_TURNOS = {'manhã': '08:00', 'tarde': '13:00'}
+
+CAMPOS_INGENUO = ['profissional', 'data', 'turno', 'sala', 'tipo_atendimento', 'slot']
+
+
+@dataclass
+class ConfiguracaoSubturnos:
+    duracoes: dict = field(default_factory=lambda: dict(DURACOES))
+    granularidade: int = 10  # minutos por slot
+    minutos_turno: int = 240
+    inicio_turnos: dict = field(default_factory=lambda: dict(INICIO_TURNOS))
+
+    @property
+    def slots_turno(self):
+        return self.minutos_turno // self.granularidade
+
+    def slots(self, tipo):
+        # Slots ocupados por um atendimento (a duração é arredondada para cima)
+        return math.ceil(self.duracoes[tipo] / self.granularidade)
+
+    def slots_sala(self, capacidade_horas):
+        # Tempo da sala no turno: a capacidade (horas por turno), limitada ao turno
+        return min(self.slots_turno, int(capacidade_horas * 60 // self.granularidade))
+
+    def horario(self, turno, minutos):
+        horas, minutos_inicio = (int(v) for v in self.inicio_turnos[turno].split(':'))
+        total = horas * 60 + minutos_inicio + minutos
+        return f"{total // 60:02d}:{total % 60:02d}"
+
+
+def _turnos_com_demanda(indices):
+    tipos_do_turno = {}
+    for data, turno, tipo in indices['demanda']:
+        tipos_do_turno.setdefault((data, turno), []).append(tipo)
+    return tipos_do_turno
+
+
+def _objetivo_e_carga(prob, indices, termos_atendimento, folga, desbalanceamento, horas_por_profissional, perfil):
+    # Objetivo e restrições de carga comuns às duas formulações, no formato do
+    # agendamento por turno (R5: carga máxima no horizonte e desbalanceamento).
+    ids = indices['profissionais']
+    termos = termos_atendimento + [(var, -ap.pesos[chave[2]]) for chave, var in folga.items()]
+    termos += [(var, -0.1) for var in desbalanceamento.values()]
+    objetivo = LpAffineExpression(termos)
+    objetivo.name = "Total_de_Atendimentos_Ponderados_e_Balanceamento"
+    prob.setObjective(objetivo)
+
+    media_carga_esperada = sum(indices['carga_max'].values()) / len(ids)
+    with perfil.fase('restricoes_CargaHoraria'):
+        for p in ids:
+            horas = horas_por_profissional[p]
+            prob.addConstraint(LpConstraint(LpAffineExpression(horas), LpConstraintLE, f"CargaHoraria_{p}",
+                                            indices['carga_max'][p]))
+            prob.addConstraint(LpConstraint(LpAffineExpression(horas + [(desbalanceamento[p], -1)]), LpConstraintLE,
+                                            f"DesbalanceamentoPositivo_{p}", media_carga_esperada))
+            prob.addConstraint(LpConstraint(LpAffineExpression(horas + [(desbalanceamento[p], 1)]), LpConstraintGE,
+                                            f"DesbalanceamentoNegativo_{p}", media_carga_esperada))
+
+
+def construir_modelo(indices, config=None, perfil=PERFILADOR_NULO):
+    # Formulação agregada. `indices` vem de `agendamento_psicologico.indices_da_instancia`.
+    config = config or ConfiguracaoSubturnos()
+    ids = indices['profissionais']
+    disponivel = indices['disponivel']
+    salas_abertas = indices['salas_abertas']
+    dia_da_data = indices['dia_da_data']
+    tipos_do_turno = _turnos_com_demanda(indices)
+    # (profissional, data, turno) em que o profissional pode atender
+    presencas = [(p, d, t) for (d, t) in tipos_do_turno for p in ids if (dia_da_data[d], t) in disponivel[p]]
+
+    prob = LpProblem("Agendamento_Subturnos", LpMaximize)
+    with perfil.fase('variaveis'):
+        n = {}
+        for p, d, t in presencas:
+            for tipo in tipos_do_turno[(d, t)]:
+                n[(p, d, t, tipo)] = LpVariable(f"n_{p}_{d}_{t}_{tipo}", 0, config.slots_turno // config.slots(tipo),
+                                                LpInteger)
+        chaves_sala = [(p, d, t, s) for p, d, t in presencas for s in salas_abertas[(dia_da_data[d], t)]]
+        z = LpVariable.dicts("z", chaves_sala, cat=LpBinary)
+        w = LpVariable.dicts("w", chaves_sala, 0, config.slots_turno, LpInteger)
+        folga = LpVariable.dicts("folga", list(indices['demanda']), 0, None, LpContinuous)
+        desbalanceamento = LpVariable.dicts("desbalanceamento", ids, 0, None, LpContinuous)
+
+    with perfil.fase('agrupamentos'):
+        salas_da_presenca, por_sala_turno, por_demanda = {}, {}, {}
+        horas = {p: [] for p in ids}
+        for chave in chaves_sala:
+            p, d, t, s = chave
+            salas_da_presenca.setdefault((p, d, t), []).append(s)
+            por_sala_turno.setdefault((s, d, t), []).append((w[chave], 1))
+        for (p, d, t, tipo), var in n.items():
+            por_demanda.setdefault((d, t, tipo), []).append((var, 1))
+            horas[p].append((var, config.duracoes[tipo] / 60))
+
+    with perfil.fase('objetivo'):
+        termos = [(var, ap.pesos[chave[3]] * config.duracoes[chave[3]] / 60) for chave, var in n.items()]
+        _objetivo_e_carga(prob, indices, termos, folga, desbalanceamento, horas, perfil)
+
+    # Cada profissional usa uma sala no turno, e o tempo dos seus atendimentos é o
+    # tempo que ele ocupa nela (zero se não recebeu sala).
+    with perfil.fase('restricoes_Profissional'):
+        for p, d, t in presencas:
+            salas = salas_da_presenca.get((p, d, t), [])
+            prob.addConstraint(LpConstraint(LpAffineExpression([(z[(p, d, t, s)], 1) for s in salas]),
+                                            LpConstraintLE, f"SalaUnica_{p}_{d}_{t}", 1))
+            tempo = [(n[(p, d, t, tipo)], config.slots(tipo)) for tipo in tipos_do_turno[(d, t)]]
+            prob.addConstraint(LpConstraint(LpAffineExpression(tempo + [(w[(p, d, t, s)], -1) for s in salas]),
+                                            LpConstraintEQ, f"TempoProfissional_{p}_{d}_{t}", 0))
+
+    # O tempo ocupado em cada sala cabe no turno e na capacidade da sala.
+    with perfil.fase('restricoes_Sala'):
+        limite = {s: config.slots_sala(c) for s, c in indices['capacidade_sala'].items()}
+        for chave in chaves_sala:
+            p, d, t, s = chave
+            prob.addConstraint(LpConstraint(LpAffineExpression([(w[chave], 1), (z[chave], -limite[s])]),
+                                            LpConstraintLE, f"VinculoSala_{p}_{d}_{t}_{s}", 0))
+        for (s, d, t), termos_sala in por_sala_turno.items():
+            prob.addConstraint(LpConstraint(LpAffineExpression(termos_sala), LpConstraintLE, f"TempoSala_{s}_{d}_{t}",
+                                            limite[s]))
+
+    with perfil.fase('restricoes_Demanda'):
+        for (d, t, tipo), quantidade in indices['demanda'].items():
+            prob.addConstraint(LpConstraint(LpAffineExpression(por_demanda.get((d, t, tipo), []) +
+                                                               [(folga[(d, t, tipo)], 1)]),
+                                            LpConstraintEQ, f"Demanda_{d}_{t}_{tipo}", quantidade))
+
+    perfil.contar_modelo(prob)
+    return prob, n, folga, desbalanceamento, z, w
+
+
+def construir_modelo_ingenuo(indices, config=None, perfil=PERFILADOR_NULO, sala_unica=True):
+    # Formulação indexada pelo slot de início, para comparação: x[p, d, t, s, tipo, k]
+    # vale 1 se o atendimento começa no slot k. Profissional e sala atendem um
+    # atendimento por slot. Com `sala_unica`, vale a mesma regra da formulação agregada
+    # (uma sala por profissional no turno) e os dois modelos têm o mesmo ótimo; sem ela,
+    # o profissional pode trocar de sala dentro do turno e o ótimo pode ser melhor.
+    config = config or ConfiguracaoSubturnos()
+    ids = indices['profissionais']
+    disponivel = indices['disponivel']
+    salas_abertas = indices['salas_abertas']
+    dia_da_data = indices['dia_da_data']
+    tipos_do_turno = _turnos_com_demanda(indices)
+    limite = {s: config.slots_sala(c) for s, c in indices['capacidade_sala'].items()}
+
+    prob = LpProblem("Agendamento_Subturnos_Ingenuo", LpMaximize)
+    with perfil.fase('variaveis'):
+        chaves = [(p, d, t, s, tipo, k)
+                  for (d, t), tipos in tipos_do_turno.items()
+                  for p in ids if (dia_da_data[d], t) in disponivel[p]
+                  for s in salas_abertas[(dia_da_data[d], t)]
+                  for tipo in tipos
+                  for k in range(limite[s] - config.slots(tipo) + 1)]
+        x = LpVariable.dicts("x", chaves, 0, 1, LpBinary)
+        chaves_sala = sorted({chave[:4] for chave in chaves}) if sala_unica else []
+        z = LpVariable.dicts("z", chaves_sala, cat=LpBinary)
+        folga = LpVariable.dicts("folga", list(indices['demanda']), 0, None, LpContinuous)
+        desbalanceamento = LpVariable.dicts("desbalanceamento", ids, 0, None, LpContinuous)
+
+    with perfil.fase('agrupamentos'):
+        por_profissional_slot, por_sala_slot, por_sala, por_demanda = {}, {}, {}, {}
+        por_profissional_sala = {}
+        horas = {p: [] for p in ids}
+        for chave in chaves:
+            p, d, t, s, tipo, k = chave
+            var = x[chave]
+            for j in range(k, k + config.slots(tipo)):
+                por_profissional_slot.setdefault((p, d, t, j), []).append((var, 1))
+                por_sala_slot.setdefault((s, d, t, j), []).append((var, 1))
+            por_sala.setdefault((s, d, t), []).append((var, config.slots(tipo)))
+            por_profissional_sala.setdefault((p, d, t, s), []).append((var, config.slots(tipo)))
+            por_demanda.setdefault((d, t, tipo), []).append((var, 1))
+            horas[p].append((var, config.duracoes[tipo] / 60))
+
+    with perfil.fase('objetivo'):
+        termos = [(var, ap.pesos[chave[4]] * config.duracoes[chave[4]] / 60) for chave, var in x.items()]
+        _objetivo_e_carga(prob, indices, termos, folga, desbalanceamento, horas, perfil)
+
+    with perfil.fase('restricoes_Slot'):
+        for (p, d, t, j), termos_slot in por_profissional_slot.items():
+            prob.addConstraint(LpConstraint(LpAffineExpression(termos_slot), LpConstraintLE,
+                                            f"ProfissionalSlot_{p}_{d}_{t}_{j}", 1))
+        for (s, d, t, j), termos_slot in por_sala_slot.items():
+            prob.addConstraint(LpConstraint(LpAffineExpression(termos_slot), LpConstraintLE,
+                                            f"SalaSlot_{s}_{d}_{t}_{j}", 1))
+        for (s, d, t), termos_sala in por_sala.items():
+            prob.addConstraint(LpConstraint(LpAffineExpression(termos_sala), LpConstraintLE, f"TempoSala_{s}_{d}_{t}",
+                                            limite[s]))
+
+    # Regra de uma sala por profissional no turno: só há atendimentos na sala escolhida.
+    if sala_unica:
+        with perfil.fase('restricoes_Profissional'):
+            salas_da_presenca = {}
+            for chave in chaves_sala:
+                p, d, t, s = chave
+                salas_da_presenca.setdefault((p, d, t), []).append((z[chave], 1))
+                prob.addConstraint(LpConstraint(LpAffineExpression(por_profissional_sala[chave] +
+                                                                   [(z[chave], -limite[s])]),
+                                                LpConstraintLE, f"VinculoSala_{p}_{d}_{t}_{s}", 0))
+            for (p, d, t), termos_presenca in salas_da_presenca.items():
+                prob.addConstraint(LpConstraint(LpAffineExpression(termos_presenca), LpConstraintLE,
+                                                f"SalaUnica_{p}_{d}_{t}", 1))
+
+    with perfil.fase('restricoes_Demanda'):
+        for (d, t, tipo), quantidade in indices['demanda'].items():
+            prob.addConstraint(LpConstraint(LpAffineExpression(por_demanda.get((d, t, tipo), []) +
+                                                               [(folga[(d, t, tipo)], 1)]),
+                                            LpConstraintEQ, f"Demanda_{d}_{t}_{tipo}", quantidade))
+
+    perfil.contar_modelo(prob)
+    return prob, x, folga, desbalanceamento
+
+
+# =============================================================================
+# Solução inicial
+# =============================================================================
+
+def escala_gulosa(indices, config):
+    # Em cada turno, os profissionais presentes (os de menor carga primeiro) recebem a
+    # sala com mais tempo livre e atendimentos em ordem de prioridade do tipo, até a
+    # cota do turno (o tempo da demanda dividido entre os presentes). Devolve
+    # {(p, d, t): (sala, {tipo: quantidade})}.
+    ordem_tipos = sorted(ap.pesos, key=lambda tipo: -ap.pesos[tipo])
+    limite = {s: config.slots_sala(c) for s, c in indices['capacidade_sala'].items()}
+    carga = {p: 0.0 for p in indices['profissionais']}
+    restante = dict(indices['demanda'])
+    escala = {}
+    for (d, t), tipos in _turnos_com_demanda(indices).items():
+        dia = indices['dia_da_data'][d]
+        livre = {s: limite[s] for s in indices['salas_abertas'][(dia, t)]}
+        presentes = sorted((p for p in indices['profissionais'] if (dia, t) in indices['disponivel'][p]),
+                           key=lambda p: carga[p])
+        tempo_demanda = sum(restante[(d, t, tipo)] * config.slots(tipo) for tipo in tipos)
+        cota = math.ceil(tempo_demanda / max(1, min(len(presentes), len(livre))))
+        for p in presentes:
+            if not livre:
+                break
+            s = max(livre, key=livre.get)
+            usado, quantidades = 0, {}
+            for tipo in (tipo for tipo in ordem_tipos if tipo in tipos):
+                while restante[(d, t, tipo)] > 0 and usado + config.slots(tipo) <= min(livre[s], cota) and \
+                        carga[p] + config.duracoes[tipo] / 60 <= indices['carga_max'][p]:
+                    quantidades[tipo] = quantidades.get(tipo, 0) + 1
+                    restante[(d, t, tipo)] -= 1
+                    usado += config.slots(tipo)
+                    carga[p] += config.duracoes[tipo] / 60
+            if usado:
+                escala[(p, d, t)] = (s, quantidades)
+                livre[s] -= usado
+    return escala
+
+
+def iniciar(indices, config, escala, n, folga, desbalanceamento, z, w):
+    # Preenche varValue de todas as variáveis da formulação agregada a partir da escala.
+    for var in list(n.values()) + list(z.values()) + list(w.values()):
+        var.varValue = 0
+    atendidos = {}
+    carga = {p: 0.0 for p in indices['profissionais']}
+    for (p, d, t), (s, quantidades) in escala.items():
+        z[(p, d, t, s)].varValue = 1
+        w[(p, d, t, s)].varValue = sum(q * config.slots(tipo) for tipo, q in quantidades.items())
+        for tipo, q in quantidades.items():
+            n[(p, d, t, tipo)].varValue = q
+            atendidos[(d, t, tipo)] = atendidos.get((d, t, tipo), 0) + q
+            carga[p] += q * config.duracoes[tipo] / 60
+    for chave, quantidade in indices['demanda'].items():
+        folga[chave].varValue = quantidade - atendidos.get(chave, 0)
+    media = sum(indices['carga_max'].values()) / len(carga)
+    for p, horas in carga.items():
+        desbalanceamento[p].varValue = abs(horas - media)
+
+
+# =============================================================================
+# Agenda com horários
+# =============================================================================
+
+def agenda_com_horarios(n, w, config):
+    # Sequência dos atendimentos: em cada sala e turno, os profissionais um após o
+    # outro; os atendimentos de cada profissional em ordem de prioridade do tipo.
+    ordem_tipos = sorted(ap.pesos, key=lambda tipo: -ap.pesos[tipo])
+    proximo_slot = {}
+    linhas = []
+    for (p, d, t, s), var in w.items():
+        if (var.varValue or 0) < 0.5:
+            continue
+        slot = proximo_slot.get((s, d, t), 0)
+        for tipo in ordem_tipos:
+            var_n = n.get((p, d, t, tipo))
+            for _ in range(round(var_n.varValue or 0) if var_n is not None else 0):
+                minuto = slot * config.granularidade
+                linhas.append((p, d, t, s, tipo, config.horario(t, minuto),
+                               config.horario(t, minuto + config.duracoes[tipo])))
+                slot += config.slots(tipo)
+        proximo_slot[(s, d, t)] = slot
+    return pd.DataFrame(linhas, columns=extracao.CAMPOS_AGENDAMENTO + ['inicio', 'fim'])
+
+
+def agenda_ingenua_com_horarios(x, config):
+    tabela = extracao.tabela_agenda(x, CAMPOS_INGENUO)
+    minutos = tabela['slot'] * config.granularidade
+    tabela['inicio'] = [config.horario(t, m) for t, m in zip(tabela['turno'], minutos)]
+    tabela['fim'] = [config.horario(t, m + config.duracoes[tipo])
+                     for t, m, tipo in zip(tabela['turno'], minutos, tabela['tipo_atendimento'])]
+    return tabela.drop(columns='slot')
+
+
+def conflitos(agenda):
+    # Pares de atendimentos sobrepostos do mesmo profissional ou na mesma sala.
+    total = 0
+    for recurso in ('profissional', 'sala'):
+        ordenada = agenda.sort_values([recurso, 'data', 'turno', 'inicio'])
+        mesmo = (ordenada[[recurso, 'data', 'turno']].shift() == ordenada[[recurso, 'data', 'turno']]).all(axis=1)
+        total += int((mesmo & (ordenada['inicio'] < ordenada['fim'].shift())).sum())
+    return total
+
+
+# =============================================================================
+# Comparação com o modelo por turno
+# =============================================================================
+
+def construir_com_inicio(indices, config=None, perfil=PERFILADOR_NULO):
+    # Formulação agregada com a escala gulosa como valores iniciais (warm_start=True).
+    config = config or ConfiguracaoSubturnos()
+    modelo = construir_modelo(indices, config, perfil)
+    iniciar(indices, config, escala_gulosa(indices, config), *modelo[1:])
+    return modelo
+
+
+def comparar_modelos(indices, config, config_solver, ingenuo=True):
+    # Tamanho e tempos de construção e resolução do agendamento por turno, da
+    # formulação agregada e (opcionalmente) da indexada por slot, com e sem a regra
+    # de uma sala por turno.
+    construtores = {'turno': lambda: ap.construir_modelo(indices)[0],
+                    'subturnos': lambda: construir_com_inicio(indices, config)[0]}
+    if ingenuo:
+        construtores['subturnos_ingenuo'] = lambda: construir_modelo_ingenuo(indices, config)[0]
+        construtores['subturnos_livre'] = lambda: construir_modelo_ingenuo(indices, config, sala_unica=False)[0]
+    linhas = []
+    for nome, construir in construtores.items():
+        inicio = time.perf_counter()
+        prob = construir()
+        tempo_construcao = time.perf_counter() - inicio
+        resultado = resolver(prob, config_solver, warm_start=nome == 'subturnos')
+        linhas.append({'modelo': nome, 'variaveis': prob.numVariables(), 'restricoes': prob.numConstraints(),
+                       'tempo_construcao': tempo_construcao, 'tempo_resolucao': resultado.tempo,
+                       'status': resultado.status, 'objetivo': resultado.objetivo, 'gap': resultado.gap})
+    return pd.DataFrame(linhas)
+
+
+def _duracao(texto):
+    tipo, minutos = texto.split('=')
+    return tipo, int(minutos)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Agendamento com horários dentro do turno.")
+    parser.add_argument('--diretorio', default='.')
+    parser.add_argument('--duracoes', nargs='+', type=_duracao, metavar='TIPO=MINUTOS',
+                        help="Duração de cada tipo de atendimento (padrão: urgência=50 triagem=30 rotina=50)")
+    parser.add_argument('--granularidade', type=int, default=10, help="Minutos por slot")
+    parser.add_argument('--minutos-turno', type=int, default=240)
+    parser.add_argument('--saida', metavar='ARQUIVO', type=extracao.arquivo_saida,
+                        help="Grava a agenda com horários em .csv ou .parquet")
+    parser.add_argument('--comparar', action='store_true',
+                        help="Compara tamanho e tempos com o modelo por turno e com a formulação por slot")
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    config = ConfiguracaoSubturnos(granularidade=args.granularidade, minutos_turno=args.minutos_turno)
+    config.duracoes.update(dict(args.duracoes or []))
+    indices = ap.indices_da_instancia(Instancia(args.diretorio).carregar())
+
+    if args.comparar:
+        print(comparar_modelos(indices, config, configuracao_de_argumentos(args)).to_string(index=False))
+    else:
+        prob, n, folga, desbalanceamento, z, w = construir_com_inicio(indices, config)
+        imprimir_resumo(resolver(prob, configuracao_de_argumentos(args), warm_start=True))
+        print("Status:", LpStatus[prob.status])
+
+        agenda = agenda_com_horarios(n, w, config)
+        print("\nAgenda:")
+        print(agenda.to_string(index=False))
+        print(f"\nConflitos de horário: {conflitos(agenda)}")
+        folgas = extracao.tabela_folga(folga)
+        print("\nDemandas não atendidas (folga):")
+        print(folgas[folgas['folga'] > 0].to_string(index=False))
+        print(f"\nObjetivo: {prob.objective.value():.2f}")
+        if args.saida:
+            extracao.salvar_solucao(args.saida, agenda, folgas)
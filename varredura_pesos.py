@@ -0,0 +1,152 @@
+import argparse
+import concurrent.futures
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import agendamento_psicologico as ap
+import extracao
+import modelo_escalonamento as me
+from configuracao_solver import adicionar_argumentos, configuracao_de_argumentos, resolver
+
+# Varredura de pesos de prioridade e coeficientes de penalidade. A instância é
+# carregada uma única vez e enviada a cada processo do pool na inicialização. Os
+# cenários da grade são divididos em cadeias de vizinhos (cenários consecutivos
+# diferem em um só parâmetro); cada processo constrói o modelo uma vez por cadeia,
+# troca apenas a função objetivo entre cenários e parte da solução do cenário
+# anterior (warm start). O resultado é a fronteira de Pareto entre demanda não
+# atendida, desequilíbrio de carga e volume atendido.
+
+MODELOS = {'escalonamento': me, 'agendamento': ap}
+CAMPOS = {'escalonamento': extracao.CAMPOS_ESCALONAMENTO, 'agendamento': extracao.CAMPOS_AGENDAMENTO}
+
+# Coeficiente de carga de cada modelo: max_carga no escalonamento, desbalanceamento no agendamento
+COEF_CARGA = {'escalonamento': 'coef_carga', 'agendamento': 'coef_desbalanceamento'}
+
+# Colunas preenchidas por `_metricas`
+METRICAS = ['folga_total', 'folga_urgencia', 'atendimentos', 'amplitude_carga']
+
+_estado = {}
+
+
+def grade(urgencia, triagem, rotina, coef_folga, coef_carga):
+    # Cenários em ordem serpentina (Gray misto): a cada novo parâmetro, os valores
+    # são percorridos alternadamente em ordem direta e inversa, de modo que vizinhos
+    # na lista diferem em um só parâmetro também na virada de um bloco para o outro.
+    ordem = [()]
+    for valores in (urgencia, triagem, rotina, coef_folga, coef_carga):
+        ordem = [prefixo + (v,) for n, prefixo in enumerate(ordem)
+                 for v in (valores if n % 2 == 0 else valores[::-1])]
+    return [{'urgência': u, 'triagem': t, 'rotina': r, 'coef_folga': f, 'coef_carga': c}
+            for u, t, r, f, c in ordem]
+
+
+def _coeficientes(nome_modelo, cenario):
+    return {
+        'pesos_tipo': {tipo: cenario[tipo] for tipo in ('urgência', 'triagem', 'rotina')},
+        'coef_folga': cenario['coef_folga'],
+        COEF_CARGA[nome_modelo]: cenario['coef_carga'],
+    }
+
+
+def _inicializar(nome_modelo, indices, config):
+    _estado.update(nome_modelo=nome_modelo, indices=indices, config=config)
+
+
+def _metricas(nome_modelo, indices, x, folga):
+    duracao = MODELOS[nome_modelo].duracao_atendimento
+    agenda = extracao.tabela_agenda(x, CAMPOS[nome_modelo])
+    folgas = extracao.tabela_folga(folga)
+    carga = extracao.carga_por_profissional(agenda, duracao, indices['profissionais'])
+    return {
+        'folga_total': folgas['folga'].sum(),
+        'folga_urgencia': folgas.loc[folgas['tipo_atendimento'] == 'urgência', 'folga'].sum(),
+        'atendimentos': len(agenda),
+        'amplitude_carga': carga.max() - carga.min(),
+    }
+
+
+def resolver_cadeia(cenarios):
+    # Resolve uma cadeia de cenários vizinhos no processo atual, reaproveitando o
+    # modelo (só o objetivo muda) e a solução anterior como ponto de partida.
+    nome_modelo, indices, config = _estado['nome_modelo'], _estado['indices'], _estado['config']
+    script = MODELOS[nome_modelo]
+    prob, x, folga, auxiliar = script.construir_modelo(indices)
+    resultados = []
+    for n, cenario in enumerate(cenarios):
+        prob.setObjective(script.funcao_objetivo(x, folga, auxiliar, **_coeficientes(nome_modelo, cenario)))
+        resultado = resolver(prob, config, warm_start=n > 0)
+        linha = {**cenario, 'status': resultado.status, 'objetivo': resultado.objetivo, 'tempo': resultado.tempo}
+        # Sem solução as variáveis não têm valor; as métricas ficam em branco (NaN)
+        if resultado.objetivo is not None:
+            linha.update(_metricas(nome_modelo, indices, x, folga))
+        resultados.append(linha)
+    return resultados
+
+
+def fronteira_pareto(tabela, minimizar=('folga_total', 'amplitude_carga'), maximizar=('atendimentos',)):
+    # Marca os cenários não dominados: nenhum outro é tão bom em todos os critérios
+    # e estritamente melhor em algum.
+    valores = np.column_stack([tabela[c].to_numpy(dtype=float) for c in minimizar] +
+                              [-tabela[c].to_numpy(dtype=float) for c in maximizar])
+    melhor_ou_igual = (valores[:, None, :] <= valores[None, :, :]).all(axis=2)
+    estritamente = (valores[:, None, :] < valores[None, :, :]).any(axis=2)
+    dominado = (melhor_ou_igual & estritamente).any(axis=0)
+    return ~dominado
+
+
+def varrer(nome_modelo, indices, cenarios, config=None, processos=None, tamanho_cadeia=None):
+    # Divide os cenários em cadeias contíguas (uma por processo, se `tamanho_cadeia`
+    # não for dado) e devolve a tabela de resultados com a coluna `pareto`.
+    processos = processos or min(len(cenarios), os.cpu_count() or 1)
+    tamanho_cadeia = tamanho_cadeia or -(-len(cenarios) // processos)
+    cadeias = [cenarios[i:i + tamanho_cadeia] for i in range(0, len(cenarios), tamanho_cadeia)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processos, initializer=_inicializar,
+                                                initargs=(nome_modelo, indices, config)) as executor:
+        partes = list(executor.map(resolver_cadeia, cadeias))
+    tabela = pd.DataFrame([linha for parte in partes for linha in parte])
+    tabela = tabela.reindex(columns=[*tabela.columns.drop(METRICAS, errors='ignore'), *METRICAS])
+    # Cenários sem solução não entram na comparação de Pareto
+    resolvidos = tabela['objetivo'].notna()
+    tabela['pareto'] = False
+    tabela.loc[resolvidos, 'pareto'] = fronteira_pareto(tabela[resolvidos])
+    return tabela
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Varredura paralela de pesos e penalidades com fronteira de Pareto.")
+    parser.add_argument('--modelo', choices=sorted(MODELOS), default='escalonamento')
+    parser.add_argument('--diretorio', default='.')
+    parser.add_argument('--urgencia', type=float, nargs='+', help="Pesos da urgência (padrão: o do modelo)")
+    parser.add_argument('--triagem', type=float, nargs='+')
+    parser.add_argument('--rotina', type=float, nargs='+')
+    parser.add_argument('--coef-folga', type=float, nargs='+', help="Multiplicador da penalidade de folga")
+    parser.add_argument('--coef-carga', type=float, nargs='+',
+                        help="Coeficiente de max_carga (escalonamento) ou do desbalanceamento (agendamento)")
+    parser.add_argument('--processos', type=int)
+    parser.add_argument('--cadeia', type=int, help="Cenários por cadeia de warm start")
+    parser.add_argument('--saida', default='varredura.csv')
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    script = MODELOS[args.modelo]
+    padrao_folga = 2 if args.modelo == 'escalonamento' else 1
+    cenarios = grade(args.urgencia or [script.pesos['urgência']], args.triagem or [script.pesos['triagem']],
+                     args.rotina or [script.pesos['rotina']], args.coef_folga or [padrao_folga],
+                     args.coef_carga or [0.1])
+    config = configuracao_de_argumentos(args)
+    config.threads = config.threads or 1
+
+    indices = script.preparar_indices(*script.carregar_dados(args.diretorio))
+    inicio = time.perf_counter()
+    tabela = varrer(args.modelo, indices, cenarios, config, args.processos, args.cadeia)
+    print(f"{len(tabela)} cenários em {time.perf_counter() - inicio:.2f}s "
+          f"(soma dos tempos de resolução: {tabela['tempo'].sum():.2f}s)")
+    tabela.to_csv(args.saida, index=False)
+
+    print("\nFronteira de Pareto (demanda não atendida x desequilíbrio de carga x volume atendido):")
+    colunas = ['urgência', 'triagem', 'rotina', 'coef_folga', 'coef_carga',
+               'folga_total', 'folga_urgencia', 'amplitude_carga', 'atendimentos']
+    print(tabela.loc[tabela['pareto'], colunas].sort_values('folga_total').to_string(index=False))